@@ -0,0 +1,1491 @@
+import atexit
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from archivo import Archivo
+from busqueda import IndicePedidos
+from cocina import ColaCocina, Novedades
+from catalogo import archivo_menu, guardar_catalogo
+from cola import ColaPedidos
+from cierre import calcular_cierres, completar_cierres
+from esquema import categorias, dia, fecha, para_csv, para_guardar, texto_fecha, tipar
+from estadisticas import calcular_estadisticas
+from exportar import a_bytes, escribir, formato_de_ruta
+from migracion import IMPORTES, VERSION_ESQUEMA, ReporteMigracion, completar_pedidos, descuadres, items_de_detalle, verificar
+from perfil import medido, medir
+from productos import COLUMNAS_ITEMS, ventas_por_producto
+
+# Cada sucursal tiene todos sus archivos (caja, secuencia de pedidos, cola,
+# archivo histórico) en DIR_SUCURSALES/<nombre>; este proceso atiende la de
+# ESCONDITE_SUCURSAL. Sin sucursal, los archivos de un solo local en el directorio actual
+DIR_SUCURSALES = os.environ.get('ESCONDITE_SUCURSALES', 'sucursales')
+SUCURSAL = os.environ.get('ESCONDITE_SUCURSAL', '')
+
+DATA_FILE_PEDIDOS = 'pedidos_mi_escondite.csv'
+DATA_FILE_GASTOS = 'gastos_mi_escondite.csv'
+DATA_FILE_CAJA = 'caja_mi_escondite.csv'
+DATA_FILE_CIERRES = 'cierres_mi_escondite.csv'
+DATA_FILE_ITEMS = 'items_mi_escondite.csv'
+# Último ID de pedido entregado; nunca retrocede aunque se borren pedidos
+DATA_FILE_SECUENCIA = 'secuencia_mi_escondite.txt'
+# Bloqueo compartido por todas las terminales que usan los mismos archivos
+DATA_FILE_BLOQUEO = 'mi_escondite.lock'
+# Versión del esquema de los CSV (ver migracion.py) y reporte de cada migración
+DATA_FILE_VERSION = 'version_esquema_mi_escondite.txt'
+DATA_FILE_REPORTE_MIGRACION = 'migracion_mi_escondite.txt'
+DATA_FILE_DB = os.environ.get('ESCONDITE_DB', 'mi_escondite.db')
+# Pedidos aceptados en caja y aún no guardados (ver cola.py); conviene un disco local
+DATA_FILE_COLA = os.environ.get('ESCONDITE_COLA', 'cola_pedidos_mi_escondite.jsonl')
+# Días ya cerrados, en Parquet por mes (ver archivo.py)
+DATA_DIR_ARCHIVO = 'archivo_mi_escondite'
+
+# Backend de almacenamiento: 'csv' (por defecto) o 'sqlite', el mismo en todas las sucursales
+BACKEND = os.environ.get('ESCONDITE_BACKEND', 'csv')
+# Sucursales leídas a la vez en el reporte consolidado
+MAX_HILOS_SUCURSALES = 8
+
+COLUMNAS_PEDIDOS = ['ID', 'Nombre_Orden', 'Fecha', 'Detalle', 'Total', 'Estado', 'Metodo_Pago']
+COLUMNAS_GASTOS = ['Fecha', 'Descripción', 'Monto']
+COLUMNAS_CAJA = ['Fecha', 'Inicial']
+# Resumen diario materializado: Concepto es 'Inicial', 'Gastos' o un método de pago
+COLUMNAS_CIERRES = ['Dia', 'Concepto', 'Monto']
+
+# Tamaño del diario (bytes) a partir del cual se consolida en el CSV base
+UMBRAL_COMPACTACION = 256 * 1024
+
+# Máximo de consultas por día que se mantienen en la caché de cada tabla
+MAX_DIAS_EN_CACHE = 32
+
+# Filas por bloque al exportar respaldos
+FILAS_POR_FRAGMENTO = 20_000
+
+COLUMNAS_EXPORTABLES = {'pedidos': COLUMNAS_PEDIDOS, 'gastos': COLUMNAS_GASTOS, 'caja': COLUMNAS_CAJA}
+
+
+def directorio_sucursal(sucursal):
+    return os.path.join(DIR_SUCURSALES, sucursal) if sucursal else ''
+
+
+DATA_DIR = directorio_sucursal(SUCURSAL)
+if DATA_DIR:
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+
+def _en_datos(nombre, directorio=None):
+    # Ruta de un archivo de la sucursal (por defecto la de este proceso); una ruta absoluta queda igual
+    return os.path.join(DATA_DIR if directorio is None else directorio, nombre)
+
+
+def _firma_archivo(ruta):
+    try:
+        info = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+def _escribir_sincronizado(ruta, df):
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        df.to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _sincronizar_directorio(ruta):
+    # Hace durable un os.replace; en Windows no se puede abrir un directorio
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(ruta)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _escribir_texto_atomico(ruta, texto):
+    tmp = ruta + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(texto)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+    _sincronizar_directorio(ruta)
+
+
+class BloqueoArchivo:
+    """Bloqueo entre procesos sobre un archivo ``.lock``, reentrante por hilo.
+
+    ``with bloqueo:`` toma el bloqueo exclusivo (escrituras) y
+    ``with bloqueo.compartido():`` el compartido (lecturas). Dentro de un
+    mismo proceso los hilos se serializan con un RLock, porque flock no
+    distingue hilos que comparten el descriptor.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._hilos = threading.RLock()
+        self._archivo = None
+        self._nivel = 0
+        self._exclusivo = False
+
+    def _tomar(self, exclusivo):
+        self._hilos.acquire()
+        try:
+            if self._nivel == 0:
+                archivo = open(self.ruta, 'a+b')
+                try:
+                    _bloquear(archivo, exclusivo)
+                except BaseException:
+                    archivo.close()
+                    raise
+                self._archivo, self._exclusivo = archivo, exclusivo
+            elif exclusivo and not self._exclusivo:
+                raise RuntimeError("No se puede pasar de bloqueo compartido a exclusivo")
+            self._nivel += 1
+        except BaseException:
+            self._hilos.release()
+            raise
+
+    def _soltar(self):
+        self._nivel -= 1
+        if self._nivel == 0:
+            _desbloquear(self._archivo)
+            self._archivo.close()
+            self._archivo = None
+        self._hilos.release()
+
+    def __enter__(self):
+        self._tomar(True)
+        return self
+
+    def __exit__(self, *exc):
+        self._soltar()
+
+    @contextmanager
+    def compartido(self):
+        self._tomar(False)
+        try:
+            yield self
+        finally:
+            self._soltar()
+
+
+def _bloquear(archivo, exclusivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        return
+    # msvcrt sólo tiene bloqueo exclusivo y LK_LOCK se rinde a los 10 s
+    archivo.seek(0)
+    while True:
+        try:
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _desbloquear(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+        return
+    archivo.seek(0)
+    msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TablaDiario:
+    """Tabla CSV con un diario de eventos de solo-anexado.
+
+    Las altas y los cambios se anexan como líneas JSON a ``<ruta>.diario``
+    (O(1) por operación); el CSV base sólo se reescribe al compactar o al
+    reemplazar la tabla completa. Una línea cortada por un fallo a mitad de
+    escritura se descarta al leer.
+
+    Anexar y compactar toman ``bloqueo`` en exclusivo y cargar en compartido,
+    así una terminal nunca lee un CSV a medio reemplazar por otra.
+    """
+
+    def __init__(self, ruta, columnas, clave=None, consolidar=None, bloqueo=None, normalizar=None):
+        self.ruta = ruta
+        self.columnas = columnas
+        self.clave = clave
+        self.consolidar = consolidar
+        # Se aplica a la tabla antes de reescribir el CSV base (formato canónico)
+        self.normalizar = normalizar
+        self.bloqueo = bloqueo or BloqueoArchivo(ruta + '.lock')
+        self.ruta_diario = ruta + '.diario'
+        self.ruta_tmp = ruta + '.tmp'
+        self.ruta_compactando = ruta + '.diario.compactando'
+
+    def _recuperar(self):
+        # Completa (hacia adelante) un reemplazo interrumpido del CSV base.
+        # El .tmp siempre queda sincronizado en disco antes de apartar el diario.
+        # Sólo con el bloqueo exclusivo: los lectores usan _ruta_base.
+        if os.path.exists(self.ruta_compactando):
+            if os.path.exists(self.ruta_tmp):
+                os.replace(self.ruta_tmp, self.ruta)
+            os.remove(self.ruta_compactando)
+        elif os.path.exists(self.ruta_tmp):
+            os.remove(self.ruta_tmp)
+
+    def _ruta_base(self):
+        # Vista de sólo lectura de la recuperación: si un reemplazo quedó a
+        # medias, el .tmp ya contiene el CSV base junto con el diario apartado
+        if os.path.exists(self.ruta_compactando) and os.path.exists(self.ruta_tmp):
+            return self.ruta_tmp
+        return self.ruta
+
+    def firma(self):
+        return _firma_archivo(self.ruta), _firma_archivo(self.ruta_diario)
+
+    def _leer_eventos(self):
+        if not os.path.exists(self.ruta_diario):
+            return []
+        eventos = []
+        with open(self.ruta_diario, encoding='utf-8') as f:
+            for linea in f:
+                if not linea.endswith('\n'):
+                    break
+                try:
+                    eventos.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    continue
+        return eventos
+
+    def _anexar(self, evento):
+        linea = json.dumps(evento, ensure_ascii=False, default=str) + '\n'
+        with self.bloqueo:
+            self._recuperar()
+            with open(self.ruta_diario, 'a+b') as f:
+                # Si la última línea quedó cortada, se cierra antes de anexar
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        linea = '\n' + linea
+                f.write(linea.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                tamano = f.tell()
+            if tamano > UMBRAL_COMPACTACION:
+                self.compactar()
+
+    def existe(self):
+        return os.path.exists(self.ruta) or os.path.exists(self.ruta_diario)
+
+    def cursor(self):
+        # Fin actual del diario, junto con la versión del CSV base a la que se aplica
+        with self.bloqueo.compartido():
+            diario = _firma_archivo(self.ruta_diario)
+            return _firma_archivo(self.ruta), diario[1] if diario else 0
+
+    def eventos_desde(self, cursor):
+        """Eventos anexados después de ``cursor`` y el cursor nuevo.
+
+        None si el CSV base cambió desde entonces (compactación o reemplazo):
+        esos eventos ya no están en el diario.
+        """
+        base, posicion = cursor
+        with self.bloqueo.compartido():
+            if os.path.exists(self.ruta_compactando) or _firma_archivo(self.ruta) != base:
+                return None
+            try:
+                with open(self.ruta_diario, 'rb') as f:
+                    f.seek(posicion)
+                    nuevo = f.read()
+            except FileNotFoundError:
+                nuevo = b''
+        # Sólo líneas completas; el resto se vuelve a leer en el siguiente sondeo
+        completo = nuevo[:nuevo.rfind(b'\n') + 1]
+        eventos = []
+        for linea in completo.decode('utf-8').splitlines():
+            try:
+                eventos.append(json.loads(linea))
+            except json.JSONDecodeError:
+                continue
+        return eventos, (base, posicion + len(completo))
+
+    def cargar(self):
+        df = self._cargar_eventos()
+        return self.consolidar(df) if self.consolidar else df
+
+    @staticmethod
+    def _separar(eventos):
+        altas, cambios = [], {}
+        for e in eventos:
+            if e['op'] == 'alta':
+                altas.append(e['fila'])
+            elif e['op'] == 'altas':
+                altas.extend(e['filas'])
+            elif e['op'] == 'cambio':
+                for columna, valor in e['valores'].items():
+                    cambios.setdefault(columna, {})[e['clave']] = valor
+        return altas, cambios
+
+    def _aplicar_cambios(self, df, cambios):
+        for columna, valores in cambios.items():
+            mascara = df[self.clave].isin(list(valores))
+            df.loc[mascara, columna] = df.loc[mascara, self.clave].map(valores)
+        return df
+
+    @medido('leer CSV')
+    def _cargar_eventos(self):
+        with self.bloqueo.compartido():
+            base = self._ruta_base()
+            if os.path.exists(base):
+                df = pd.read_csv(base)
+            else:
+                df = pd.DataFrame(columns=self.columnas)
+            eventos = self._leer_eventos()
+        if not eventos:
+            return df
+        altas, cambios = self._separar(eventos)
+        if altas:
+            nuevas = pd.DataFrame(altas)
+            df = nuevas if df.empty else pd.concat([df, nuevas], ignore_index=True)
+        return self._aplicar_cambios(df, cambios)
+
+    def fragmentos(self, filas):
+        """Recorre la tabla (sin consolidar) en DataFrames de hasta ``filas`` filas.
+
+        El CSV base se lee por partes; el diario ya es pequeño porque se
+        compacta al pasar UMBRAL_COMPACTACION, así que sus cambios se
+        aplican a cada parte.
+        """
+        with self.bloqueo.compartido():
+            altas, cambios = self._separar(self._leer_eventos())
+            base = self._ruta_base()
+            if os.path.exists(base):
+                with pd.read_csv(base, chunksize=filas) as lector:
+                    for df in lector:
+                        yield self._aplicar_cambios(df, cambios)
+            for inicio in range(0, len(altas), filas):
+                yield self._aplicar_cambios(pd.DataFrame(altas[inicio:inicio + filas]), cambios)
+
+    def agregar(self, fila):
+        self._anexar({'op': 'alta', 'fila': fila})
+
+    def agregar_varias(self, filas):
+        # Un solo evento: todas las filas quedan escritas o ninguna
+        self._anexar({'op': 'altas', 'filas': filas})
+
+    def actualizar(self, clave, **valores):
+        self._anexar({'op': 'cambio', 'clave': clave, 'valores': valores})
+
+    def reemplazar(self, df):
+        if self.normalizar:
+            df = self.normalizar(df)
+        with self.bloqueo:
+            self._recuperar()
+            _escribir_sincronizado(self.ruta_tmp, df)
+            if os.path.exists(self.ruta_diario):
+                os.replace(self.ruta_diario, self.ruta_compactando)
+            os.replace(self.ruta_tmp, self.ruta)
+            _sincronizar_directorio(self.ruta)
+            if os.path.exists(self.ruta_compactando):
+                os.remove(self.ruta_compactando)
+
+    def compactar(self):
+        with self.bloqueo:
+            self.reemplazar(self.cargar())
+
+
+def _consolidar_cierres(df):
+    return df.groupby(['Dia', 'Concepto'], as_index=False, sort=True)['Monto'].sum()
+
+
+@medido('fechas')
+def _tipar(df):
+    return tipar(df)
+
+
+@medido('filtrar')
+def _filtrar_dia(df, fecha):
+    if fecha is None or df.empty:
+        return df.reset_index(drop=True)
+    return df[df['Dia'] == dia(fecha)].reset_index(drop=True)
+
+
+@medido('filtrar')
+def _filtrar_rango(df, desde, hasta):
+    mascara = pd.Series(True, index=df.index)
+    if desde is not None:
+        mascara &= df['Dia'] >= dia(desde)
+    if hasta is not None:
+        mascara &= df['Dia'] <= dia(hasta)
+    return df[mascara]
+
+
+class AlmacenCSV:
+
+    def __init__(self, directorio=None):
+        # Un único bloqueo para todas las tablas: una operación que toca
+        # pedidos, ítems y cierres queda entera o no empieza
+        self.bloqueo = BloqueoArchivo(_en_datos(DATA_FILE_BLOQUEO, directorio))
+        self.ruta_secuencia = _en_datos(DATA_FILE_SECUENCIA, directorio)
+        self.ruta_version = _en_datos(DATA_FILE_VERSION, directorio)
+        self.pedidos = TablaDiario(_en_datos(DATA_FILE_PEDIDOS, directorio), COLUMNAS_PEDIDOS, clave='ID',
+                                   bloqueo=self.bloqueo, normalizar=para_csv)
+        self.gastos = TablaDiario(_en_datos(DATA_FILE_GASTOS, directorio), COLUMNAS_GASTOS, bloqueo=self.bloqueo,
+                                  normalizar=para_csv)
+        self.caja = TablaDiario(_en_datos(DATA_FILE_CAJA, directorio), COLUMNAS_CAJA, bloqueo=self.bloqueo,
+                                normalizar=para_csv)
+        # Los cierres se guardan como deltas y se suman al cargar/compactar
+        self.cierres = TablaDiario(_en_datos(DATA_FILE_CIERRES, directorio), COLUMNAS_CIERRES,
+                                   consolidar=_consolidar_cierres, bloqueo=self.bloqueo)
+        self.items = TablaDiario(_en_datos(DATA_FILE_ITEMS, directorio), COLUMNAS_ITEMS, bloqueo=self.bloqueo)
+
+    def escritura(self):
+        return self.bloqueo
+
+    def firma(self, tabla):
+        return getattr(self, tabla).firma()
+
+    def cargar_pedidos(self, fecha=None):
+        df = self.pedidos.cargar()
+        _tipar(df)
+        return _filtrar_dia(df, fecha)
+
+    def cargar_pedidos_estado(self, estado):
+        df = self.cargar_pedidos()
+        return df[df['Estado'] == estado].reset_index(drop=True)
+
+    def cursor_pedidos(self):
+        return self.pedidos.cursor()
+
+    def novedades_pedidos(self, cursor):
+        # Altas (filas completas) y cambios (sólo las columnas tocadas) de la cola del diario
+        leidos = self.pedidos.eventos_desde(cursor)
+        if leidos is None:
+            return None
+        eventos, cursor = leidos
+        cambios = []
+        for e in eventos:
+            if e['op'] == 'cambio':
+                cambios.append((int(e['clave']), e['valores']))
+            else:
+                cambios += [(int(f['ID']), f) for f in ([e['fila']] if e['op'] == 'alta' else e['filas'])]
+        return Novedades(cambios, cursor)
+
+    def fragmentos(self, tabla, desde=None, hasta=None, filas=FILAS_POR_FRAGMENTO):
+        # Para exportar sin cargar la tabla completa; sólo tablas con Fecha
+        for df in getattr(self, tabla).fragmentos(filas):
+            _tipar(df)
+            yield _filtrar_rango(df, desde, hasta)
+
+    def cargar_gastos(self, fecha=None):
+        df = self.gastos.cargar()
+        _tipar(df)
+        return _filtrar_dia(df, fecha)
+
+    def cargar_caja(self, fecha=None):
+        df = self.caja.cargar()
+        _tipar(df)
+        return _filtrar_dia(df, fecha)
+
+    def cargar_items(self):
+        return self.items.cargar()
+
+    def agregar_items(self, items):
+        if len(items):
+            self.items.agregar_varias(list(items))
+
+    def cargar_cierres(self, desde=None, hasta=None):
+        df = self.cierres.cargar()
+        if desde is not None:
+            df = df[df['Dia'] >= desde.isoformat()]
+        if hasta is not None:
+            df = df[df['Dia'] <= hasta.isoformat()]
+        return df.reset_index(drop=True)
+
+    def cierres_vacios(self):
+        return not self.cierres.existe()
+
+    def acumular_cierres(self, deltas):
+        if deltas:
+            self.cierres.agregar_varias([dict(zip(COLUMNAS_CIERRES, d)) for d in deltas])
+
+    def reemplazar_cierres(self, df):
+        self.cierres.reemplazar(df[COLUMNAS_CIERRES])
+
+    def siguiente_id_pedido(self):
+        # Reserva el ID: dos terminales nunca reciben el mismo
+        with self.bloqueo:
+            try:
+                with open(self.ruta_secuencia, encoding='utf-8') as f:
+                    ultimo = int(f.read())
+            except (FileNotFoundError, ValueError):
+                df = self.cargar_pedidos()
+                ultimo = int(df['ID'].max()) if not df.empty else 0
+            _escribir_texto_atomico(self.ruta_secuencia, str(ultimo + 1))
+        return ultimo + 1
+
+    def ajustar_secuencia(self, minimo):
+        # La secuencia nunca queda por debajo de un ID ya usado
+        with self.bloqueo:
+            try:
+                with open(self.ruta_secuencia, encoding='utf-8') as f:
+                    ultimo = int(f.read())
+            except (FileNotFoundError, ValueError):
+                ultimo = 0
+            if minimo > ultimo:
+                _escribir_texto_atomico(self.ruta_secuencia, str(minimo))
+
+    def version_esquema(self):
+        # Sin archivo de versión: CSV del gestor anterior, o None si todavía no hay datos
+        try:
+            with open(self.ruta_version, encoding='utf-8') as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return 0 if any(t.existe() for t in (self.pedidos, self.gastos, self.caja, self.items)) else None
+
+    def anotar_version(self, version):
+        _escribir_texto_atomico(self.ruta_version, str(version))
+
+    def archivos(self):
+        # Todo lo que una migración puede reescribir
+        rutas = [self.ruta_secuencia, self.ruta_version]
+        for tabla in (self.pedidos, self.gastos, self.caja, self.cierres, self.items):
+            rutas += [tabla.ruta, tabla.ruta_diario]
+        return rutas
+
+    def agregar_pedido(self, pedido, items=()):
+        with self.bloqueo:
+            self.pedidos.agregar(dict(pedido, Fecha=texto_fecha(pedido['Fecha'])))
+            self.agregar_items(items)
+
+    def actualizar_pedido(self, pedido_id, **valores):
+        self.pedidos.actualizar(int(pedido_id), **valores)
+
+    def agregar_gasto(self, gasto):
+        self.gastos.agregar(dict(gasto, Fecha=texto_fecha(gasto['Fecha'])))
+
+    def agregar_caja(self, apertura):
+        self.caja.agregar(dict(apertura, Fecha=texto_fecha(apertura['Fecha'])))
+
+    def eliminar_dias(self, dias):
+        # Leer y reescribir bajo el mismo bloqueo: un pedido que otra terminal
+        # guarde entre medias no se pierde
+        with self.bloqueo:
+            pedidos = self.cargar_pedidos()
+            dias = [dia(d) for d in dias]
+            borrar = pedidos['Dia'].isin(dias)
+            items = self.items.cargar()
+            self.items.reemplazar(items[~items['ID'].isin(pedidos.loc[borrar, 'ID'])])
+            self.pedidos.reemplazar(pedidos[~borrar])
+            for tabla, cargar in ((self.gastos, self.cargar_gastos), (self.caja, self.cargar_caja)):
+                df = cargar()
+                tabla.reemplazar(df[~df['Dia'].isin(dias)])
+
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS pedidos (
+    ID INTEGER PRIMARY KEY,
+    Nombre_Orden TEXT,
+    Fecha TEXT NOT NULL,
+    Detalle TEXT,
+    Total REAL,
+    Estado TEXT,
+    Metodo_Pago TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_pedidos_fecha ON pedidos (Fecha);
+CREATE INDEX IF NOT EXISTS ix_pedidos_estado ON pedidos (Estado);
+CREATE INDEX IF NOT EXISTS ix_pedidos_metodo_pago ON pedidos (Metodo_Pago);
+CREATE TABLE IF NOT EXISTS gastos (
+    Fecha TEXT NOT NULL,
+    "Descripción" TEXT,
+    Monto REAL
+);
+CREATE INDEX IF NOT EXISTS ix_gastos_fecha ON gastos (Fecha);
+CREATE TABLE IF NOT EXISTS caja (
+    Fecha TEXT NOT NULL,
+    Inicial REAL
+);
+CREATE INDEX IF NOT EXISTS ix_caja_fecha ON caja (Fecha);
+CREATE TABLE IF NOT EXISTS items (
+    ID INTEGER NOT NULL,
+    Categoria TEXT,
+    Producto TEXT,
+    Cantidad INTEGER,
+    Precio_Unitario REAL
+);
+CREATE INDEX IF NOT EXISTS ix_items_id ON items (ID);
+CREATE INDEX IF NOT EXISTS ix_items_producto ON items (Producto);
+CREATE TABLE IF NOT EXISTS secuencias (
+    Nombre TEXT PRIMARY KEY,
+    Valor INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cierres (
+    Dia TEXT NOT NULL,
+    Concepto TEXT NOT NULL,
+    Monto REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (Dia, Concepto)
+);
+CREATE TABLE IF NOT EXISTS cambios_pedidos (
+    Secuencia INTEGER PRIMARY KEY AUTOINCREMENT,
+    ID INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS tr_pedidos_alta AFTER INSERT ON pedidos
+BEGIN INSERT INTO cambios_pedidos (ID) VALUES (NEW.ID); END;
+CREATE TRIGGER IF NOT EXISTS tr_pedidos_cambio AFTER UPDATE ON pedidos
+BEGIN INSERT INTO cambios_pedidos (ID) VALUES (NEW.ID); END;
+CREATE TRIGGER IF NOT EXISTS tr_pedidos_baja AFTER DELETE ON pedidos
+BEGIN INSERT INTO cambios_pedidos (ID) VALUES (OLD.ID); END;
+"""
+
+
+class AlmacenSQLite:
+    """Backend SQLite con índices por Fecha, Estado, Metodo_Pago e ID.
+
+    Las fechas se guardan como texto ISO en hora local de Ecuador, así que el
+    filtro de un día es un rango sobre el índice de Fecha. Los triggers de
+    pedidos anotan cada alta, cambio y baja en cambios_pedidos, de donde la
+    cola de cocina lee sólo lo nuevo.
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or _en_datos(DATA_FILE_DB)
+        # Cada sentencia ya es atómica; el bloqueo agrupa las que forman una
+        # misma operación (pedido + delta del cierre)
+        self.bloqueo = BloqueoArchivo(self.ruta + '.lock')
+        with closing(self._conectar()) as con:
+            con.execute('PRAGMA journal_mode=WAL')
+            con.executescript(ESQUEMA_SQLITE)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def escritura(self):
+        return self.bloqueo
+
+    def firma(self, tabla):
+        # Cualquier escritura toca el -wal o, tras un checkpoint, la base
+        return _firma_archivo(self.ruta), _firma_archivo(self.ruta + '-wal')
+
+    @staticmethod
+    def _sql_rango(tabla, columnas, desde, hasta, orden):
+        lista = ', '.join(f'"{c}"' for c in columnas)
+        condiciones, params = [], []
+        if desde is not None:
+            condiciones.append('Fecha >= ?')
+            params.append(desde.isoformat())
+        if hasta is not None:
+            condiciones.append('Fecha < ?')
+            params.append((hasta + timedelta(days=1)).isoformat())
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        return f'SELECT {lista} FROM {tabla}{donde} ORDER BY {orden}', params
+
+    def _consultar(self, tabla, columnas, fecha, orden='rowid'):
+        sql, params = self._sql_rango(tabla, columnas, fecha, fecha, orden)
+        with medir('leer SQLite'), closing(self._conectar()) as con:
+            df = pd.read_sql_query(sql, con, params=params)
+        _tipar(df)
+        return df
+
+    def fragmentos(self, tabla, desde=None, hasta=None, filas=FILAS_POR_FRAGMENTO):
+        orden = 'ID' if tabla == 'pedidos' else 'rowid'
+        sql, params = self._sql_rango(tabla, COLUMNAS_EXPORTABLES[tabla], desde, hasta, orden)
+        with closing(self._conectar()) as con:
+            for df in pd.read_sql_query(sql, con, params=params, chunksize=filas):
+                _tipar(df)
+                yield df
+
+    def _ejecutar(self, sql, params=()):
+        with closing(self._conectar()) as con, con:
+            con.execute(sql, params)
+
+    def cargar_pedidos(self, fecha=None):
+        return self._consultar('pedidos', COLUMNAS_PEDIDOS, fecha, orden='ID')
+
+    def cargar_pedidos_estado(self, estado):
+        lista = ', '.join(COLUMNAS_PEDIDOS)
+        with medir('leer SQLite'), closing(self._conectar()) as con:
+            df = pd.read_sql_query(f'SELECT {lista} FROM pedidos WHERE Estado = ? ORDER BY ID', con, params=(estado,))
+        _tipar(df)
+        return df
+
+    def cursor_pedidos(self):
+        with closing(self._conectar()) as con:
+            return con.execute('SELECT COALESCE(MAX(Secuencia), 0) FROM cambios_pedidos').fetchone()[0]
+
+    def novedades_pedidos(self, cursor):
+        # Estado actual de cada pedido anotado después del cursor; una baja trae las columnas en NULL
+        lista = ', '.join(f'p.{c}' for c in COLUMNAS_PEDIDOS[1:])
+        with closing(self._conectar()) as con:
+            con.isolation_level = None
+            # Las dos consultas en la misma transacción de lectura (misma instantánea)
+            con.execute('BEGIN')
+            try:
+                primero = con.execute('SELECT MIN(Secuencia) FROM cambios_pedidos').fetchone()[0]
+                if primero is not None and primero > cursor + 1:
+                    return None
+                filas = con.execute(
+                    f'SELECT c.Secuencia, c.ID, {lista} FROM cambios_pedidos c '
+                    f'LEFT JOIN pedidos p ON p.ID = c.ID WHERE c.Secuencia > ? ORDER BY c.Secuencia',
+                    (cursor,),
+                ).fetchall()
+            finally:
+                con.execute('COMMIT')
+        cambios = [(fila[1], dict(zip(COLUMNAS_PEDIDOS, fila[1:]))) for fila in filas]
+        return Novedades(cambios, filas[-1][0] if filas else cursor)
+
+    def cargar_gastos(self, fecha=None):
+        return self._consultar('gastos', COLUMNAS_GASTOS, fecha)
+
+    def cargar_caja(self, fecha=None):
+        return self._consultar('caja', COLUMNAS_CAJA, fecha)
+
+    def inicial_caja(self, fecha):
+        sql, params = self._sql_rango('caja', ['Inicial'], fecha, fecha, 'rowid')
+        with closing(self._conectar()) as con:
+            fila = con.execute(sql + ' LIMIT 1', params).fetchone()
+        return None if fila is None else float(fila[0])
+
+    def cargar_items(self):
+        with medir('leer SQLite'), closing(self._conectar()) as con:
+            return pd.read_sql_query('SELECT ID, Categoria, Producto, Cantidad, Precio_Unitario FROM items ORDER BY rowid', con)
+
+    def agregar_items(self, items, con=None):
+        sql = 'INSERT INTO items (ID, Categoria, Producto, Cantidad, Precio_Unitario) VALUES (?, ?, ?, ?, ?)'
+        filas = [tuple(item[c] for c in COLUMNAS_ITEMS) for item in items]
+        if con is not None:
+            con.executemany(sql, filas)
+            return
+        with closing(self._conectar()) as con, con:
+            con.executemany(sql, filas)
+
+    def cargar_cierres(self, desde=None, hasta=None):
+        sql = 'SELECT Dia, Concepto, Monto FROM cierres WHERE Dia >= ? AND Dia <= ? ORDER BY Dia, Concepto'
+        params = (desde.isoformat() if desde else '', hasta.isoformat() if hasta else '9999')
+        with closing(self._conectar()) as con:
+            return pd.read_sql_query(sql, con, params=params)
+
+    def cierres_vacios(self):
+        with closing(self._conectar()) as con:
+            return con.execute('SELECT 1 FROM cierres LIMIT 1').fetchone() is None
+
+    def acumular_cierres(self, deltas):
+        with closing(self._conectar()) as con, con:
+            con.executemany(
+                'INSERT INTO cierres (Dia, Concepto, Monto) VALUES (?, ?, ?) '
+                'ON CONFLICT (Dia, Concepto) DO UPDATE SET Monto = Monto + excluded.Monto',
+                deltas,
+            )
+
+    def reemplazar_cierres(self, df):
+        with closing(self._conectar()) as con, con:
+            con.execute('DELETE FROM cierres')
+            con.executemany('INSERT INTO cierres (Dia, Concepto, Monto) VALUES (?, ?, ?)',
+                            df[COLUMNAS_CIERRES].itertuples(index=False, name=None))
+
+    def siguiente_id_pedido(self):
+        # BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer la secuencia
+        with closing(self._conectar()) as con:
+            con.isolation_level = None
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                con.execute("INSERT OR IGNORE INTO secuencias (Nombre, Valor) "
+                            "SELECT 'pedidos', COALESCE(MAX(ID), 0) FROM pedidos")
+                con.execute("UPDATE secuencias SET Valor = Valor + 1 WHERE Nombre = 'pedidos'")
+                valor = con.execute("SELECT Valor FROM secuencias WHERE Nombre = 'pedidos'").fetchone()[0]
+                con.execute('COMMIT')
+            except BaseException:
+                con.execute('ROLLBACK')
+                raise
+        return valor
+
+    def agregar_pedido(self, pedido, items=()):
+        fila = dict(pedido, Fecha=texto_fecha(pedido['Fecha']))
+        with closing(self._conectar()) as con, con:
+            con.execute(
+                'INSERT INTO pedidos (ID, Nombre_Orden, Fecha, Detalle, Total, Estado, Metodo_Pago) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                tuple(fila[c] for c in COLUMNAS_PEDIDOS),
+            )
+            self.agregar_items(items, con)
+
+    def actualizar_pedido(self, pedido_id, **valores):
+        asignaciones = ', '.join(f'"{c}" = ?' for c in valores if c in COLUMNAS_PEDIDOS)
+        self._ejecutar(f'UPDATE pedidos SET {asignaciones} WHERE ID = ?', (*valores.values(), int(pedido_id)))
+
+    def agregar_gasto(self, gasto):
+        self._ejecutar(
+            'INSERT INTO gastos (Fecha, "Descripción", Monto) VALUES (?, ?, ?)',
+            (texto_fecha(gasto['Fecha']), gasto['Descripción'], gasto['Monto']),
+        )
+
+    def agregar_caja(self, apertura):
+        self._ejecutar(
+            'INSERT INTO caja (Fecha, Inicial) VALUES (?, ?)',
+            (texto_fecha(apertura['Fecha']), apertura['Inicial']),
+        )
+
+    def eliminar_dias(self, dias):
+        with closing(self._conectar()) as con, con:
+            for d in dias:
+                params = (d.isoformat(), (d + timedelta(days=1)).isoformat())
+                con.execute('DELETE FROM items WHERE ID IN (SELECT ID FROM pedidos WHERE Fecha >= ? AND Fecha < ?)', params)
+                for tabla in ('pedidos', 'gastos', 'caja'):
+                    con.execute(f'DELETE FROM {tabla} WHERE Fecha >= ? AND Fecha < ?', params)
+            # Al cerrar el día se poda el registro de cambios; las colas que
+            # quedaron atrás lo notan por el hueco y recargan
+            con.execute('DELETE FROM cambios_pedidos WHERE Secuencia < (SELECT MAX(Secuencia) FROM cambios_pedidos)')
+
+
+def crear_almacen(backend=BACKEND, directorio=None):
+    if backend == 'sqlite':
+        return AlmacenSQLite(_en_datos(DATA_FILE_DB, directorio))
+    if backend == 'csv':
+        return AlmacenCSV(directorio)
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend!r}")
+
+
+def migrar_csv_a_sqlite(origen=None, destino=None):
+    # Migración única: copia las tablas que aún estén vacías en la base SQLite
+    origen = origen or AlmacenCSV()
+    destino = destino or AlmacenSQLite()
+    migrar_esquema(origen)
+    migrados = {}
+    with destino.escritura(), closing(destino._conectar()) as con, con:
+        for tabla, columnas, cargar in (
+            ('pedidos', COLUMNAS_PEDIDOS, origen.cargar_pedidos),
+            ('gastos', COLUMNAS_GASTOS, origen.cargar_gastos),
+            ('caja', COLUMNAS_CAJA, origen.cargar_caja),
+            ('cierres', COLUMNAS_CIERRES, lambda: origen.cargar_cierres() if not origen.cierres_vacios() else
+                _calcular_cierres(origen.cargar_pedidos(), origen.cargar_gastos(), origen.cargar_caja())),
+            ('items', COLUMNAS_ITEMS, origen.cargar_items),
+        ):
+            if con.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]:
+                migrados[tabla] = 0
+                continue
+            df = cargar()[columnas]
+            if 'Fecha' in columnas:
+                df['Fecha'] = df['Fecha'].astype(str)
+            marcas = ', '.join('?' for _ in columnas)
+            lista = ', '.join(f'"{c}"' for c in columnas)
+            con.executemany(
+                f'INSERT INTO {tabla} ({lista}) VALUES ({marcas})',
+                df.astype(object).where(df.notna(), None).itertuples(index=False, name=None),
+            )
+            migrados[tabla] = len(df)
+    return migrados
+
+
+class CacheTablas:
+    """Caché en proceso de las tablas cargadas, compartida entre reruns y sesiones.
+
+    Cada entrada se valida con la generación de escritura de su tabla (que
+    suben las funciones de guardado de este proceso) y con la firma en disco
+    del backend (mtime/tamaño), que detecta escrituras de otros procesos.
+    """
+
+    def __init__(self):
+        self._entradas = {}
+        self._derivados = {}
+        self._generaciones = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, tabla, fecha, cargar):
+        firma = (self._generaciones.get(tabla, 0), _firma_tabla(tabla))
+        with self._lock:
+            entrada = self._entradas.get((tabla, fecha))
+            if entrada is not None and entrada[0] == firma:
+                self.aciertos += 1
+                return entrada[1].copy()
+            self.fallos += 1
+        df = cargar(fecha)
+        with self._lock:
+            if firma[0] == self._generaciones.get(tabla, 0):
+                self._entradas[(tabla, fecha)] = (firma, df)
+                por_dia = [k for k in self._entradas if k[0] == tabla and k[1] is not None]
+                for clave in por_dia[:-MAX_DIAS_EN_CACHE]:
+                    del self._entradas[clave]
+        return df.copy()
+
+    def derivado(self, tablas, nombre, construir):
+        """Objeto de sólo lectura calculado desde una o más tablas (índices, agregados).
+
+        Se valida con las mismas generaciones y firmas que las tablas de las
+        que sale y se comparte sin copiar.
+        """
+        tablas = (tablas,) if isinstance(tablas, str) else tuple(tablas)
+        generaciones = tuple(self._generaciones.get(t, 0) for t in tablas)
+        firma = (generaciones, tuple(_firma_tabla(t) for t in tablas))
+        with self._lock:
+            entrada = self._derivados.get((tablas, nombre))
+            if entrada is not None and entrada[0] == firma:
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+        valor = construir()
+        with self._lock:
+            if generaciones == tuple(self._generaciones.get(t, 0) for t in tablas):
+                self._derivados[(tablas, nombre)] = (firma, valor)
+                for clave in list(self._derivados)[:-MAX_DIAS_EN_CACHE]:
+                    del self._derivados[clave]
+        return valor
+
+    def invalidar(self, *tablas):
+        with self._lock:
+            for tabla in tablas:
+                self._generaciones[tabla] = self._generaciones.get(tabla, 0) + 1
+                for clave in [k for k in self._entradas if k[0] == tabla]:
+                    del self._entradas[clave]
+                self._derivados = {k: v for k, v in self._derivados.items() if tabla not in k[0]}
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'invalidaciones': self.invalidaciones,
+                'entradas': len(self._entradas),
+            }
+
+
+almacen = crear_almacen()
+archivo = Archivo(_en_datos(DATA_DIR_ARCHIVO))
+cache = CacheTablas()
+cola_cocina = ColaCocina(almacen)
+
+
+_almacenes_sucursal = {}
+_lock_sucursales = threading.Lock()
+
+
+def _almacen_sucursal(sucursal):
+    # Backend de otra sucursal, creado una vez; desde aquí sólo se lee
+    with _lock_sucursales:
+        if sucursal not in _almacenes_sucursal:
+            _almacenes_sucursal[sucursal] = crear_almacen(BACKEND, directorio_sucursal(sucursal))
+        return _almacenes_sucursal[sucursal]
+
+
+def _firma_tabla(tabla):
+    # 'archivo:<tabla>' son las particiones históricas, 'sucursal:<nombre>' los
+    # cierres de otra sucursal; el resto, tablas vivas
+    if tabla.startswith('archivo:'):
+        return archivo.firma(tabla.split(':', 1)[1])
+    if tabla.startswith('sucursal:'):
+        return _almacen_sucursal(tabla.split(':', 1)[1]).firma('cierres')
+    return almacen.firma(tabla)
+
+
+def estadisticas_cache():
+    return cache.estadisticas()
+
+
+def cargar_pedidos(fecha=None):
+    return cache.obtener('pedidos', fecha, almacen.cargar_pedidos)
+
+
+def cargar_gastos(fecha=None):
+    return cache.obtener('gastos', fecha, almacen.cargar_gastos)
+
+
+def cargar_caja(fecha=None):
+    return cache.obtener('caja', fecha, almacen.cargar_caja)
+
+
+def inicial_caja(fecha):
+    """Inicial de la caja abierta ese día, o None si no se abrió.
+
+    En SQLite cualquier escritura invalida la caché de todas las tablas: en
+    vez de recargar la caja en cada pedido se consulta sólo esa fila.
+    """
+    if isinstance(almacen, AlmacenSQLite):
+        return almacen.inicial_caja(fecha)
+    caja = cargar_caja(fecha)
+    return None if caja.empty else float(caja['Inicial'].iloc[0])
+
+
+def cargar_items():
+    return cache.obtener('items', None, lambda _: almacen.cargar_items())
+
+
+def cargar_archivo(tabla, desde=None, hasta=None):
+    columnas = COLUMNAS_ITEMS if tabla == 'items' else COLUMNAS_EXPORTABLES[tabla]
+    if tabla == 'items':
+        return cache.obtener('archivo:items', (desde, hasta), lambda rango: archivo.cargar(tabla, columnas, *rango))
+    return cache.obtener(f'archivo:{tabla}', (desde, hasta), lambda rango: _tipar(archivo.cargar(tabla, columnas, *rango)))
+
+
+def _unir(*partes):
+    partes = [df for df in partes if not df.empty]
+    if len(partes) == 1:
+        return partes[0].reset_index(drop=True)
+    # Categorías distintas en cada parte dejan texto al concatenar
+    return categorias(pd.concat(partes, ignore_index=True)) if partes else None
+
+
+def _con_archivo(tabla, vivo, desde=None, hasta=None):
+    df = _unir(cargar_archivo(tabla, desde, hasta), vivo)
+    return vivo.iloc[:0] if df is None else df
+
+
+def historial(tabla, desde=None, hasta=None):
+    """Tabla viva más el archivo de días cerrados, limitada al rango.
+
+    Del archivo sólo se leen los meses que se cruzan con [desde, hasta].
+    Los ítems (sin Fecha) se devuelven completos para los meses del rango.
+    """
+    if tabla == 'items':
+        vivo = cargar_items()
+    else:
+        vivo = _filtrar_rango({'pedidos': cargar_pedidos, 'gastos': cargar_gastos, 'caja': cargar_caja}[tabla](), desde, hasta)
+    return _con_archivo(tabla, vivo, desde, hasta)
+
+
+def _fragmentos_historial(tabla, desde, hasta):
+    # Primero las particiones archivadas (una a la vez), después la tabla viva
+    yield from archivo.fragmentos(tabla, desde, hasta)
+    yield from almacen.fragmentos(tabla, desde, hasta)
+
+
+def exportar(tabla, ruta, desde=None, hasta=None):
+    # Respaldo directo a disco, bloque por bloque; el formato sale de la extensión
+    formato = formato_de_ruta(ruta)
+    with open(ruta, 'wb') as destino:
+        escribir(_fragmentos_historial(tabla, desde, hasta), destino, formato, COLUMNAS_EXPORTABLES[tabla])
+
+
+def exportar_bytes(tabla, formato, desde=None, hasta=None):
+    return a_bytes(_fragmentos_historial(tabla, desde, hasta), formato, COLUMNAS_EXPORTABLES[tabla])
+
+
+def estadisticas_historial(desde=None, hasta=None):
+    # Se recalcula sólo cuando cambia alguna tabla viva o archivada de la que sale
+    tablas = ('pedidos', 'items', 'gastos', 'archivo:pedidos', 'archivo:items', 'archivo:gastos')
+    return cache.derivado(tablas, ('estadisticas', desde, hasta), lambda: calcular_estadisticas(
+        historial('pedidos', desde, hasta), historial('items', desde, hasta), historial('gastos', desde, hasta)))
+
+
+def cambiar_precio(categoria, producto, precio, desde=None):
+    """Agrega al catálogo una versión con el nuevo precio, vigente desde ``desde`` (ahora).
+
+    Las apps abiertas la toman en su próximo rerun, sin reiniciarse.
+    """
+    with BloqueoArchivo(archivo_menu.ruta + '.lock'):
+        catalogo = archivo_menu.actual()
+        if archivo_menu.error:
+            # No se reescribe encima de un archivo que no se pudo leer
+            raise RuntimeError(f"No se pudo leer {archivo_menu.ruta}: {archivo_menu.error}")
+        desde = fecha(desde or pd.Timestamp.now(tz='UTC')).floor('s').to_pydatetime()
+        guardar_catalogo(archivo_menu.ruta, catalogo.con_precio(desde, categoria, producto, precio))
+    return archivo_menu.actual().vigente(desde)
+
+
+def backfill_items():
+    with almacen.escritura():
+        pedidos = cargar_pedidos()
+        nuevos = items_de_detalle(pedidos[~pedidos['ID'].isin(cargar_items()['ID'])])
+        almacen.agregar_items(nuevos.to_dict('records'))
+        cache.invalidar('items')
+    return len(nuevos)
+
+
+def ventas_productos(desde, hasta):
+    return ventas_por_producto(historial('pedidos', desde, hasta), historial('items', desde, hasta))
+
+
+def cargar_cierres(desde=None, hasta=None):
+    return cache.obtener('cierres', (desde, hasta), lambda rango: almacen.cargar_cierres(*rango))
+
+
+def _resumir_cierres(df, metodos):
+    # Tabla materializada (Dia, Concepto, Monto) -> una fila por día con el cierre calculado
+    resumen = df.groupby(['Dia', 'Concepto'])['Monto'].sum().unstack(fill_value=0.0)
+    resumen = resumen.reindex(columns=['Inicial', *metodos, 'Gastos'], fill_value=0.0)
+    resumen.index = pd.Index(pd.to_datetime(resumen.index).date, name='Dia')
+    return completar_cierres(resumen, metodos)
+
+
+@medido('cierres')
+def resumen_cierres(metodos, desde=None, hasta=None):
+    # Una fila por día con el cierre ya calculado, leído de la tabla materializada
+    return _resumir_cierres(cargar_cierres(desde, hasta), metodos)
+
+
+def sucursales():
+    """Nombres de las sucursales: las carpetas de DIR_SUCURSALES.
+
+    Un proceso sin sucursal atiende el local único del directorio actual,
+    que aparece como '' junto a las demás.
+    """
+    nombres = sorted(n for n in os.listdir(DIR_SUCURSALES)
+                     if os.path.isdir(os.path.join(DIR_SUCURSALES, n))) if os.path.isdir(DIR_SUCURSALES) else []
+    return nombres if SUCURSAL else ['', *nombres]
+
+
+def _resumen_sucursal(sucursal, metodos, desde, hasta):
+    # La propia se valida con la tabla 'cierres'; las demás, con su firma en disco
+    propia = sucursal == SUCURSAL
+    fuente = almacen if propia else _almacen_sucursal(sucursal)
+    return cache.derivado('cierres' if propia else f'sucursal:{sucursal}', ('resumen', desde, hasta, tuple(metodos)),
+                          lambda: _resumir_cierres(fuente.cargar_cierres(desde, hasta), metodos))
+
+
+@medido('cierres')
+def resumen_sucursales(metodos, desde=None, hasta=None, hilos=MAX_HILOS_SUCURSALES):
+    """Cierres de todas las sucursales: una fila por (Sucursal, Dia).
+
+    Cada sucursal aporta sólo su tabla materializada de cierres, leída en un
+    hilo propio (leer el CSV o consultar SQLite suelta el GIL); su resumen
+    queda en caché hasta que cambie su firma en disco, así una sucursal sin
+    movimiento no se vuelve a leer.
+    """
+    nombres = sucursales()
+    with ThreadPoolExecutor(max(1, min(len(nombres), hilos))) as pool:
+        partes = list(pool.map(lambda s: _resumen_sucursal(s, metodos, desde, hasta), nombres))
+    return pd.concat(partes, keys=nombres, names=['Sucursal', 'Dia'])
+
+
+def _dia(fecha):
+    return pd.Timestamp(fecha).date().isoformat()
+
+
+def _deltas_venta(pedido, signo):
+    if pedido is None or pedido['Estado'] != 'Pagado':
+        return []
+    return [(_dia(pedido['Fecha']), pedido['Metodo_Pago'], signo * float(pedido['Total']))]
+
+
+def indice_pedidos():
+    # Se reconstruye sólo cuando cambia la tabla de pedidos, no en cada tecla
+    return cache.derivado('pedidos', 'indice', lambda: IndicePedidos(cargar_pedidos()))
+
+
+def obtener_pedido(pedido_id):
+    return indice_pedidos().pedido(pedido_id)
+
+
+def buscar_pedido(pedido_id):
+    # Un pedido en cocina sale de su cola (al día con un stat); los demás, del índice del historial
+    cola_cocina.sincronizar()
+    return cola_cocina.pedido(pedido_id) or obtener_pedido(pedido_id)
+
+
+def siguiente_id_pedido():
+    return almacen.siguiente_id_pedido()
+
+
+def escritura():
+    # Bloqueo del almacén para comprobar y escribir sin que otra terminal se cruce
+    return almacen.escritura()
+
+
+def escritura_vaciada():
+    # escritura() con la cola de pedidos ya guardada; no tomarla dentro de escritura()
+    return cola_pedidos.vaciada()
+
+
+# Cada guardado corre bajo almacen.escritura(): el dato y su delta del
+# cierre se escriben juntos aunque otra terminal esté guardando a la vez
+
+@medido('guardar')
+def agregar_pedido(pedido, items=()):
+    with almacen.escritura():
+        almacen.agregar_pedido(pedido, items)
+        almacen.acumular_cierres(_deltas_venta(pedido, 1))
+        cache.invalidar('pedidos', 'items', 'cierres')
+
+
+@medido('guardar')
+def actualizar_pedido(pedido_id, anterior=None, **valores):
+    # El resumen del día sólo cambia si el pedido entra o sale de 'Pagado'.
+    # anterior: el pedido como ya lo tiene quien llama; si no, se busca en el índice
+    with almacen.escritura():
+        anterior = anterior or obtener_pedido(pedido_id)
+        almacen.actualizar_pedido(pedido_id, **valores)
+        if anterior is not None:
+            deltas = _deltas_venta(anterior, -1) + _deltas_venta({**anterior, **valores}, 1)
+            almacen.acumular_cierres(deltas)
+        cache.invalidar('pedidos', 'cierres')
+
+
+@medido('guardar')
+def encolar_pedido(pedido, items=()):
+    """Acepta un pedido sin ID sin esperar al almacén; devuelve su token.
+
+    Lo guarda el hilo de cola_pedidos, que le asigna el ID y hace lo mismo
+    que agregar_pedido.
+    """
+    return cola_pedidos.encolar(pedido, items)
+
+
+def esperar_pedido(token, segundos):
+    # ID asignado al pedido encolado, o None si todavía no se guardó
+    return cola_pedidos.esperar(token, segundos)
+
+
+def estado_cola():
+    return cola_pedidos.estado()
+
+
+def _reparar_cola():
+    # Tras completar un vaciado cortado no se sabe qué deltas del cierre alcanzaron a escribirse
+    reconstruir_cierres()
+    cache.invalidar('pedidos', 'items')
+
+
+def pedidos_cocina():
+    return cola_cocina.pendientes()
+
+
+def entregar_pedido(pedido_id):
+    """Marca como entregado un pedido de la cola de cocina; False si ya no estaba.
+
+    El pedido sale de la cola (puesta al día dentro del bloqueo), no del
+    índice del historial, así que no hace falta recargar la tabla.
+    """
+    with almacen.escritura():
+        cola_cocina.sincronizar()
+        pedido = cola_cocina.pedido(pedido_id)
+        if pedido is None:
+            return False
+        actualizar_pedido(pedido_id, anterior=pedido, Estado='Entregado')
+    return True
+
+
+@medido('guardar')
+def agregar_gasto(gasto):
+    with almacen.escritura():
+        almacen.agregar_gasto(gasto)
+        almacen.acumular_cierres([(_dia(gasto['Fecha']), 'Gastos', float(gasto['Monto']))])
+        cache.invalidar('gastos', 'cierres')
+
+
+@medido('guardar')
+def agregar_caja(apertura):
+    # El Inicial del cierre es el de la primera apertura del día, como en
+    # calcular_cierres: reabrir la caja tras cerrarla no lo vuelve a sumar.
+    # Se mira en la caja misma (viva o ya archivada), no en los cierres
+    # derivados, que al reconstruirse omiten un Inicial de 0
+    with almacen.escritura():
+        dia_apertura = date.fromisoformat(_dia(apertura['Fecha']))
+        reapertura = not historial('caja', dia_apertura, dia_apertura).empty
+        almacen.agregar_caja(apertura)
+        if not reapertura:
+            almacen.acumular_cierres([(dia_apertura.isoformat(), 'Inicial', float(apertura['Inicial']))])
+        cache.invalidar('caja', 'cierres')
+
+
+@medido('archivar')
+def archivar_dias(dias):
+    """Mueve los días cerrados de las tablas vivas al archivo histórico.
+
+    Primero se escribe el archivo y después se borra de las tablas vivas;
+    si algo falla entre medias, volver a archivar reemplaza esas filas en
+    lugar de duplicarlas, y lo archivado antes del mismo día se conserva.
+    El resumen materializado de cierres no se toca.
+    """
+    dias = set(dias)
+    # Los pedidos aceptados de esos días que sigan en la cola entran antes de archivar
+    with cola_pedidos.vaciada():
+        claves = [dia(d) for d in dias]
+        pedidos = cargar_pedidos()
+        pedidos = pedidos[pedidos['Dia'].isin(claves)]
+        gastos, caja = cargar_gastos(), cargar_caja()
+        items = cargar_items()
+        archivo.guardar_dias(
+            para_guardar(pedidos),
+            para_guardar(gastos[gastos['Dia'].isin(claves)]),
+            para_guardar(caja[caja['Dia'].isin(claves)]),
+            items[items['ID'].isin(pedidos['ID'])],
+        )
+        almacen.eliminar_dias(dias)
+        cache.invalidar('pedidos', 'items', 'gastos', 'caja',
+                        'archivo:pedidos', 'archivo:items', 'archivo:gastos', 'archivo:caja')
+    return len(pedidos)
+
+
+def archivar_dia(fecha):
+    return archivar_dias([fecha])
+
+
+def archivar_hasta(hasta):
+    # Para pasar al archivo un historial vivo que ya creció (CLI)
+    dias = pd.concat([cargar_pedidos()['Dia'], cargar_gastos()['Dia'], cargar_caja()['Dia']]).dropna().unique()
+    return archivar_dias(d.date() for d in dias if d.date() <= hasta)
+
+
+def _calcular_cierres(pedidos, gastos, caja):
+    diario = calcular_cierres(pedidos, gastos, caja)
+    df = diario.drop(columns=['Total_Ventas', 'Ganancia_Neta', 'Caja_Final']).stack().rename('Monto').reset_index()
+    df.columns = COLUMNAS_CIERRES
+    df['Dia'] = df['Dia'].astype(str)
+    return df[df['Monto'] != 0].reset_index(drop=True)
+
+
+def reconstruir_cierres(fuente=None):
+    # Recalcula la tabla materializada desde los datos crudos, archivo incluido
+    fuente = fuente or almacen
+    with fuente.escritura():
+        fuente.reemplazar_cierres(_calcular_cierres(
+            _con_archivo('pedidos', fuente.cargar_pedidos()),
+            _con_archivo('gastos', fuente.cargar_gastos()),
+            _con_archivo('caja', fuente.cargar_caja()),
+        ))
+        cache.invalidar('cierres')
+
+
+def _migrar_columnas(csv):
+    df = completar_pedidos(csv.pedidos.cargar())
+    csv.pedidos.reemplazar(df[COLUMNAS_PEDIDOS])
+    # El gestor anterior no usaba la secuencia
+    csv.ajustar_secuencia(int(df['ID'].max()) if not df.empty else 0)
+    return f"{len(df)} pedidos"
+
+
+def _migrar_fechas(csv):
+    # Compactar reescribe el CSV base con Fecha canónica (para_csv)
+    tablas = [t for t in (csv.pedidos, csv.gastos, csv.caja) if t.existe()]
+    for tabla in tablas:
+        tabla.compactar()
+    return f"{len(tablas)} tablas"
+
+
+def _migrar_items(csv):
+    pedidos, items = csv.pedidos.cargar(), csv.items.cargar()
+    nuevos = items_de_detalle(pedidos[~pedidos['ID'].isin(items['ID'])])
+    if not nuevos.empty:
+        csv.items.reemplazar(pd.concat([items, nuevos], ignore_index=True)[COLUMNAS_ITEMS])
+    return f"{len(nuevos)} ítems creados"
+
+
+# (versión a la que lleva, descripción, paso); cada paso puede repetirse sin daño
+MIGRACIONES = [
+    (1, "ID, Nombre_Orden y Metodo_Pago en todos los pedidos", _migrar_columnas),
+    (2, "Fecha canónica en pedidos, gastos y caja", _migrar_fechas),
+    (3, "Ítems desde Detalle con los precios de cada menú", _migrar_items),
+]
+
+
+def _respaldar(csv, sufijo):
+    respaldos = []
+    for ruta in csv.archivos():
+        if os.path.exists(ruta):
+            shutil.copy2(ruta, ruta + sufijo)
+            respaldos.append(ruta + sufijo)
+    return respaldos
+
+
+def _restaurar(csv, sufijo):
+    for ruta in csv.archivos():
+        if os.path.exists(ruta + sufijo):
+            shutil.copy2(ruta + sufijo, ruta)
+        elif os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def migrar_esquema(csv=None):
+    """Lleva los CSV a VERSION_ESQUEMA, una sola vez; devuelve el reporte o None si no había nada que hacer.
+
+    Antes se respaldan los archivos. Cada paso anota su versión al
+    terminar, así un corte a medias sigue desde el último paso. Si al final
+    las filas o los totales por día no coinciden con los de antes, se
+    restauran los respaldos y se lanza RuntimeError con el reporte.
+    """
+    csv = csv or almacen
+    with csv.escritura():
+        version = csv.version_esquema()
+        if version is None:
+            csv.anotar_version(VERSION_ESQUEMA)
+            return None
+        if version >= VERSION_ESQUEMA:
+            return None
+        sufijo = f'.v{version}.bak'
+        respaldos = _respaldar(csv, sufijo)
+        antes = {tabla: getattr(csv, tabla).cargar() for tabla in IMPORTES}
+        try:
+            pasos = []
+            for numero, descripcion, paso in MIGRACIONES:
+                if numero > version:
+                    pasos.append(f"v{numero}: {descripcion} ({paso(csv)})")
+                    csv.anotar_version(numero)
+            pedidos = csv.pedidos.cargar()
+            reporte = ReporteMigracion(
+                version, VERSION_ESQUEMA, pasos,
+                [verificar(tabla, antes[tabla], pedidos if tabla == 'pedidos' else getattr(csv, tabla).cargar())
+                 for tabla in IMPORTES],
+                descuadres(pedidos, csv.items.cargar()), respaldos,
+            )
+        except BaseException:
+            _restaurar(csv, sufijo)
+            raise
+        with open(_en_datos(DATA_FILE_REPORTE_MIGRACION), 'a', encoding='utf-8') as f:
+            f.write(reporte.texto() + "\n\n")
+        if not reporte.ok:
+            _restaurar(csv, sufijo)
+            raise RuntimeError(f"La migración no cuadra; se restauraron los archivos.\n{reporte.texto()}")
+        cache.invalidar('pedidos', 'items', 'gastos', 'caja')
+        # Metodo_Pago completado cambia las ventas por método de los días viejos
+        reconstruir_cierres(csv)
+    return reporte
+
+
+# CSV de versiones anteriores: se migran antes de usarlos
+if isinstance(almacen, AlmacenCSV):
+    migrar_esquema()
+
+# Se vuelve a comprobar con el bloqueo tomado: si dos terminales arrancan a la
+# vez sólo una reconstruye, y nunca encima de deltas ya anexados por la otra
+with almacen.escritura():
+    if almacen.cierres_vacios():
+        reconstruir_cierres()
+
+# Si quedaron pedidos en la cola (la app se cerró o se cayó), su hilo arranca ya
+cola_pedidos = ColaPedidos(_en_datos(DATA_FILE_COLA), almacen, agregar_pedido, _reparar_cola, BloqueoArchivo)
+atexit.register(cola_pedidos.cerrar)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['migrar']:
+        for tabla, filas in migrar_csv_a_sqlite().items():
+            print(f"{tabla}: {filas} filas migradas a {_en_datos(DATA_FILE_DB)}")
+    elif sys.argv[1:] == ['migrar-esquema']:
+        # La migración ya corrió al importar si el backend es CSV; aquí también con SQLite
+        reporte = migrar_esquema(almacen if isinstance(almacen, AlmacenCSV) else AlmacenCSV())
+        print(reporte.texto() if reporte else
+              f"Los CSV ya están en la versión {VERSION_ESQUEMA} del esquema (reportes en {_en_datos(DATA_FILE_REPORTE_MIGRACION)})")
+    elif sys.argv[1:] == ['vaciar-cola']:
+        cola_pedidos.cerrar()
+        while cola_pedidos.vaciar():
+            pass
+        print(f"Pedidos guardados desde la cola: {cola_pedidos.guardados}")
+    elif sys.argv[1:] == ['reconstruir-cierres']:
+        reconstruir_cierres()
+        print(f"Cierres reconstruidos: {len(cargar_cierres())} filas")
+    elif sys.argv[1:] == ['backfill-items']:
+        print(f"Ítems reconstruidos desde Detalle: {backfill_items()}")
+    elif sys.argv[1:2] == ['precio'] and len(sys.argv) in (5, 6):
+        version = cambiar_precio(sys.argv[2], sys.argv[3], float(sys.argv[4]), *sys.argv[5:])
+        print(f"{sys.argv[2]} - {sys.argv[3]}: ${float(sys.argv[4]):.2f} desde {version.desde:%Y-%m-%d %H:%M} "
+              f"(catálogo en {archivo_menu.ruta})")
+    elif sys.argv[1:2] == ['archivar'] and len(sys.argv) == 3:
+        print(f"Pedidos archivados: {archivar_hasta(pd.Timestamp(sys.argv[2]).date())}")
+    elif sys.argv[1:2] == ['exportar'] and len(sys.argv) in (4, 6) and sys.argv[2] in COLUMNAS_EXPORTABLES:
+        rango = [pd.Timestamp(f).date() for f in sys.argv[4:6]] or [None, None]
+        exportar(sys.argv[2], sys.argv[3], *rango)
+        print(f"{sys.argv[2]} exportado a {sys.argv[3]}")
+    else:
+        sys.exit("Uso: python almacen.py migrar | migrar-esquema | vaciar-cola | reconstruir-cierres | backfill-items\n"
+                 "       python almacen.py archivar HASTA\n"
+                 "       python almacen.py precio CATEGORIA PRODUCTO PRECIO [DESDE]\n"
+                 "       python almacen.py exportar pedidos|gastos|caja ARCHIVO.csv[.gz]|.parquet [DESDE HASTA]")
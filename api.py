@@ -0,0 +1,202 @@
+"""API HTTP/JSON del local, sobre el mismo almacén que la app de Streamlit.
+
+Expone las operaciones de servicio.py para integrar, por ejemplo, una app de
+delivery o una terminal de pago, sin pasar por la interfaz. Es asíncrona:
+cada operación (pandas, bloqueos de archivo) corre en el pool de hilos de
+Starlette y el bucle de eventos sigue atendiendo otras peticiones. Los
+pedidos entran por la cola de almacen, que los guarda por lotes; si su ID
+no llega en ESPERA_ID_S la respuesta es 202 con un token para consultarlo.
+
+Con ESCONDITE_API_TOKEN cada petición debe traer "Authorization: Bearer <token>".
+
+    GET   /menu                      versión vigente del menú
+    GET   /caja/{fecha}              apertura del día
+    POST  /caja/apertura             {"inicial": 20.0}
+    POST  /caja/cierre               {"fecha": "2025-01-31"} (hoy por defecto): archiva el día
+    POST  /pedidos                   {"nombre", "carrito": {"Categoría - Producto": n}, "metodo_pago"}
+    GET   /pedidos/cola/{token}      ID de un pedido encolado
+    GET   /pedidos/{id}
+    PATCH /pedidos/{id}              {"estado", "estado_anterior" (opcional)}
+    GET   /cierres?desde=&hasta=     cierres diarios del rango (todos sin desde/hasta)
+    GET   /cierres/{fecha}
+    GET   /estado                    cola de guardado
+
+Uso: python api.py [--host 127.0.0.1] [--port 8000] [--workers 1]
+"""
+import argparse
+import hmac
+import math
+import os
+from datetime import date, datetime
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import servicio
+from almacen import esperar_pedido, estado_cola
+from catalogo import TZ_EC, archivo_menu
+
+TOKEN = os.environ.get('ESCONDITE_API_TOKEN', '')
+
+# Lo que una petición espera el ID de su pedido antes de responder 202
+ESPERA_ID_S = 2.0
+
+
+def _plano(valor):
+    # Valores de pandas/numpy a JSON: fechas en ISO, NaN como null
+    if isinstance(valor, dict):
+        return {clave: _plano(v) for clave, v in valor.items()}
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if hasattr(valor, 'item'):
+        valor = valor.item()
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return valor
+
+
+def _fecha(texto):
+    if texto is not None and not isinstance(texto, str):
+        raise ValueError('fecha debe ser un texto "AAAA-MM-DD".')
+    return date.fromisoformat(texto) if texto else datetime.now(TZ_EC).date()
+
+
+def _cierre(serie):
+    return {clave: round(float(v), 2) for clave, v in serie.items()}
+
+
+async def _cuerpo(request, *obligatorios):
+    datos = await request.json()
+    if not isinstance(datos, dict):
+        raise ValueError("El cuerpo debe ser un objeto JSON.")
+    faltan = [campo for campo in obligatorios if campo not in datos]
+    if faltan:
+        raise ValueError(f"Faltan campos: {', '.join(faltan)}.")
+    return datos
+
+
+async def menu(request):
+    # actual() mira el archivo y lo relee si cambió
+    version = (await run_in_threadpool(archivo_menu.actual)).vigente()
+    return JSONResponse({'desde': version.desde.isoformat(), 'menu': version.menu})
+
+
+async def caja(request):
+    inicial = await run_in_threadpool(servicio.apertura, _fecha(request.path_params['fecha']))
+    return JSONResponse({'abierta': inicial is not None, 'Inicial': inicial})
+
+
+async def abrir_caja(request):
+    datos = await _cuerpo(request, 'inicial')
+    inicial = await run_in_threadpool(servicio.abrir_caja, datos['inicial'])
+    return JSONResponse({'Inicial': inicial}, status_code=201)
+
+
+async def cerrar_caja(request):
+    datos = await _cuerpo(request)
+    fecha = _fecha(datos.get('fecha'))
+    cierre, archivados = await run_in_threadpool(servicio.cerrar_caja, fecha)
+    return JSONResponse({'fecha': fecha.isoformat(), 'cierre': _cierre(cierre), 'archivados': archivados})
+
+
+async def crear_pedido(request):
+    datos = await _cuerpo(request, 'nombre', 'carrito', 'metodo_pago')
+    if not isinstance(datos['carrito'], dict):
+        raise ValueError('carrito debe ser un objeto {"Categoría - Producto": cantidad}.')
+    creado = await run_in_threadpool(servicio.crear_pedido, datos['nombre'], datos['carrito'], datos['metodo_pago'],
+                                     ESPERA_ID_S)
+    return JSONResponse({'ID': creado.id, 'token': creado.token, 'Detalle': creado.detalle, 'Total': creado.total},
+                        status_code=202 if creado.id is None else 201)
+
+
+async def pedido_encolado(request):
+    pedido_id = await run_in_threadpool(esperar_pedido, request.path_params['token'], 0)
+    return JSONResponse({'ID': pedido_id}, status_code=202 if pedido_id is None else 200)
+
+
+async def pedido(request):
+    encontrado = await run_in_threadpool(servicio.pedido, request.path_params['id'])
+    return JSONResponse(_plano(encontrado))
+
+
+async def cambiar_estado(request):
+    datos = await _cuerpo(request, 'estado')
+    actualizado = await run_in_threadpool(servicio.cambiar_estado, request.path_params['id'], datos['estado'],
+                                          datos.get('estado_anterior'))
+    return JSONResponse(_plano(actualizado))
+
+
+async def cierres(request):
+    # Sin desde/hasta, todo el historial
+    desde, hasta = (date.fromisoformat(request.query_params[campo]) if campo in request.query_params else None
+                    for campo in ('desde', 'hasta'))
+    resumen = await run_in_threadpool(servicio.cierres, desde, hasta)
+    return JSONResponse([{'Dia': dia.isoformat(), **_cierre(fila)} for dia, fila in resumen.iterrows()])
+
+
+async def cierre(request):
+    resultado = await run_in_threadpool(servicio.cierre, _fecha(request.path_params['fecha']))
+    return JSONResponse(_cierre(resultado))
+
+
+async def estado(request):
+    # Lee el archivo de la cola bajo su bloqueo entre procesos
+    actual = await run_in_threadpool(estado_cola)
+    return JSONResponse({'pendientes': actual.pendientes, 'error': actual.error, 'guardados': actual.guardados})
+
+
+def _error(codigo):
+    async def responder(request, error):
+        return JSONResponse({'error': str(error)}, status_code=codigo)
+    return responder
+
+
+class _Autorizacion:
+    # Middleware ASGI: sin el token correcto, 401 antes de tocar el almacén
+    def __init__(self, app, token):
+        self.app = app
+        self.esperado = f"Bearer {token}".encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            recibido = dict(scope['headers']).get(b'authorization', b'')
+            if not hmac.compare_digest(recibido, self.esperado):
+                await JSONResponse({'error': "No autorizado"}, status_code=401)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app = Starlette(
+    routes=[
+        Route('/menu', menu),
+        Route('/caja/apertura', abrir_caja, methods=['POST']),
+        Route('/caja/cierre', cerrar_caja, methods=['POST']),
+        Route('/caja/{fecha}', caja),
+        Route('/pedidos', crear_pedido, methods=['POST']),
+        Route('/pedidos/cola/{token}', pedido_encolado),
+        Route('/pedidos/{id:int}', pedido),
+        Route('/pedidos/{id:int}', cambiar_estado, methods=['PATCH']),
+        Route('/cierres', cierres),
+        Route('/cierres/{fecha}', cierre),
+        Route('/estado', estado),
+    ],
+    # Datos inválidos 400, lo que no existe 404, lo que choca con lo guardado 409
+    exception_handlers={ValueError: _error(400), LookupError: _error(404), servicio.Conflicto: _error(409)},
+    middleware=[Middleware(_Autorizacion, token=TOKEN)] if TOKEN else [],
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    # Cada proceso tiene su cola e hilo de guardado; los bloqueos de archivo los coordinan.
+    # Las escrituras igual van de a una: más procesos no dan más pedidos por segundo
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+    uvicorn.run('api:app' if args.workers > 1 else app, host=args.host, port=args.port, workers=args.workers,
+                log_level='warning')
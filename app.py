@@ -1,172 +1,118 @@
-import streamlit as st
-import pandas as pd
-from datetime import datetime
 import os
-import io
-from zoneinfo import ZoneInfo
-
-DATA_FILE_PEDIDOS = 'pedidos_mi_escondite.csv'
-DATA_FILE_GASTOS = 'gastos_mi_escondite.csv'
-DATA_FILE_CAJA = 'caja_mi_escondite.csv'
-
-TZ_EC = ZoneInfo("America/Guayaquil")
-
-MENU = {
-    "Hamburguesas": {
-        "Italiana": 2.50, "Francesa": 3.25, "Española": 3.25, "Americana": 3.25, "4 Estaciones": 3.25,
-        "Mexicana": 3.25, "Especial": 3.25, "Suprema": 3.75, "Papi Burguer": 2.75, "A su gusto (Jumbo)": 5.50,
-        "Triple Burguer": 6.00, "Doble Burguer": 4.50
-    },
-    "Hot Dogs": {
-        "Especial Mixto": 2.25, "Especial de Pollo": 2.25, "Hot Dog con salame": 2.25,
-        "Mix Dog - Jumbo": 2.25, "Champi Dog": 2.25, "Hot Dog con cebolla": 1.75
-    },
-    "Papas Fritas": {
-        "Salchipapa": 2.00, "Papi carne": 2.50, "Papi Pollo": 2.50,
-        "Salchipapa especial": 3.75, "Papa Mix": 3.75, "Papa Wlady": 5.00
-    },
-    "Sanduches": {
-        "Cubano": 2.25, "Vegetariano": 2.25, "Sanduche de Pollo": 2.25
-    },
-    "Bebidas": {
-        "Colas Coca Pequeña": 0.75, "Cola Sabores Pequeña": 0.50, "Cola Inka Grande": 1.00,
-        "Fuze Tea mediano": 1.00, "Fuze Tea Pequeño": 0.50, "Fuze Tea Grande": 1.50, "Coca Flaca": 1.75, "Coca Litro": 1.50,
-        "Cola Sabores Flaca": 1.50, "Jugos": 1.50, "Batidos": 1.75, "Botella de Agua": 0.75, "Jamaica": 0.75
-    },
-    "Porciones": {
-        "Papas Fritas (0.50)": 0.50, "Papas Fritas (1.00)": 1.00, "Huevo Frito": 0.75,
-        "Presa de Pollo": 1.50, "Pollo desmenuzado": 0.75, "Salame": 0.75, "Queso": 0.75, "Carne": 0.75, "Tocino": 0.75
-    }
-}
-
-ESTADOS = ["En proceso", "Entregado", "Pagado", "Cancelado"]
-METODOS_PAGO = ["Efectivo", "Transferencia De Una", "Transferencia Jardín Azuayo", "Transferencia JEP"]
-
-def cargar_pedidos():
-    if os.path.exists(DATA_FILE_PEDIDOS):
-        df = pd.read_csv(DATA_FILE_PEDIDOS)
-        if 'ID' not in df.columns:
-            df['ID'] = range(1, len(df) + 1)
-        if 'Nombre_Orden' not in df.columns:
-            df['Nombre_Orden'] = "Sin nombre"
-        if 'Metodo_Pago' not in df.columns:
-            df['Metodo_Pago'] = "Efectivo"
-        df['Fecha'] = pd.to_datetime(df['Fecha'])
-        return df.reset_index(drop=True)
-    return pd.DataFrame(columns=['ID', 'Nombre_Orden', 'Fecha', 'Detalle', 'Total', 'Estado', 'Metodo_Pago'])
-
-def guardar_pedidos(df):
-    df.to_csv(DATA_FILE_PEDIDOS, index=False)
-
-def cargar_gastos():
-    if os.path.exists(DATA_FILE_GASTOS):
-        df = pd.read_csv(DATA_FILE_GASTOS)
-        df['Fecha'] = pd.to_datetime(df['Fecha'])
-        return df.reset_index(drop=True)
-    return pd.DataFrame(columns=['Fecha', 'Descripción', 'Monto'])
-
-def guardar_gastos(df):
-    df.to_csv(DATA_FILE_GASTOS, index=False)
-
-def cargar_caja():
-    if os.path.exists(DATA_FILE_CAJA):
-        df = pd.read_csv(DATA_FILE_CAJA)
-        df['Fecha'] = pd.to_datetime(df['Fecha'])
-        return df.reset_index(drop=True)
-    return pd.DataFrame(columns=['Fecha', 'Inicial'])
-
-def guardar_caja(df):
-    df.to_csv(DATA_FILE_CAJA, index=False)
 
-st.set_page_config(page_title="Mi Escondite", layout="centered")
-st.markdown("<h1 style='text-align: center; color: #FF4500;'>🍔 Mi Escondite en la Amazonía</h1>", unsafe_allow_html=True)
-st.markdown("<p style='text-align: center;'>Gestor de Pedidos y Caja</p>", unsafe_allow_html=True)
+import streamlit as st
+from datetime import datetime, timedelta
+
+from almacen import (
+    estado_cola, agregar_gasto, historial, ventas_productos,
+    indice_pedidos, exportar_bytes, estadisticas_historial, estadisticas_cache, pedidos_cocina, entregar_pedido,
+    SUCURSAL, sucursales, resumen_sucursales,
+)
+from catalogo import ESTADOS, METODOS_PAGO, TZ_EC, archivo_menu, clave_carrito, total_carrito
+from exportar import FORMATOS, formatos_disponibles
+from cierre import (
+    PERIODOS, cierre_del_dia, etiqueta_metodo, reporte_cierre, rango_periodo, totales_rango, totales_sucursales,
+)
+import perfil
+import servicio
+
+# Panel de rendimiento en la barra lateral (ESCONDITE_ADMIN=1)
+ADMIN = os.environ.get('ESCONDITE_ADMIN') == '1'
+
+# Cada cuántos segundos la pantalla de cocina busca pedidos nuevos
+INTERVALO_COCINA = 3
+# Pedidos más recientes que esto se marcan como nuevos en cocina
+MINUTOS_NUEVO = 2
+# Tarjetas dibujadas en cocina; el resto se cuenta pero no se dibuja
+MAX_TARJETAS_COCINA = 40
+# Lo que la caja espera el ID de un pedido guardado antes de seguir sin él
+ESPERA_ID_S = 0.5
+# Cada cuántos segundos se actualiza el estado de la cola de pedidos
+INTERVALO_COLA = 2
+
+
+def vaciar_carrito():
+    st.session_state.carrito = {}
+    st.session_state.total_carrito = 0.0
+
+
+def menu_del_pedido():
+    # Versión del menú con la que se arma el carrito. Si el catálogo cambió (archivo
+    # editado o empezó a regir otra versión), el carrito pasa a los precios nuevos
+    version = archivo_menu.actual().vigente()
+    anterior = st.session_state.get('menu_pedido')
+    if anterior is not version:
+        carrito = {k: c for k, c in st.session_state.carrito.items() if k in version.indice}
+        st.session_state.menu_pedido = version
+        st.session_state.carrito = carrito
+        st.session_state.total_carrito = total_carrito(carrito, version.indice)
+        if anterior is not None and carrito:
+            descartar_revision()
+            st.info("Cambiaron los precios del menú: el pedido en curso se actualizó.")
+    return version
+
+
+def cambiar_cantidad(key, delta):
+    # El total se ajusta con el precio del ítem en vez de recalcularse desde el menú
+    cantidad = st.session_state.carrito.get(key, 0) + delta
+    if cantidad > 0:
+        st.session_state.carrito[key] = cantidad
+    else:
+        st.session_state.carrito.pop(key, None)
+    item = st.session_state.menu_pedido.indice[key]
+    st.session_state.total_carrito = round(st.session_state.total_carrito + delta * item.precio, 2)
+    # Sólo se vuelven a dibujar la categoría tocada, el total y el resumen
+    st.rerun([f"grilla_{item.categoria}", "total_pedido", "resumen_pedido"])
 
-opcion = st.sidebar.selectbox("Menú", ["Apertura de Caja", "Registrar Pedido", "Ver Pedidos", "Registrar Gasto", "Cierre de Caja", "Historial de Cierres", "Cambiar Estado"])
 
-now_ec = datetime.now(TZ_EC)
-fecha_hoy = now_ec.date()
+def descartar_revision():
+    st.session_state.pop('pedido_temp', None)
 
-df_caja = cargar_caja()
-apertura_hoy = df_caja[pd.to_datetime(df_caja['Fecha']).dt.date == fecha_hoy]
-caja_abierta = not apertura_hoy.empty
 
-if opcion == "Apertura de Caja":
-    st.header("Apertura de Caja")
-    if caja_abierta:
-        st.success(f"Caja ya abierta hoy con inicial ${apertura_hoy['Inicial'].iloc[0]:.2f}.")
-    else:
-        inicial = st.number_input("Valor inicial en caja ($)", min_value=0.0, step=0.01)
-        if st.button("Abrir Caja"):
-            nuevo_apertura = pd.DataFrame([{
-                'Fecha': now_ec,
-                'Inicial': round(inicial, 2)
-            }])
-            df_caja = pd.concat([df_caja, nuevo_apertura], ignore_index=True)
-            guardar_caja(df_caja)
-            st.success(f"¡Caja abierta con inicial ${inicial:.2f}! Ahora puedes registrar pedidos.")
-            st.rerun()
-
-elif opcion == "Registrar Pedido":
-    if not caja_abierta:
-        st.error("🚫 La caja no está abierta hoy. Ve a 'Apertura de Caja' para iniciar el día.")
-        st.stop()
-
-    st.header("Registrar Pedido Rápido")
-
-    # Carrito en session_state
-    if 'carrito' not in st.session_state:
-        st.session_state.carrito = {}
-
-    # Resumen fijo arriba
-    col1, col2, col3 = st.columns([3, 2, 2])
-    with col1:
-        nombre = st.text_input("Cliente / Mesa", placeholder="Ej. Mesa 3, Juan", value="")
-    with col2:
-        total = sum(st.session_state.carrito.get(key, 0) * precio for cat in MENU for key, precio in [(f"{cat} - {p}", precio) for p, precio in MENU[cat].items()])
-        st.markdown(f"<h3 style='color: #FF4500;'>Total: ${total:.2f}</h3>", unsafe_allow_html=True)
-    with col3:
-        metodo_pago = st.selectbox("Método de Pago", METODOS_PAGO)
-
-    # Pestañas por categoría
-    tabs = st.tabs(list(MENU.keys()))
-
-    for tab, categoria in zip(tabs, MENU.keys()):
-        with tab:
-            items = MENU[categoria]
-            cols = st.columns(3)
-            for idx, (producto, precio) in enumerate(items.items()):
-                col = cols[idx % 3]
-                key = f"{categoria} - {producto}"
-                cantidad = st.session_state.carrito.get(key, 0)
-                with col:
-                    st.markdown(f"<h4 style='color: #000000; margin-bottom: 5px;'>{producto}</h4>", unsafe_allow_html=True)
-                    st.markdown(f"<p style='color: #FF4500; font-weight: bold; margin-top: 0;'>${precio:.2f}</p>", unsafe_allow_html=True)
-                    col_btn = st.columns([1, 2, 1])
-                    with col_btn[0]:
-                        if cantidad > 0:
-                            if st.button("➖", key=f"menos_{key}"):
-                                st.session_state.carrito[key] = cantidad - 1
-                                if st.session_state.carrito[key] == 0:
-                                    del st.session_state.carrito[key]
-                                st.rerun()
-                    with col_btn[1]:
-                        st.markdown(f"<h2 style='text-align: center; color: #FF4500; margin: 0;'>{cantidad}</h2>", unsafe_allow_html=True)
-                    with col_btn[2]:
-                        if st.button("➕", key=f"mas_{key}", type="primary"):
-                            st.session_state.carrito[key] = cantidad + 1
-                            st.rerun()
+def nuevo_pedido():
+    vaciar_carrito()
+    descartar_revision()
+    st.rerun()
+
+
+@st.fragment(key="total_pedido")
+def total_pedido():
+    st.markdown(f"<h3 style='color: #FF4500;'>Total: ${st.session_state.total_carrito:.2f}</h3>", unsafe_allow_html=True)
+
+
+def _grilla_categoria(categoria):
+    items = st.session_state.menu_pedido.menu[categoria]
+    cols = st.columns(3)
+    for idx, (producto, precio) in enumerate(items.items()):
+        col = cols[idx % 3]
+        key = clave_carrito(categoria, producto)
+        cantidad = st.session_state.carrito.get(key, 0)
+        with col:
+            st.markdown(f"<h4 style='color: #000000; margin-bottom: 5px;'>{producto}</h4>", unsafe_allow_html=True)
+            st.markdown(f"<p style='color: #FF4500; font-weight: bold; margin-top: 0;'>${precio:.2f}</p>", unsafe_allow_html=True)
+            col_btn = st.columns([1, 2, 1])
+            with col_btn[0]:
+                if cantidad > 0:
+                    st.button("➖", key=f"menos_{key}", on_click=cambiar_cantidad, args=(key, -1))
+            with col_btn[1]:
+                st.markdown(f"<h2 style='text-align: center; color: #FF4500; margin: 0;'>{cantidad}</h2>", unsafe_allow_html=True)
+            with col_btn[2]:
+                st.button("➕", key=f"mas_{key}", type="primary", on_click=cambiar_cantidad, args=(key, 1))
+
+
+def grilla_categoria(categoria):
+    # Un fragmento por pestaña: un ➕/➖ no vuelve a dibujar las demás categorías
+    st.fragment(_grilla_categoria, key=f"grilla_{categoria}")(categoria)
 
-    # Resumen y guardar con revisión
-    st.markdown("### Resumen del Pedido")
+
+@st.fragment(key="resumen_pedido")
+def resumen_pedido():
+    nombre = st.session_state.get('nombre_pedido', "")
+    metodo_pago = st.session_state.get('metodo_pago_pedido', METODOS_PAGO[0])
     if st.session_state.carrito:
-        detalle = []
-        total = 0
-        for key, cant in st.session_state.carrito.items():
-            cat, prod = key.split(" - ", 1)
-            precio = next(precio for c, items in MENU.items() if c == cat for p, precio in items.items() if p == prod)
-            total += cant * precio
-            detalle.append(f"{cant}x {prod}")
+        indice = st.session_state.menu_pedido.indice
+        detalle = [f"{cant}x {indice[key].producto}" for key, cant in st.session_state.carrito.items()]
+        total = st.session_state.total_carrito
         st.write(" | ".join(detalle))
         st.markdown(f"<h3 style='color: #FF4500;'>Total: ${total:.2f}</h3>", unsafe_allow_html=True)
 
@@ -183,7 +129,6 @@ elif opcion == "Registrar Pedido":
                     "estado": "En proceso",
                     "metodo_pago": metodo_pago
                 }
-                st.rerun()
 
         if 'pedido_temp' in st.session_state:
             st.markdown("### 🔍 Confirma el pedido")
@@ -196,241 +141,437 @@ elif opcion == "Registrar Pedido":
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("✅ Guardar Pedido", type="primary"):
-                    df = cargar_pedidos()
-                    nuevo_id = int(df['ID'].max() + 1) if not df.empty else 1
-                    nuevo_pedido = pd.DataFrame([{
-                        'ID': nuevo_id,
-                        'Nombre_Orden': st.session_state.pedido_temp["nombre"],
-                        'Fecha': now_ec,
-                        'Detalle': st.session_state.pedido_temp["detalle"],
-                        'Total': st.session_state.pedido_temp["total"],
-                        'Estado': "En proceso",
-                        'Metodo_Pago': st.session_state.pedido_temp["metodo_pago"]
-                    }])
-                    df = pd.concat([df, nuevo_pedido], ignore_index=True)
-                    guardar_pedidos(df)
-                    st.success("🎉 ¡PEDIDO GUARDADO CON ÉXITO!")
+                    # Se encola y vuelve enseguida; con el almacén libre el ID llega
+                    # en milisegundos, si está ocupado la caja sigue sin esperarlo
+                    try:
+                        nuevo_id = servicio.crear_pedido(st.session_state.pedido_temp["nombre"], st.session_state.carrito,
+                                                st.session_state.pedido_temp["metodo_pago"], ESPERA_ID_S, indice).id
+                    except (ValueError, servicio.Conflicto) as error:
+                        st.error(str(error))
+                        st.stop()
+                    if nuevo_id is not None:
+                        st.success("🎉 ¡PEDIDO GUARDADO CON ÉXITO!")
+                    else:
+                        st.success("🎉 ¡PEDIDO RECIBIDO! Se guardará en segundo plano.")
                     st.balloons()
                     st.markdown(f"""
                     **¡El pedido se registró correctamente!**
-                    - **ID del pedido**: #{nuevo_id}
+                    - **ID del pedido**: {f"#{nuevo_id}" if nuevo_id is not None else "se asigna al guardarse"}
                     - **Cliente/Mesa**: {st.session_state.pedido_temp["nombre"]}
                     - **Detalle**: {st.session_state.pedido_temp["detalle"]}
                     - **Total cobrado**: ${st.session_state.pedido_temp["total"]:.2f}
                     - **Método de pago**: {st.session_state.pedido_temp["metodo_pago"]}
                     """)
                     st.info("El formulario está listo para el siguiente pedido.")
-                    st.session_state.carrito = {}
-                    if 'pedido_temp' in st.session_state:
-                        del st.session_state.pedido_temp
+                    vaciar_carrito()
+                    descartar_revision()
             with col2:
-                if st.button("✏️ Corregir"):
-                    if 'pedido_temp' in st.session_state:
-                        del st.session_state.pedido_temp
-                    st.rerun()
+                st.button("✏️ Corregir", on_click=descartar_revision)
 
         # Botón para registrar nuevo pedido (limpia todo)
         st.markdown("---")
-        if st.button("🆕 Registrar Nuevo Pedido"):
-            st.session_state.carrito = {}
-            if 'pedido_temp' in st.session_state:
-                del st.session_state.pedido_temp
-            st.rerun()
+        st.button("🆕 Registrar Nuevo Pedido", on_click=nuevo_pedido)
     else:
         st.info("🛒 Agrega productos para comenzar el pedido.")
 
-elif opcion == "Registrar Gasto":
-    st.header("Registrar Gasto")
-    descripcion = st.text_input("Descripción del gasto")
-    monto = st.number_input("Monto del gasto ($)", min_value=0.01, step=0.01)
-    if st.button("Guardar Gasto"):
-        if not descripcion.strip():
-            st.error("Debes poner una descripción.")
-        else:
-            df = cargar_gastos()
-            nuevo_gasto = pd.DataFrame([{
-                'Fecha': now_ec,
-                'Descripción': descripcion.strip(),
-                'Monto': round(monto, 2)
-            }])
-            df = pd.concat([df, nuevo_gasto], ignore_index=True)
-            guardar_gastos(df)
-            st.success(f"¡Gasto de ${monto:.2f} registrado!")
-            st.balloons()
-    df = cargar_gastos()
-    if not df.empty:
-        st.markdown("### 📥 Descargar gastos")
-        csv_buffer = io.BytesIO()
-        df.to_csv(csv_buffer, index=False, encoding='utf-8')
-        csv_buffer.seek(0)
-        st.download_button(
-            label="Descargar todos los gastos (CSV)",
-            data=csv_buffer,
-            file_name=f"gastos_{now_ec.strftime('%Y-%m-%d')}.csv",
-            mime="text/csv"
-        )
 
-elif opcion == "Cierre de Caja":
-    st.header("Cierre de Caja")
-    fecha_cierre = st.date_input("Seleccionar fecha para cierre", value=now_ec.date())
-    df_pedidos = cargar_pedidos()
-    df_gastos = cargar_gastos()
-    df_caja = cargar_caja()
-    apertura_dia = df_caja[pd.to_datetime(df_caja['Fecha']).dt.date == fecha_cierre]
-    inicial = apertura_dia['Inicial'].iloc[0] if not apertura_dia.empty else 0.00
-    pedidos_dia = df_pedidos[pd.to_datetime(df_pedidos['Fecha']).dt.date == fecha_cierre]
-    gastos_dia = df_gastos[pd.to_datetime(df_gastos['Fecha']).dt.date == fecha_cierre]
-    ventas_pagadas = pedidos_dia[pedidos_dia['Estado'] == 'Pagado']
-    ventas_efectivo = ventas_pagadas[ventas_pagadas['Metodo_Pago'] == 'Efectivo']['Total'].sum()
-    ventas_deuna = ventas_pagadas[ventas_pagadas['Metodo_Pago'] == 'Transferencia De Una']['Total'].sum()
-    ventas_jardin = ventas_pagadas[ventas_pagadas['Metodo_Pago'] == 'Transferencia Jardín Azuayo']['Total'].sum()
-    ventas_jep = ventas_pagadas[ventas_pagadas['Metodo_Pago'] == 'Transferencia JEP']['Total'].sum()
-    total_gastos = gastos_dia['Monto'].sum()
-    caja_final = inicial + ventas_efectivo - total_gastos
-    ganancia_neta = (ventas_efectivo + ventas_deuna + ventas_jardin + ventas_jep) - total_gastos
-    st.markdown(f"### Resumen del día {fecha_cierre.strftime('%d/%m/%Y')}")
-    st.write(f"**Inicial en caja**: ${inicial:.2f}")
-    st.write(f"**Ventas en efectivo**: ${ventas_efectivo:.2f}")
-    st.write(f"**Transferencia De Una**: ${ventas_deuna:.2f}")
-    st.write(f"**Transferencia Jardín Azuayo**: ${ventas_jardin:.2f}")
-    st.write(f"**Transferencia JEP**: ${ventas_jep:.2f}")
-    st.write(f"**Total ventas**: ${ventas_efectivo + ventas_deuna + ventas_jardin + ventas_jep:.2f}")
-    st.write(f"**Gastos**: ${total_gastos:.2f}")
-    st.write(f"**Ganancia neta**: ${ganancia_neta:.2f}")
-    st.write(f"**Caja final en efectivo**: ${caja_final:.2f}")
-    if not pedidos_dia.empty:
-        st.subheader("Pedidos del día")
-        st.dataframe(pedidos_dia[['ID', 'Nombre_Orden', 'Detalle', 'Total', 'Metodo_Pago', 'Estado']])
-    if not gastos_dia.empty:
-        st.subheader("Gastos del día")
-        st.dataframe(gastos_dia)
-    st.markdown("### 📥 Reporte de Cierre - Descargar")
-    reporte = pd.DataFrame({
-        'Concepto': ['Inicial', 'Ventas Efectivo', 'Transferencia De Una', 'Transferencia Jardín Azuayo', 'Transferencia JEP', 'Gastos', 'Ganancia Neta', 'Caja Final Efectivo'],
-        'Monto': [inicial, ventas_efectivo, ventas_deuna, ventas_jardin, ventas_jep, total_gastos, ganancia_neta, caja_final]
-    })
-    csv_buffer = io.BytesIO()
-    reporte.to_csv(csv_buffer, index=False, encoding='utf-8')
-    csv_buffer.seek(0)
-    st.download_button(
-        label="DESCARGAR REPORTE DE CIERRE DE CAJA",
-        data=csv_buffer,
-        file_name=f"cierre_caja_{fecha_cierre.strftime('%Y-%m-%d')}.csv",
-        mime="text/csv",
-        type="primary"
-    )
-    st.markdown("### ⚠️ Cerrar Caja y Reiniciar Día")
-    st.warning("Esto eliminará los pedidos, gastos y la apertura de caja del día seleccionado. Después necesitarás abrir caja nuevamente para registrar pedidos.")
+def mostrar_cierre(cierre, etiqueta_inicial=None, etiqueta_caja=None):
+    if etiqueta_inicial:
+        st.write(f"**{etiqueta_inicial}**: ${cierre['Inicial']:.2f}")
+    for metodo in METODOS_PAGO:
+        st.write(f"**{etiqueta_metodo(metodo)}**: ${cierre[metodo]:.2f}")
+    st.write(f"**Total ventas**: ${cierre['Total_Ventas']:.2f}")
+    st.write(f"**Gastos**: ${cierre['Gastos']:.2f}")
+    st.write(f"**Ganancia neta**: ${cierre['Ganancia_Neta']:.2f}")
+    if etiqueta_caja:
+        st.write(f"**{etiqueta_caja}**: ${cierre['Caja_Final']:.2f}")
+
+
+def nombre_sucursal(sucursal):
+    # '' es el local único de antes de haber sucursales
+    return sucursal or "Principal"
+
+
+def elegir_periodo():
+    periodo = st.radio("Periodo", PERIODOS, horizontal=True)
+    if periodo == "Personalizado":
+        rango = st.date_input("Rango de fechas", value=(now_ec.date() - timedelta(days=6), now_ec.date()))
+        return (rango[0], rango[-1]) if rango else (now_ec.date(), now_ec.date())
+    fecha_hist = st.date_input("Fecha del cierre", value=now_ec.date())
+    return rango_periodo(periodo, fecha_hist)
+
+
+def boton_respaldo(tabla, etiqueta, prefijo):
+    # El archivo se arma sólo al hacer clic, leyendo la tabla por bloques
     col1, col2 = st.columns(2)
     with col1:
-        if st.button("🗑️ Preparar cierre y limpieza"):
-            st.session_state.confirmar_cierre = True
+        rango = st.date_input("Rango (vacío = todo)", value=[], key=f"rango_{tabla}")
     with col2:
-        if st.session_state.get('confirmar_cierre', False):
-            if st.button("🔥 CONFIRMAR CIERRE Y LIMPIAR TODO"):
-                df_pedidos = df_pedidos[pd.to_datetime(df_pedidos['Fecha']).dt.date != fecha_cierre]
-                guardar_pedidos(df_pedidos)
-                df_gastos = df_gastos[pd.to_datetime(df_gastos['Fecha']).dt.date != fecha_cierre]
-                guardar_gastos(df_gastos)
-                df_caja = df_caja[pd.to_datetime(df_caja['Fecha']).dt.date != fecha_cierre]
-                guardar_caja(df_caja)
-                st.success("¡Caja cerrada y día limpiado completamente! Para registrar nuevos pedidos, debes abrir caja nuevamente.")
-                if 'confirmar_cierre' in st.session_state:
-                    del st.session_state.confirmar_cierre
-                st.rerun()
-
-elif opcion == "Historial de Cierres":
-    st.header("Historial de Cierres de Caja")
-    st.info("Selecciona una fecha para ver o descargar el reporte histórico.")
-    fecha_hist = st.date_input("Fecha del cierre", value=now_ec.date())
-    df_pedidos = cargar_pedidos()
-    df_gastos = cargar_gastos()
-    df_caja = cargar_caja()
-    apertura_dia = df_caja[pd.to_datetime(df_caja['Fecha']).dt.date == fecha_hist]
-    inicial = apertura_dia['Inicial'].iloc[0] if not apertura_dia.empty else 0.00
-    pedidos_dia = df_pedidos[pd.to_datetime(df_pedidos['Fecha']).dt.date == fecha_hist]
-    gastos_dia = df_gastos[pd.to_datetime(df_gastos['Fecha']).dt.date == fecha_hist]
-    ventas_pagadas = pedidos_dia[pedidos_dia['Estado'] == 'Pagado']
-    ventas_efectivo = ventas_pagadas[ventas_pagadas['Metodo_Pago'] == 'Efectivo']['Total'].sum()
-    ventas_deuna = ventas_pagadas[ventas_pagadas['Metodo_Pago'] == 'Transferencia De Una']['Total'].sum()
-    ventas_jardin = ventas_pagadas[ventas_pagadas['Metodo_Pago'] == 'Transferencia Jardín Azuayo']['Total'].sum()
-    ventas_jep = ventas_pagadas[ventas_pagadas['Metodo_Pago'] == 'Transferencia JEP']['Total'].sum()
-    total_gastos = gastos_dia['Monto'].sum()
-    caja_final = inicial + ventas_efectivo - total_gastos
-    ganancia_neta = (ventas_efectivo + ventas_deuna + ventas_jardin + ventas_jep) - total_gastos
-    st.markdown(f"### Reporte histórico del {fecha_hist.strftime('%d/%m/%Y')}")
-    st.write(f"**Inicial**: ${inicial:.2f}")
-    st.write(f"**Ventas Efectivo**: ${ventas_efectivo:.2f}")
-    st.write(f"**Transferencia De Una**: ${ventas_deuna:.2f}")
-    st.write(f"**Transferencia Jardín Azuayo**: ${ventas_jardin:.2f}")
-    st.write(f"**Transferencia JEP**: ${ventas_jep:.2f}")
-    st.write(f"**Total ventas**: ${ventas_efectivo + ventas_deuna + ventas_jardin + ventas_jep:.2f}")
-    st.write(f"**Gastos**: ${total_gastos:.2f}")
-    st.write(f"**Ganancia neta**: ${ganancia_neta:.2f}")
-    st.write(f"**Caja final**: ${caja_final:.2f}")
-    reporte_hist = pd.DataFrame({
-        'Concepto': ['Inicial', 'Ventas Efectivo', 'Transferencia De Una', 'Transferencia Jardín Azuayo', 'Transferencia JEP', 'Gastos', 'Ganancia Neta', 'Caja Final'],
-        'Monto': [inicial, ventas_efectivo, ventas_deuna, ventas_jardin, ventas_jep, total_gastos, ganancia_neta, caja_final]
-    })
-    csv_hist = io.BytesIO()
-    reporte_hist.to_csv(csv_hist, index=False, encoding='utf-8')
-    csv_hist.seek(0)
+        formato = st.radio("Formato", formatos_disponibles(), format_func=lambda f: FORMATOS[f][2], key=f"formato_{tabla}")
+    desde, hasta = (rango[0], rango[-1]) if rango else (None, None)
+    extension, mime, _ = FORMATOS[formato]
+    sufijo = f"{desde:%Y-%m-%d}_{hasta:%Y-%m-%d}" if desde else now_ec.strftime('%Y-%m-%d')
     st.download_button(
-        label="📥 Descargar Reporte Histórico",
-        data=csv_hist,
-        file_name=f"reporte_historico_{fecha_hist.strftime('%Y-%m-%d')}.csv",
-        mime="text/csv"
+        label=etiqueta,
+        data=lambda: exportar_bytes(tabla, formato, desde, hasta),
+        file_name=f"{prefijo}_{sufijo}{extension}",
+        mime=mime
     )
 
-elif opcion == "Ver Pedidos":
-    st.header("Registro de Pedidos")
-    df = cargar_pedidos()
-    if df.empty:
-        st.info("No hay pedidos registrados aún.")
+
+def marcar_entregado(pedido_id):
+    # El aviso lo muestra el fragmento: un callback no debe dibujar en un rerun de fragmento
+    if entregar_pedido(pedido_id):
+        st.session_state.aviso_cocina = f"Pedido #{pedido_id} entregado"
     else:
-        estado_filtro = st.multiselect("Filtrar por estado", ESTADOS, default=ESTADOS)
-        metodo_filtro = st.multiselect("Filtrar por método de pago", METODOS_PAGO, default=METODOS_PAGO)
-        fecha_filtro = st.date_input("Filtrar por fecha", value=None)
-        df_filtrado = df[df['Estado'].isin(estado_filtro) & df['Metodo_Pago'].isin(metodo_filtro)].copy()
-        if fecha_filtro:
-            df_filtrado = df_filtrado[pd.to_datetime(df_filtrado['Fecha']).dt.date == fecha_filtro]
-        st.dataframe(df_filtrado.sort_values('ID', ascending=False))
-        st.write(f"**Total mostrado: ${df_filtrado['Total'].sum():.2f}**")
-        st.markdown("### 📥 Descargar respaldo")
-        csv_buffer = io.BytesIO()
-        df.to_csv(csv_buffer, index=False, encoding='utf-8')
-        csv_buffer.seek(0)
+        st.session_state.aviso_cocina = f"El pedido #{pedido_id} ya no estaba en cocina"
+
+
+@st.fragment(run_every=INTERVALO_COCINA)
+def pantalla_cocina():
+    # Sólo este fragmento se repite; cada vuelta lee las novedades, no el historial
+    pendientes = pedidos_cocina()
+    if 'aviso_cocina' in st.session_state:
+        st.toast(st.session_state.pop('aviso_cocina'))
+    visto = st.session_state.get('cocina_ultimo_id')
+    nuevos = [p for p in pendientes if visto is not None and p['ID'] > visto]
+    for pedido in nuevos:
+        st.toast(f"🆕 Pedido #{pedido['ID']} - {pedido['Nombre_Orden']}")
+    if pendientes:
+        st.session_state.cocina_ultimo_id = max(visto or 0, pendientes[-1]['ID'])
+    elif visto is None:
+        st.session_state.cocina_ultimo_id = 0
+    if not pendientes:
+        st.info("No hay pedidos en cocina.")
+        return
+    st.caption(f"{len(pendientes)} pedidos en cocina, del más antiguo al más nuevo")
+    ahora = datetime.now(TZ_EC)
+    for pedido in pendientes[:MAX_TARJETAS_COCINA]:
+        minutos = int((ahora - pedido['Fecha']).total_seconds() // 60)
+        marca = " 🆕" if minutos < MINUTOS_NUEVO else ""
+        with st.container(border=True):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"**#{pedido['ID']} · {pedido['Nombre_Orden']}**{marca} — hace {minutos} min")
+                st.write(pedido['Detalle'])
+            with col2:
+                st.button("✅ Entregado", key=f"entregar_{pedido['ID']}", type="primary",
+                          on_click=marcar_entregado, args=(pedido['ID'],))
+    if len(pendientes) > MAX_TARJETAS_COCINA:
+        st.caption(f"… y {len(pendientes) - MAX_TARJETAS_COCINA} pedidos más")
+
+
+@st.fragment(run_every=INTERVALO_COLA)
+def estado_guardado():
+    # Pedidos aceptados en caja que el hilo de la cola aún no guarda en el almacén
+    estado = estado_cola()
+    if estado.error:
+        st.error(f"⚠️ {estado.pendientes} pedidos sin guardar, reintentando: {estado.error}")
+    elif estado.pendientes:
+        st.warning(f"⏳ Guardando {estado.pendientes} pedidos…")
+    else:
+        st.caption("✅ Todos los pedidos están guardados")
+
+
+def pedir_perfil():
+    st.session_state.perfilar_rerun = True
+
+
+def panel_rendimiento(medicion):
+    # Tiempos del rerun que acaba de terminar (sin contar este panel)
+    with st.sidebar.expander("⏱️ Rendimiento"):
+        st.toggle("Medir tiempos por etapa", key="medir_tiempos")
+        st.metric(f"Rerun de {medicion.pagina}", f"{medicion.total * 1000:.0f} ms")
+        if medicion.detalle:
+            st.dataframe(medicion.filas(), hide_index=True)
+        # Contadores del proceso (todas las sesiones) desde que arrancó
+        cache = estadisticas_cache()
+        consultas = cache['aciertos'] + cache['fallos']
+        st.caption(f"Caché de tablas: {cache['aciertos']} aciertos de {consultas} "
+                   f"({cache['aciertos'] / consultas:.0%}), {cache['invalidaciones']} invalidaciones, "
+                   f"{cache['entradas']} entradas." if consultas else "Caché de tablas: sin consultas todavía.")
+        st.caption(f"Los reruns de más de {perfil.UMBRAL_LENTO_S:g} s se anotan en {perfil.ARCHIVO_LENTOS}.")
+        st.button("Perfilar un rerun (cProfile)", on_click=pedir_perfil)
+        if medicion.reporte_perfil:
+            st.code(medicion.reporte_perfil, language=None)
+            with open(perfil.ARCHIVO_PERFIL, 'rb') as f:
+                st.download_button("Descargar perfil (.prof)", data=f.read(), file_name=perfil.ARCHIVO_PERFIL,
+                                   mime="application/octet-stream")
+
+
+st.set_page_config(page_title="Mi Escondite", layout="centered")
+st.markdown("<h1 style='text-align: center; color: #FF4500;'>🍔 Mi Escondite en la Amazonía</h1>", unsafe_allow_html=True)
+st.markdown("<p style='text-align: center;'>Gestor de Pedidos y Caja</p>", unsafe_allow_html=True)
+if SUCURSAL:
+    st.markdown(f"<p style='text-align: center;'><b>Sucursal: {SUCURSAL}</b></p>", unsafe_allow_html=True)
+
+opciones = ["Apertura de Caja", "Registrar Pedido", "Ver Pedidos", "Cocina", "Registrar Gasto", "Cierre de Caja", "Historial de Cierres", "Cambiar Estado", "Estadísticas"]
+# El consolidado sólo tiene sentido con más de una sucursal
+if len(sucursales()) > 1:
+    opciones.append("Sucursales")
+opcion = st.sidebar.selectbox("Menú", opciones)
+with st.sidebar:
+    estado_guardado()
+medicion = perfil.iniciar(opcion, detalle=ADMIN and st.session_state.get('medir_tiempos', False),
+                          perfilar=ADMIN and st.session_state.pop('perfilar_rerun', False))
+
+now_ec = datetime.now(TZ_EC)
+fecha_hoy = now_ec.date()
+
+inicial_hoy = servicio.apertura(fecha_hoy)
+caja_abierta = inicial_hoy is not None
+
+# st.rerun() y st.stop() cortan la página con una excepción: la medición se cierra igual
+try:
+    if opcion == "Apertura de Caja":
+        st.header("Apertura de Caja")
+        if caja_abierta:
+            st.success(f"Caja ya abierta hoy con inicial ${inicial_hoy:.2f}.")
+        else:
+            inicial = st.number_input("Valor inicial en caja ($)", min_value=0.0, step=0.01)
+            if st.button("Abrir Caja"):
+                try:
+                    servicio.abrir_caja(inicial, now_ec)
+                except servicio.Conflicto as error:
+                    # Otra terminal la abrió mientras tanto
+                    st.warning(str(error))
+                else:
+                    st.success(f"¡Caja abierta con inicial ${inicial:.2f}! Ahora puedes registrar pedidos.")
+                    st.rerun()
+
+    elif opcion == "Registrar Pedido":
+        if not caja_abierta:
+            st.error("🚫 La caja no está abierta hoy. Ve a 'Apertura de Caja' para iniciar el día.")
+            st.stop()
+
+        st.header("Registrar Pedido Rápido")
+
+        # Carrito en session_state
+        if 'carrito' not in st.session_state:
+            vaciar_carrito()
+        menu = menu_del_pedido().menu
+        if archivo_menu.error:
+            st.warning(f"No se pudo leer el archivo del menú ({archivo_menu.error}); se usan los últimos precios válidos.")
+
+        # Resumen fijo arriba
+        col1, col2, col3 = st.columns([3, 2, 2])
+        with col1:
+            st.text_input("Cliente / Mesa", placeholder="Ej. Mesa 3, Juan", key="nombre_pedido")
+        with col2:
+            total_pedido()
+        with col3:
+            st.selectbox("Método de Pago", METODOS_PAGO, key="metodo_pago_pedido")
+
+        # Pestañas por categoría
+        tabs = st.tabs(list(menu.keys()))
+        for tab, categoria in zip(tabs, menu.keys()):
+            with tab:
+                grilla_categoria(categoria)
+
+        # Resumen y guardar con revisión
+        st.markdown("### Resumen del Pedido")
+        resumen_pedido()
+
+    elif opcion == "Registrar Gasto":
+        st.header("Registrar Gasto")
+        descripcion = st.text_input("Descripción del gasto")
+        monto = st.number_input("Monto del gasto ($)", min_value=0.01, step=0.01)
+        if st.button("Guardar Gasto"):
+            if not descripcion.strip():
+                st.error("Debes poner una descripción.")
+            else:
+                agregar_gasto({
+                    'Fecha': now_ec,
+                    'Descripción': descripcion.strip(),
+                    'Monto': round(monto, 2)
+                })
+                st.success(f"¡Gasto de ${monto:.2f} registrado!")
+                st.balloons()
+        df = historial('gastos')
+        if not df.empty:
+            st.markdown("### 📥 Descargar gastos")
+            boton_respaldo('gastos', "Descargar gastos", "gastos")
+
+    elif opcion == "Cierre de Caja":
+        st.header("Cierre de Caja")
+        fecha_cierre = st.date_input("Seleccionar fecha para cierre", value=now_ec.date())
+        pedidos_dia = historial('pedidos', fecha_cierre, fecha_cierre)
+        gastos_dia = historial('gastos', fecha_cierre, fecha_cierre)
+        cierre = servicio.cierre(fecha_cierre)
+        st.markdown(f"### Resumen del día {fecha_cierre.strftime('%d/%m/%Y')}")
+        mostrar_cierre(cierre, "Inicial en caja", "Caja final en efectivo")
+        if not pedidos_dia.empty:
+            st.subheader("Pedidos del día")
+            st.dataframe(pedidos_dia[['ID', 'Nombre_Orden', 'Detalle', 'Total', 'Metodo_Pago', 'Estado']])
+        if not gastos_dia.empty:
+            st.subheader("Gastos del día")
+            st.dataframe(gastos_dia.drop(columns='Dia'))
+        st.markdown("### 📥 Reporte de Cierre - Descargar")
+        reporte = reporte_cierre(cierre, METODOS_PAGO, 'Caja Final Efectivo')
+        st.download_button(
+            label="DESCARGAR REPORTE DE CIERRE DE CAJA",
+            data=lambda: reporte.to_csv(index=False),
+            file_name=f"cierre_caja_{fecha_cierre.strftime('%Y-%m-%d')}.csv",
+            mime="text/csv",
+            type="primary"
+        )
+        st.markdown("### ⚠️ Cerrar Caja y Reiniciar Día")
+        st.warning("Esto pasará los pedidos, gastos y la apertura de caja del día seleccionado al archivo histórico. Después necesitarás abrir caja nuevamente para registrar pedidos.")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🗑️ Preparar cierre y limpieza"):
+                st.session_state.confirmar_cierre = True
+        with col2:
+            if st.session_state.get('confirmar_cierre', False):
+                if st.button("🔥 CONFIRMAR CIERRE Y LIMPIAR TODO"):
+                    try:
+                        servicio.cerrar_caja(fecha_cierre)
+                    except (LookupError, servicio.Conflicto) as error:
+                        # Día sin caja abierta: nunca se abrió o ya se cerró
+                        st.warning(str(error))
+                        st.session_state.pop('confirmar_cierre', None)
+                        st.stop()
+                    st.success("¡Caja cerrada y día archivado! Para registrar nuevos pedidos, debes abrir caja nuevamente.")
+                    if 'confirmar_cierre' in st.session_state:
+                        del st.session_state.confirmar_cierre
+                    st.rerun()
+
+    elif opcion == "Historial de Cierres":
+        st.header("Historial de Cierres de Caja")
+        st.info("Selecciona una fecha o un periodo para ver o descargar el reporte histórico.")
+        desde, hasta = elegir_periodo()
+        cierres = servicio.cierres(desde, hasta)
+        if desde == hasta:
+            cierre = cierre_del_dia(cierres, desde)
+            st.markdown(f"### Reporte histórico del {desde.strftime('%d/%m/%Y')}")
+            mostrar_cierre(cierre, "Inicial", "Caja final")
+            reporte_hist = reporte_cierre(cierre, METODOS_PAGO)
+            nombre_reporte = f"reporte_historico_{desde.strftime('%Y-%m-%d')}.csv"
+        else:
+            st.markdown(f"### Reporte del {desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')}")
+            if cierres.empty:
+                st.info("No hay cierres registrados en este periodo.")
+            else:
+                st.dataframe(cierres)
+            mostrar_cierre(totales_rango(cierres, METODOS_PAGO))
+            reporte_hist = cierres.reset_index()
+            nombre_reporte = f"reporte_historico_{desde.strftime('%Y-%m-%d')}_{hasta.strftime('%Y-%m-%d')}.csv"
+        productos_vendidos = ventas_productos(desde, hasta)
+        if not productos_vendidos.empty:
+            st.subheader("Productos vendidos")
+            st.dataframe(productos_vendidos, hide_index=True)
         st.download_button(
-            label="Descargar todos los pedidos (CSV)",
-            data=csv_buffer,
-            file_name=f"pedidos_{now_ec.strftime('%Y-%m-%d')}.csv",
+            label="📥 Descargar Reporte Histórico",
+            data=lambda: reporte_hist.to_csv(index=False),
+            file_name=nombre_reporte,
             mime="text/csv"
         )
 
-elif opcion == "Cambiar Estado":
-    st.header("Cambiar Estado de Pedido")
-    df = cargar_pedidos()
-    if df.empty:
-        st.info("No hay pedidos para modificar.")
-    else:
-        busqueda = st.text_input("Buscar por nombre o ID")
-        filtrado = df[df['Nombre_Orden'].str.contains(busqueda, case=False, na=False) | df['ID'].astype(str).str.contains(busqueda)]
-        if filtrado.empty:
-            st.warning("No se encontró ningún pedido.")
+    elif opcion == "Sucursales":
+        st.header("Reporte Consolidado de Sucursales")
+        desde, hasta = elegir_periodo()
+        consolidado = resumen_sucursales(METODOS_PAGO, desde, hasta)
+        st.markdown(f"### Del {desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')}")
+        if consolidado.empty:
+            st.info("Ninguna sucursal tiene cierres en este periodo.")
         else:
-            opciones = [f"#{row['ID']} - {row['Nombre_Orden']} ({row['Estado']})" for _, row in filtrado.iterrows()]
-            seleccionado = st.selectbox("Selecciona el pedido", opciones)
-            if seleccionado:
-                pedido_id = int(seleccionado.split(" - ")[0][1:])
-                pedido = df[df['ID'] == pedido_id].iloc[0]
-                st.info(f"Detalle: {pedido['Detalle']}")
-                st.info(f"Total: ${pedido['Total']:.2f}")
-                st.info(f"Método de pago: {pedido['Metodo_Pago']}")
-                nuevo_estado = st.selectbox("Nuevo estado", ESTADOS, index=ESTADOS.index(pedido['Estado']))
-                if st.button("Actualizar Estado"):
-                    df.loc[df['ID'] == pedido_id, 'Estado'] = nuevo_estado
-                    guardar_pedidos(df)
-                    st.success(f"¡Pedido #{pedido_id} actualizado a {nuevo_estado}!")
-                    st.rerun()
+            por_sucursal = totales_sucursales(consolidado, METODOS_PAGO).rename(index=nombre_sucursal)
+            st.subheader("Por sucursal")
+            st.dataframe(por_sucursal)
+            st.subheader("Todas las sucursales")
+            mostrar_cierre(por_sucursal.sum())
+            if desde != hasta:
+                st.subheader("Por día")
+                st.dataframe(consolidado.groupby(level='Dia').sum())
+        reporte_sucursales = consolidado.rename(index=nombre_sucursal, level='Sucursal').reset_index()
+        st.download_button(
+            label="📥 Descargar Reporte Consolidado",
+            data=lambda: reporte_sucursales.to_csv(index=False),
+            file_name=f"reporte_sucursales_{desde.strftime('%Y-%m-%d')}_{hasta.strftime('%Y-%m-%d')}.csv",
+            mime="text/csv"
+        )
 
+    elif opcion == "Ver Pedidos":
+        st.header("Registro de Pedidos")
+        estado_filtro = st.multiselect("Filtrar por estado", ESTADOS, default=ESTADOS)
+        metodo_filtro = st.multiselect("Filtrar por método de pago", METODOS_PAGO, default=METODOS_PAGO)
+        fecha_filtro = st.date_input("Filtrar por fecha", value=None)
+        df = historial('pedidos', fecha_filtro, fecha_filtro)
+        if df.empty:
+            st.info("No hay pedidos registrados aún." if fecha_filtro is None else "No hay pedidos registrados en la fecha seleccionada.")
+        else:
+            df_filtrado = df[df['Estado'].isin(estado_filtro) & df['Metodo_Pago'].isin(metodo_filtro)]
+            st.dataframe(df_filtrado.drop(columns='Dia').sort_values('ID', ascending=False))
+            st.write(f"**Total mostrado: ${df_filtrado['Total'].sum():.2f}**")
+            st.markdown("### 📥 Descargar respaldo")
+            boton_respaldo('pedidos', "Descargar pedidos", "pedidos")
+
+    elif opcion == "Cocina":
+        st.header("Cocina")
+        pantalla_cocina()
+
+    elif opcion == "Cambiar Estado":
+        st.header("Cambiar Estado de Pedido")
+        indice = indice_pedidos()
+        if not len(indice):
+            st.info("No hay pedidos para modificar.")
+        else:
+            busqueda = st.text_input("Buscar por nombre o ID", placeholder="Vacío: pedidos abiertos de hoy")
+            pagina = st.session_state.get(f"pagina_{busqueda}", 1)
+            resultados = indice.buscar(busqueda, fecha_hoy, pagina)
+            if not resultados.total:
+                st.warning("No hay pedidos abiertos hoy." if not busqueda.strip() else "No se encontró ningún pedido.")
+            else:
+                if resultados.paginas > 1:
+                    st.number_input(f"Página (de {resultados.paginas}, {resultados.total} pedidos)",
+                                    min_value=1, max_value=resultados.paginas, step=1, key=f"pagina_{busqueda}")
+                etiquetas = {
+                    pedido_id: f"#{pedido_id} - {nombre} ({estado})"
+                    for pedido_id, nombre, estado in zip(resultados.pedidos['ID'], resultados.pedidos['Nombre_Orden'], resultados.pedidos['Estado'])
+                }
+                pedido_id = st.selectbox("Selecciona el pedido", list(etiquetas), format_func=etiquetas.get)
+                if pedido_id is not None:
+                    pedido = indice.pedido(pedido_id)
+                    st.info(f"Detalle: {pedido['Detalle']}")
+                    st.info(f"Total: ${pedido['Total']:.2f}")
+                    st.info(f"Método de pago: {pedido['Metodo_Pago']}")
+                    nuevo_estado = st.selectbox("Nuevo estado", ESTADOS, index=ESTADOS.index(pedido['Estado']))
+                    if st.button("Actualizar Estado"):
+                        try:
+                            # Sólo si nadie lo cambió desde que se mostró (cocina, otra caja, la API)
+                            servicio.cambiar_estado(pedido_id, nuevo_estado, pedido['Estado'])
+                        except servicio.Conflicto as error:
+                            st.warning(f"{error} Vuelve a elegirlo para ver su estado actual.")
+                        else:
+                            st.success(f"¡Pedido #{pedido_id} actualizado a {nuevo_estado}!")
+                            st.rerun()
 
+    elif opcion == "Estadísticas":
+        st.header("Estadísticas de Ventas")
+        rango = st.date_input("Rango (vacío = todo el historial)", value=[], key="rango_estadisticas")
+        desde, hasta = (rango[0], rango[-1]) if rango else (None, None)
+        stats = estadisticas_historial(desde, hasta)
+        if not stats.pedidos:
+            st.info("No hay ventas pagadas en este periodo.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Ventas", f"${stats.ventas:,.2f}")
+            col2.metric("Pedidos pagados", f"{stats.pedidos:,}")
+            col3.metric("Ticket promedio", f"${stats.ticket_promedio:.2f}")
+            st.subheader("Ventas por hora")
+            st.bar_chart(stats.por_hora['Ventas'])
+            st.subheader("Ventas por día de la semana")
+            st.bar_chart(stats.por_dia_semana['Ventas'], sort=False)
+            st.subheader("Productos más vendidos")
+            st.dataframe(stats.top_productos, hide_index=True)
+            st.subheader("Métodos de pago")
+            st.dataframe(stats.metodos)
+            st.subheader("Ticket promedio por mes")
+            st.line_chart(stats.ticket_por_mes['Promedio'])
+        if not stats.gastos_por_mes.empty:
+            st.subheader("Gastos por mes")
+            st.bar_chart(stats.gastos_por_mes['Gastos'])
+finally:
+    medicion = perfil.terminar(medicion)
+    if ADMIN:
+        panel_rendimiento(medicion)
@@ -0,0 +1,126 @@
+import os
+from datetime import date
+
+import pandas as pd
+
+from esquema import dia, dias_de
+from perfil import medido
+
+# Compresión de las particiones; zstd reduce bastante más que snappy en texto repetido
+COMPRESION = 'zstd'
+
+
+def _mes(fechas):
+    # 'AAAA-MM' de cada fila, formateando sólo los meses distintos
+    claves = fechas.dt.year * 100 + fechas.dt.month
+    return claves.map({m: f"{m // 100}-{m % 100:02d}" for m in claves.unique()})
+
+
+def _mismo_id(existente, nuevas):
+    return existente['ID'].isin(nuevas['ID'])
+
+
+def _misma_fila(existente, nuevas):
+    # Gastos y caja no tienen clave: la fila idéntica (como texto, el tipo puede cambiar al pasar por Parquet)
+    columnas = list(nuevas.columns)
+    filas = lambda df: pd.MultiIndex.from_frame(df[columnas].astype(str))
+    return pd.Series(filas(existente).isin(filas(nuevas)), index=existente.index)
+
+
+def _rango_mes(mes):
+    inicio = date.fromisoformat(f"{mes}-01")
+    siguiente = date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+    return inicio, siguiente
+
+
+class Archivo:
+    """Archivo histórico columnar: ``<raiz>/<tabla>/<AAAA-MM>.parquet``.
+
+    Guarda los días ya cerrados fuera de las tablas vivas. Las consultas con
+    rango sólo abren las particiones (meses) que se cruzan con él. Los ítems
+    no tienen Fecha y se guardan en la partición del mes de su pedido.
+    """
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+
+    def _carpeta(self, tabla):
+        return os.path.join(self.raiz, tabla)
+
+    def firma(self, tabla):
+        # os.replace de una partición cambia el mtime de la carpeta
+        try:
+            info = os.stat(self._carpeta(tabla))
+        except FileNotFoundError:
+            return None
+        return info.st_mtime_ns
+
+    def particiones(self, tabla, desde=None, hasta=None):
+        carpeta = self._carpeta(tabla)
+        if not os.path.isdir(carpeta):
+            return []
+        rutas = []
+        for nombre in sorted(os.listdir(carpeta)):
+            if not nombre.endswith('.parquet'):
+                continue
+            inicio, siguiente = _rango_mes(nombre[:-len('.parquet')])
+            if (desde is None or siguiente > desde) and (hasta is None or inicio <= hasta):
+                rutas.append(os.path.join(carpeta, nombre))
+        return rutas
+
+    def fragmentos(self, tabla, desde=None, hasta=None):
+        # Una partición por bloque, ya filtrada al rango
+        for ruta in self.particiones(tabla, desde, hasta):
+            df = pd.read_parquet(ruta)
+            if 'Fecha' in df.columns:
+                dias = dias_de(df)
+                mascara = pd.Series(True, index=df.index)
+                if desde is not None:
+                    mascara &= dias >= dia(desde)
+                if hasta is not None:
+                    mascara &= dias <= dia(hasta)
+                df = df[mascara]
+            yield df
+
+    @medido('leer Parquet')
+    def cargar(self, tabla, columnas, desde=None, hasta=None):
+        partes = [df for df in self.fragmentos(tabla, desde, hasta) if not df.empty]
+        if not partes:
+            return pd.DataFrame(columns=columnas)
+        return pd.concat(partes, ignore_index=True)[columnas]
+
+    def _escribir(self, ruta, df):
+        tmp = ruta + '.tmp'
+        df.to_parquet(tmp, index=False, compression=COMPRESION)
+        os.replace(tmp, ruta)
+
+    def guardar(self, tabla, df, meses, reemplaza):
+        """Agrega ``df`` a las particiones ``meses`` (uno por fila).
+
+        ``reemplaza(existente, nuevas)`` marca las filas ya archivadas que
+        las nuevas sustituyen, así archivar dos veces el mismo día no duplica.
+        """
+        if df.empty:
+            return
+        carpeta = self._carpeta(tabla)
+        os.makedirs(carpeta, exist_ok=True)
+        for mes, nuevas in df.groupby(meses.to_numpy()):
+            ruta = os.path.join(carpeta, f"{mes}.parquet")
+            if os.path.exists(ruta):
+                existente = pd.read_parquet(ruta)
+                existente = existente[~reemplaza(existente, nuevas)]
+                nuevas = pd.concat([existente, nuevas], ignore_index=True) if not existente.empty else nuevas
+            self._escribir(ruta, nuevas.reset_index(drop=True))
+
+    def guardar_dias(self, pedidos, gastos, caja, items):
+        """Archiva los datos de uno o más días cerrados.
+
+        Un día se puede cerrar más de una vez (la caja se reabre): sólo se
+        reemplaza lo que ya estaba archivado de estas mismas filas, por ID
+        en pedidos e ítems y por fila idéntica en gastos y caja.
+        """
+        self.guardar('pedidos', pedidos, _mes(pedidos['Fecha']), _mismo_id)
+        for tabla, df in (('gastos', gastos), ('caja', caja)):
+            self.guardar(tabla, df, _mes(df['Fecha']), _misma_fila)
+        mes_pedido = items['ID'].map(dict(zip(pedidos['ID'], _mes(pedidos['Fecha']))))
+        self.guardar('items', items, mes_pedido, _mismo_id)
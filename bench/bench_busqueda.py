@@ -0,0 +1,43 @@
+"""Búsqueda de "Cambiar Estado" frente al tamaño del historial.
+
+Compara el filtro anterior (str.contains sobre Nombre_Orden e ID más
+iterrows para armar las opciones) con el índice de búsqueda paginado.
+
+Uso: python -m bench.bench_busqueda
+"""
+import time
+
+from busqueda import IndicePedidos
+from bench.sintetico import generar_pedidos
+
+TAMANOS = [10_000, 50_000, 200_000]
+BUSQUEDAS = ['', 'mesa 1', '3', '#42']
+
+
+def buscar_anterior(df, busqueda):
+    filtrado = df[df['Nombre_Orden'].str.contains(busqueda, case=False, na=False) | df['ID'].astype(str).str.contains(busqueda)]
+    return [f"#{row['ID']} - {row['Nombre_Orden']} ({row['Estado']})" for _, row in filtrado.iterrows()]
+
+
+def _milisegundos(funcion):
+    inicio = time.perf_counter()
+    funcion()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    print(f"{'pedidos':>8} {'búsqueda':>10} {'anterior (ms)':>14} {'índice (ms)':>12} {'construir (ms)':>15}")
+    for n in TAMANOS:
+        df = generar_pedidos(n)
+        dia = df['Fecha'].dt.date.iloc[-1]
+        inicio = time.perf_counter()
+        indice = IndicePedidos(df)
+        construir = (time.perf_counter() - inicio) * 1000
+        for busqueda in BUSQUEDAS:
+            anterior = _milisegundos(lambda: buscar_anterior(df, busqueda))
+            nuevo = _milisegundos(lambda: indice.buscar(busqueda, dia))
+            print(f"{n:>8} {busqueda!r:>10} {anterior:>14.1f} {nuevo:>12.2f} {construir:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
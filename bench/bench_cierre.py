@@ -0,0 +1,39 @@
+"""Escalamiento del cálculo de cierres con un año sintético de pedidos.
+
+Uso: python -m bench.bench_cierre
+"""
+
+from catalogo import METODOS_PAGO
+from cierre import calcular_cierres
+from bench.sintetico import generar_caja, generar_gastos, generar_pedidos
+from bench.tiempos import mejor_de
+
+TAMANOS = [25_000, 50_000, 100_000, 200_000, 400_000]
+
+
+def _cierres_por_dia(pedidos, gastos, caja):
+    # Enfoque anterior: para cada día, filtrar y sumar una vez por método de pago
+    dias_pedidos = pedidos['Fecha'].dt.date
+    dias_gastos = gastos['Fecha'].dt.date
+    dias_caja = caja['Fecha'].dt.date
+    for dia in sorted(set(dias_pedidos)):
+        pagados = pedidos[(dias_pedidos == dia) & (pedidos['Estado'] == 'Pagado')]
+        for metodo in METODOS_PAGO:
+            pagados[pagados['Metodo_Pago'] == metodo]['Total'].sum()
+        gastos[dias_gastos == dia]['Monto'].sum()
+        caja[dias_caja == dia]['Inicial'].sum()
+
+
+def main():
+    gastos = generar_gastos()
+    caja = generar_caja()
+    print(f"{'pedidos':>9} {'groupby (ms)':>13} {'us/pedido':>10} {'por día (ms)':>13}")
+    for n in TAMANOS:
+        pedidos = generar_pedidos(n)
+        t = mejor_de(3, lambda: calcular_cierres(pedidos, gastos, caja, METODOS_PAGO))
+        anterior = mejor_de(1, lambda: _cierres_por_dia(pedidos, gastos, caja)) if n <= 100_000 else float('nan')
+        print(f"{n:>9} {t * 1000:>13.1f} {t / n * 1e6:>10.2f} {anterior * 1000:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Pantalla de cocina: sondeo incremental frente a recargar el historial.
+
+Compara lo que costaba ver los pedidos "En proceso" (recargar la tabla de
+pedidos y filtrarla, como en "Ver Pedidos", cada vez que llega un pedido)
+con un sondeo de la cola de cocina, y marcar un pedido como entregado
+desde "Cambiar Estado" (busca el pedido en el índice, que se reconstruye
+tras cada guardado) frente al botón de cocina. Al final varias pantallas
+sondean a la vez mientras una caja guarda pedidos y la cocina los va
+marcando como entregados; si algo se queda trabado, lo reporta.
+
+Uso: python -m bench.bench_cocina [--pedidos 100000] [--pantallas 8]
+"""
+import argparse
+import multiprocessing
+import statistics
+import tempfile
+import threading
+import time
+
+from bench.suite import _nuevo_pedido, _preparar
+
+REPETICIONES = 15
+# Pedidos que guarda la caja mientras las pantallas sondean
+PEDIDOS_CONCURRENTES = 40
+# Pausa entre sondeos de cada pantalla (la app usa 3 s; aquí se aprieta)
+PAUSA_SONDEO_S = 0.01
+# Pausa entre toques de "Entregado" en la cocina
+PAUSA_ENTREGA_S = 0.03
+# Si la carga concurrente no termina en este tiempo, algo quedó trabado
+LIMITE_CONCURRENTE_S = 120
+
+
+def _mediana_ms(funcion, antes=None):
+    tiempos = []
+    for k in range(REPETICIONES):
+        if antes:
+            antes(k)
+        inicio = time.perf_counter()
+        funcion(k)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def _pantallas(almacen, pantallas):
+    # Cada pantalla sondea sin parar; la caja guarda pedidos y la cocina los entrega a la vez
+    tiempos, entregados, listo = [], [], threading.Event()
+
+    def pantalla():
+        while not listo.is_set():
+            inicio = time.perf_counter()
+            almacen.pedidos_cocina()
+            tiempos.append(time.perf_counter() - inicio)
+            time.sleep(PAUSA_SONDEO_S)
+
+    def cocina():
+        while not listo.is_set():
+            en_cocina = almacen.pedidos_cocina()
+            if en_cocina and almacen.entregar_pedido(en_cocina[0]['ID']):
+                entregados.append(en_cocina[0]['ID'])
+            time.sleep(PAUSA_ENTREGA_S)
+
+    def caja():
+        for k in range(PEDIDOS_CONCURRENTES):
+            _nuevo_pedido(almacen, 1000 + k)
+            time.sleep(0.02)
+
+    # Hilos daemon: si se traban, el proceso igual puede reportarlo y salir
+    hilos = [threading.Thread(target=pantalla, daemon=True) for _ in range(pantallas)]
+    hilos += [threading.Thread(target=cocina, daemon=True)]
+    for hilo in hilos:
+        hilo.start()
+    guardando = threading.Thread(target=caja, daemon=True)
+    guardando.start()
+    guardando.join(LIMITE_CONCURRENTE_S)
+    listo.set()
+    limite = time.perf_counter() + LIMITE_CONCURRENTE_S
+    for hilo in hilos:
+        hilo.join(max(0.0, limite - time.perf_counter()))
+    trabado = guardando.is_alive() or any(hilo.is_alive() for hilo in hilos)
+    tiempos = sorted(tiempos) or [float('nan')]
+    return (len(tiempos), tiempos[len(tiempos) // 2] * 1000, tiempos[int(len(tiempos) * 0.99)] * 1000,
+            len(entregados), trabado)
+
+
+def medir(n, backend, pantallas):
+    from bench.sintetico import generar_datos
+    datos = generar_datos(n)
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = _preparar(directorio, backend, datos)
+        nuevo = lambda k: _nuevo_pedido(almacen, k)
+
+        def anterior(_):
+            df = almacen.cargar_pedidos()
+            df[df['Estado'] == "En proceso"].sort_values('ID')
+        recargar = _mediana_ms(anterior, antes=nuevo)
+        almacen.pedidos_cocina()
+        sondeo = _mediana_ms(lambda _: almacen.pedidos_cocina(), antes=nuevo)
+        sin_cambios = _mediana_ms(lambda _: almacen.pedidos_cocina())
+
+        # Entregar: el mismo pedido recién guardado por los dos caminos
+        ids = []
+        guardar = lambda k: (nuevo(k), ids.append(almacen.siguiente_id_pedido() - 1), almacen.pedidos_cocina())
+        cambiar_estado = _mediana_ms(lambda _: almacen.actualizar_pedido(ids[-1], Estado='Entregado'), antes=guardar)
+        entregar = _mediana_ms(lambda _: almacen.entregar_pedido(ids[-1]), antes=guardar)
+
+        concurrente = _pantallas(almacen, pantallas)
+        return recargar, sondeo, sin_cambios, cambiar_estado, entregar, concurrente, almacen.cola_cocina.recargas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pedidos', type=int, default=100_000)
+    parser.add_argument('--pantallas', type=int, default=8)
+    args = parser.parse_args()
+    print(f"{args.pedidos} pedidos en el historial; mediana de {REPETICIONES} (ms)\n")
+    print(f"{'backend':>8} {'recargar+filtrar':>17} {'sondeo':>7} {'sin cambios':>12} "
+          f"{'Cambiar Estado':>15} {'Entregado':>10}")
+    concurrentes = {}
+    contexto = multiprocessing.get_context('spawn')
+    for backend in ('csv', 'sqlite'):
+        # Un proceso por backend: almacen se importa con su configuración
+        with contexto.Pool(1) as pool:
+            recargar, sondeo, sin_cambios, cambiar, entregar, concurrente, recargas = pool.apply(
+                medir, (args.pedidos, backend, args.pantallas))
+        print(f"{backend:>8} {recargar:>17.1f} {sondeo:>7.2f} {sin_cambios:>12.3f} {cambiar:>15.1f} {entregar:>10.2f}")
+        concurrentes[backend] = (*concurrente, recargas)
+    print(f"\n{args.pantallas} pantallas sondeando mientras se guardan {PEDIDOS_CONCURRENTES} pedidos "
+          f"y la cocina los entrega:")
+    for backend, (sondeos, p50, p99, entregados, trabado, recargas) in concurrentes.items():
+        print(f"{backend:>8}: {sondeos} sondeos, p50 {p50:.3f} ms, p99 {p99:.1f} ms, {entregados} entregados, "
+              f"{recargas} recargas completas" + ("  ¡TRABADO!" if trabado else ""))
+
+
+if __name__ == '__main__':
+    main()
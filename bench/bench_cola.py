@@ -0,0 +1,99 @@
+"""Guardar Pedido: escribir en el almacén frente a encolar para el hilo de fondo.
+
+Mide lo que espera la caja al guardar cada pedido con el almacén libre y con
+otra terminal que lo ocupa a ratos (una compactación del CSV, un disco
+lento), guardando directamente como antes o encolando el pedido. Con la
+cola también mide cuánto tarda en quedar todo guardado.
+
+Uso: python -m bench.bench_cola [--pedidos 100000] [--guardados 60]
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench.suite import _encolar_pedido, _nuevo_pedido, _preparar
+
+# La otra terminal toma el bloqueo de escritura este tiempo, y lo suelta otro tanto
+OCUPADO_S = 0.3
+LIBRE_S = 0.3
+# Pausa entre pedidos de la caja
+PAUSA_S = 0.05
+
+
+def _otra_terminal(directorio, backend, lista, parar):
+    from bench.estres_concurrencia import _preparar as importar
+    almacen = importar(directorio, backend)
+    lista.set()
+    while not parar.is_set():
+        with almacen.almacen.escritura():
+            time.sleep(OCUPADO_S)
+        time.sleep(LIBRE_S)
+
+
+def _percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return [tiempos[len(tiempos) // 2] * 1000, tiempos[int(len(tiempos) * 0.99)] * 1000, tiempos[-1] * 1000]
+
+
+def _caja(guardar, guardados, desde):
+    tiempos = []
+    for k in range(guardados):
+        if k:
+            time.sleep(PAUSA_S)
+        inicio = time.perf_counter()
+        guardar(desde + k)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def medir(n, backend, guardados, ocupado):
+    from bench.sintetico import generar_datos
+    datos = generar_datos(n)
+    contexto = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = _preparar(directorio, backend, datos)
+        if ocupado:
+            lista, parar = contexto.Event(), contexto.Event()
+            otra = contexto.Process(target=_otra_terminal, args=(directorio, backend, lista, parar))
+            otra.start()
+            lista.wait(120)
+        directo = _caja(lambda k: _nuevo_pedido(almacen, k), guardados, 0)
+        tokens = []
+        encolado = _caja(lambda k: tokens.append(_encolar_pedido(almacen, k)), guardados, guardados)
+        # Desde el último pedido de la caja hasta que todo quedó en el almacén
+        fin_caja = time.perf_counter()
+        for token in tokens:
+            almacen.esperar_pedido(token, 120)
+        vaciado = time.perf_counter() - fin_caja
+        if ocupado:
+            parar.set()
+            otra.join()
+        pendientes = almacen.estado_cola().pendientes
+    return _percentiles(directo), _percentiles(encolado), vaciado, pendientes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pedidos', type=int, default=100_000)
+    parser.add_argument('--guardados', type=int, default=60)
+    args = parser.parse_args()
+    print(f"{args.pedidos} pedidos en el historial, {args.guardados} guardados por caso; "
+          f"ocupado = otra terminal con el bloqueo {OCUPADO_S * 1000:.0f} ms de cada {(OCUPADO_S + LIBRE_S) * 1000:.0f}\n")
+    print(f"{'backend':>8} {'almacén':>8} {'directo p50/p99/máx (ms)':>26} {'encolar p50/p99/máx (ms)':>26} "
+          f"{'todo guardado (s)':>18}")
+    contexto = multiprocessing.get_context('spawn')
+    for backend in ('csv', 'sqlite'):
+        for ocupado in (False, True):
+            # No un Pool: sus procesos no pueden lanzar la otra terminal
+            with ProcessPoolExecutor(1, mp_context=contexto) as pool:
+                directo, encolado, vaciado, pendientes = pool.submit(
+                    medir, args.pedidos, backend, args.guardados, ocupado).result()
+            print(f"{backend:>8} {'ocupado' if ocupado else 'libre':>8} {'/'.join(f'{t:.1f}' for t in directo):>26} "
+                  f"{'/'.join(f'{t:.1f}' for t in encolado):>26} {vaciado:>18.2f}"
+                  + (f"  ({pendientes} en cola)" if pendientes else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Filtros por día y memoria: Fecha tipada con Dia frente a .dt.date por filtro.
+
+Compara el filtro anterior (crear un date por fila en cada filtro) con la
+comparación sobre la columna Dia, y la memoria de Estado/Metodo_Pago como
+texto frente a categorías. También mide la lectura de Fecha y carga un CSV
+con filas del gestor anterior (sin zona horaria) mezcladas con filas nuevas.
+
+Uso: python -m bench.bench_esquema
+"""
+import io
+
+import pandas as pd
+
+from bench.sintetico import generar_pedidos
+from bench.tiempos import mejor_de
+from esquema import dia, fechas, tipar
+
+TAMANOS = [50_000, 200_000]
+# Filas del gestor anterior al principio del CSV mezclado
+FILAS_SIN_ZONA = 1_000
+
+
+def _mib(df, columnas):
+    return df[columnas].memory_usage(deep=True).sum() / 2**20
+
+
+def main():
+    print(f"{'pedidos':>8} {'dt.date (ms)':>13} {'Dia (ms)':>9} {'rango dt.date':>14} {'rango Dia':>10} "
+          f"{'texto MiB':>10} {'categ. MiB':>11}")
+    for n in TAMANOS:
+        texto = generar_pedidos(n).to_csv(index=False)
+        crudo = pd.read_csv(io.StringIO(texto))
+        crudo['Fecha'] = pd.to_datetime(crudo['Fecha'], format='ISO8601')
+        tipado = tipar(pd.read_csv(io.StringIO(texto)))
+        fecha = crudo['Fecha'].iloc[len(crudo) // 2].date()
+        desde, hasta = fecha.replace(day=1), fecha
+        anterior = mejor_de(5, lambda: crudo[crudo['Fecha'].dt.date == fecha])
+        nuevo = mejor_de(5, lambda: tipado[tipado['Dia'] == dia(fecha)])
+        dias = lambda: crudo['Fecha'].dt.date
+        rango_anterior = mejor_de(5, lambda: crudo[(dias() >= desde) & (dias() <= hasta)])
+        rango_nuevo = mejor_de(5, lambda: tipado[(tipado['Dia'] >= dia(desde)) & (tipado['Dia'] <= dia(hasta))])
+        columnas = ['Estado', 'Metodo_Pago']
+        print(f"{n:>8} {anterior * 1000:>13.1f} {nuevo * 1000:>9.2f} {rango_anterior * 1000:>14.1f} "
+              f"{rango_nuevo * 1000:>10.2f} {_mib(crudo, columnas):>10.1f} {_mib(tipado, columnas):>11.2f}")
+
+    # Lectura de Fecha: todo con zona (formato actual) y CSV con filas del
+    # gestor anterior (sin zona) seguidas de filas nuevas
+    pedidos = generar_pedidos(TAMANOS[-1])
+    actual = pd.read_csv(io.StringIO(pedidos.to_csv(index=False)))['Fecha']
+    anterior = mejor_de(3, lambda: pd.to_datetime(actual, format='ISO8601'))
+    nuevo = mejor_de(3, lambda: fechas(actual))
+    print(f"\nFecha con zona, {len(actual)} filas: to_datetime {anterior * 1000:.0f} ms, esquema.fechas {nuevo * 1000:.0f} ms")
+    texto = pedidos['Fecha'].astype(str)
+    texto[:FILAS_SIN_ZONA] = pedidos['Fecha'][:FILAS_SIN_ZONA].dt.strftime('%Y-%m-%d %H:%M:%S')
+    mezclado = pd.read_csv(io.StringIO(pedidos.assign(Fecha=texto).to_csv(index=False)))['Fecha']
+    try:
+        pd.to_datetime(mezclado, format='ISO8601')
+        resultado = "carga"
+    except ValueError as error:
+        resultado = f"falla ({error.__class__.__name__})"
+    nuevo = mejor_de(3, lambda: fechas(mezclado))
+    print(f"CSV mezclado ({FILAS_SIN_ZONA} filas sin zona): to_datetime {resultado}; "
+          f"esquema.fechas {nuevo * 1000:.0f} ms, {fechas(mezclado).isna().sum()} fechas sin leer")
+
+
+if __name__ == '__main__':
+    main()
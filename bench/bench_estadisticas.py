@@ -0,0 +1,57 @@
+"""Página "Estadísticas" con dos años de datos sintéticos.
+
+Mide el cálculo de los indicadores sobre el historial ya cargado y el
+render completo de la página con streamlit.testing (primera visita, que
+carga las tablas, y visitas siguientes, que usan los agregados en caché).
+
+Uso: python -m bench.bench_estadisticas
+"""
+import os
+import tempfile
+import time
+
+from bench.sintetico import generar_caja, generar_gastos, generar_pedidos
+from bench.tiempos import mejor_de
+from estadisticas import calcular_estadisticas
+from productos import parsear_detalle
+
+DIAS = 730
+PEDIDOS = 150_000
+# Presupuesto de render por visita
+OBJETIVO_S = 1.0
+
+
+def main():
+    pedidos = generar_pedidos(PEDIDOS, dias=DIAS)
+    gastos = generar_gastos(dias=DIAS)
+    caja = generar_caja(dias=DIAS)
+    items = parsear_detalle(pedidos)
+    calculo = mejor_de(3, lambda: calcular_estadisticas(pedidos, items, gastos))
+    print(f"{PEDIDOS} pedidos, {len(items)} ítems, {DIAS} días")
+    print(f"calcular_estadisticas: {calculo * 1000:.0f} ms")
+
+    from streamlit.testing.v1 import AppTest
+    app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+    anterior = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        try:
+            pedidos.to_csv('pedidos_mi_escondite.csv', index=False)
+            gastos.to_csv('gastos_mi_escondite.csv', index=False)
+            caja.to_csv('caja_mi_escondite.csv', index=False)
+            items.to_csv('items_mi_escondite.csv', index=False)
+            at = AppTest.from_file(app, default_timeout=300).run()
+            inicio = time.perf_counter()
+            at.sidebar.selectbox[0].select("Estadísticas").run()
+            primera = time.perf_counter() - inicio
+            assert not at.exception, at.exception
+            siguientes = mejor_de(5, at.run)
+        finally:
+            os.chdir(anterior)
+    print(f"render primera visita: {primera * 1000:.0f} ms")
+    print(f"render con caché:      {siguientes * 1000:.0f} ms")
+    print("OK" if siguientes < OBJETIVO_S else f"LENTO: más de {OBJETIVO_S:.0f} s por render")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Costo por rerun del total del carrito frente al tamaño del MENU.
+
+Compara el cálculo anterior (recorrer todo el MENU para el total de la
+cabecera y buscar cada precio con un generador anidado en el resumen) con
+el índice precompilado y el total incremental del carrito.
+
+Después mide el catálogo versionado: comprobar en cada rerun si cambió el
+archivo del menú frente a releerlo siempre, y poner precio por fecha a los
+ítems de 100 mil pedidos con una sola versión o con una por mes.
+
+Uso: python -m bench.bench_menu
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from catalogo import (
+    MENU, TZ_EC, ArchivoCatalogo, Catalogo, clave_carrito, construir_indice, guardar_catalogo, leer_catalogo,
+    version_menu,
+)
+
+# None = MENU real del local
+TAMANOS = [None, 300, 1200, 6000]
+ITEMS_EN_CARRITO = 10
+REPETICIONES = 200
+PEDIDOS_CATALOGO = 100_000
+VERSIONES = [1, 12, 60]
+
+
+def menu_sintetico(productos_totales):
+    por_categoria = productos_totales // len(MENU)
+    return {
+        categoria: {f"{categoria} {i}": 1.0 + (i % 20) * 0.25 for i in range(por_categoria)}
+        for categoria in MENU
+    }
+
+
+def _carrito(menu):
+    claves = [clave_carrito(c, p) for c, items in menu.items() for p in items]
+    paso = max(1, len(claves) // ITEMS_EN_CARRITO)
+    return {k: 2 for k in claves[::paso][:ITEMS_EN_CARRITO]}
+
+
+def rerun_anterior(menu, carrito):
+    total = sum(carrito.get(key, 0) * precio for cat in menu for key, precio in [(f"{cat} - {p}", precio) for p, precio in menu[cat].items()])
+    total = 0
+    for key, cant in carrito.items():
+        cat, prod = key.split(" - ", 1)
+        precio = next(precio for c, items in menu.items() if c == cat for p, precio in items.items() if p == prod)
+        total += cant * precio
+    return total
+
+
+def rerun_indice(indice, carrito, total_carrito):
+    # Cabecera: total incremental ya guardado; resumen: una búsqueda O(1) por ítem
+    detalle = [f"{cant}x {indice[key].producto}" for key, cant in carrito.items()]
+    return total_carrito, detalle
+
+
+def _microsegundos(funcion):
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        funcion()
+    return (time.perf_counter() - inicio) / REPETICIONES * 1e6
+
+
+def main():
+    print(f"{'productos':>10} {'anterior (us)':>14} {'índice (us)':>12} {'construir índice (us)':>22}")
+    for n in TAMANOS:
+        menu = MENU if n is None else menu_sintetico(n)
+        n = sum(len(items) for items in menu.values())
+        carrito = _carrito(menu)
+        indice = construir_indice(menu)
+        total = sum(indice[k].precio * c for k, c in carrito.items())
+        anterior = _microsegundos(lambda: rerun_anterior(menu, carrito))
+        nuevo = _microsegundos(lambda: rerun_indice(indice, carrito, total))
+        construir = _microsegundos(lambda: construir_indice(menu))
+        print(f"{n:>10} {anterior:>14.1f} {nuevo:>12.1f} {construir:>22.1f}")
+    medir_catalogo()
+
+
+def catalogo_sintetico(versiones):
+    # Una versión por mes hasta hoy, cada una con todos los precios 5 centavos más altos
+    hoy = datetime.now(TZ_EC)
+    return Catalogo([
+        version_menu(hoy - timedelta(days=30 * (versiones - n)),
+                     {c: {p: round(precio + 0.05 * n, 2) for p, precio in items.items()} for c, items in MENU.items()})
+        for n in range(versiones)
+    ])
+
+
+def medir_catalogo():
+    from bench.sintetico import generar_pedidos
+    from productos import parsear_detalle
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'menu.json')
+        guardar_catalogo(ruta, catalogo_sintetico(VERSIONES[-1]))
+        archivo = ArchivoCatalogo(ruta)
+        archivo.actual()
+        sin_cambios = _microsegundos(archivo.actual)
+        releer = _microsegundos(lambda: leer_catalogo(ruta))
+    print(f"\ncatálogo de {VERSIONES[-1]} versiones por rerun: comprobar firma {sin_cambios:.1f} us, "
+          f"releer el archivo {releer:.0f} us")
+    pedidos = generar_pedidos(PEDIDOS_CATALOGO)
+    print(f"\n{'versiones':>10} {'precios de ' + str(PEDIDOS_CATALOGO) + ' pedidos (ms)':>34}")
+    for n in VERSIONES:
+        catalogo = catalogo_sintetico(n)
+        inicio = time.perf_counter()
+        parsear_detalle(pedidos, catalogo)
+        print(f"{n:>10} {(time.perf_counter() - inicio) * 1000:>34.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Migración de CSV grandes del gestor anterior al esquema actual.
+
+Escribe un pedidos_mi_escondite.csv como el del gestor anterior (sin
+Metodo_Pago, fechas sin zona, precios de su menú), le agrega pedidos
+guardados por este gestor en el diario, como queda un local que cambió de
+gestor, y lo migra. Mide la migración y la carga de pedidos antes y después,
+e imprime el reporte de verificación.
+
+Uso: python -m bench.bench_migracion [--tamanos 100000 500000]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+TAMANOS = [100_000, 500_000]
+# Pedidos guardados por este gestor sobre el CSV anterior
+PEDIDOS_NUEVOS = 300
+
+
+def _segundos(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def medir(n, con_id):
+    from bench.sintetico import generar_legado
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        # Con SQLite, importar almacen no migra los CSV: la migración se llama aquí
+        os.environ['ESCONDITE_BACKEND'] = 'sqlite'
+        os.environ['ESCONDITE_DB'] = os.path.join(directorio, 'bench.db')
+        generar_legado(n, con_id=con_id).to_csv('pedidos_mi_escondite.csv', index=False)
+        import almacen
+        from bench.suite import _nuevo_pedido
+        csv = almacen.AlmacenCSV()
+        antes, _ = _segundos(csv.cargar_pedidos)
+        if con_id:
+            almacen.almacen = csv
+            for k in range(PEDIDOS_NUEVOS):
+                _nuevo_pedido(almacen, k)
+        migracion, reporte = _segundos(lambda: almacen.migrar_esquema(csv))
+        despues, pedidos = _segundos(csv.cargar_pedidos)
+        items = csv.cargar_items()
+        pagados = pedidos[pedidos['Estado'] == 'Pagado']
+        cierres = csv.cargar_cierres()
+        cierres_ventas = cierres.loc[~cierres['Concepto'].isin(['Inicial', 'Gastos']), 'Monto'].sum()
+        comprobaciones = {
+            'Metodo_Pago vacíos': int(pedidos['Metodo_Pago'].isna().sum()),
+            'pedidos sin ítems': int((~pedidos['ID'].isin(items['ID'])).sum()),
+            'ventas en cierres - pagados ($)': round(float(cierres_ventas - pagados['Total'].sum()), 2),
+            'versión anotada': csv.version_esquema(),
+            'segunda migración': almacen.migrar_esquema(csv),
+        }
+        os.chdir(os.path.dirname(directorio))
+    return antes, migracion, despues, reporte.texto(), comprobaciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS)
+    args = parser.parse_args()
+    contexto = multiprocessing.get_context('spawn')
+    for n in args.tamanos:
+        for con_id in (True, False):
+            with contexto.Pool(1) as pool:
+                antes, migracion, despues, texto, comprobaciones = pool.apply(medir, (n, con_id))
+            print(f"\n== {n} pedidos del gestor anterior{'' if con_id else ' (sin ID ni Nombre_Orden)'} ==")
+            print(f"cargar pedidos antes {antes * 1000:.0f} ms, migrar {migracion:.1f} s, cargar después {despues * 1000:.0f} ms")
+            print(texto)
+            for nombre, valor in comprobaciones.items():
+                print(f"{nombre}: {valor}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Reporte consolidado de varias sucursales: en serie desde los pedidos frente a en paralelo desde los cierres.
+
+Crea K sucursales con un año de datos cada una y sus cierres materializados,
+y mide el consolidado de todo el año de tres maneras: recalculando en serie
+el cierre de cada sucursal desde sus pedidos, gastos y caja (lo que costaría
+sin la tabla materializada), con resumen_sucursales en un solo hilo y con
+resumen_sucursales en paralelo; cada una con la caché vacía, y al final una
+repetición con la caché llena. Comprueba que todas dan las mismas ventas.
+
+Con --latencia-ms cada lectura de una tabla espera además ese tiempo, como
+con las carpetas de las sucursales en un disco de red o sincronizado.
+
+Uso: python -m bench.bench_sucursales [--sucursales 2 4 8 16] [--pedidos 40000] [--backend csv|sqlite] [--latencia-ms 0]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from bench.tiempos import mejor_de
+
+SUCURSALES = [2, 4, 8, 16]
+REPETICIONES = 3
+
+
+def _mejor_y_resultado(funcion, antes):
+    # También devuelve el resultado, para comparar las maneras entre sí
+    resultados = []
+    return mejor_de(REPETICIONES, lambda: resultados.append(funcion()), antes), resultados[-1]
+
+
+def _lento(cargar, latencia):
+    def cargar_lento(*args):
+        time.sleep(latencia)
+        return cargar(*args)
+    return cargar_lento
+
+
+def medir(k, n, backend, latencia):
+    from bench.sintetico import generar_datos
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        nombres = [f"s{i:02d}" for i in range(k)]
+        os.environ['ESCONDITE_BACKEND'] = backend
+        os.environ['ESCONDITE_SUCURSALES'] = os.path.join(directorio, 'sucursales')
+        os.environ['ESCONDITE_SUCURSAL'] = nombres[0]
+        for i, nombre in enumerate(nombres):
+            datos = generar_datos(n, semilla=i)
+            ruta = os.path.join('sucursales', nombre)
+            os.makedirs(ruta)
+            for tabla in ('pedidos', 'items', 'gastos', 'caja'):
+                getattr(datos, tabla).to_csv(os.path.join(ruta, f'{tabla}_mi_escondite.csv'), index=False)
+        import almacen
+        from catalogo import METODOS_PAGO
+        from cierre import calcular_cierres
+
+        def backend_de(nombre):
+            return almacen.almacen if nombre == almacen.SUCURSAL else almacen._almacen_sucursal(nombre)
+        for nombre in nombres:
+            if backend == 'sqlite':
+                almacen.migrar_csv_a_sqlite(almacen.AlmacenCSV(almacen.directorio_sucursal(nombre)), backend_de(nombre))
+            elif backend_de(nombre).cierres_vacios():
+                almacen.reconstruir_cierres(backend_de(nombre))
+            if latencia:
+                for tabla in ('pedidos', 'gastos', 'caja', 'cierres'):
+                    cargar = getattr(backend_de(nombre), f'cargar_{tabla}')
+                    setattr(backend_de(nombre), f'cargar_{tabla}', _lento(cargar, latencia))
+
+        def vaciar_cache():
+            almacen.cache.invalidar('cierres', *(f'sucursal:{s}' for s in nombres))
+
+        def crudo():
+            return {s: calcular_cierres(backend_de(s).cargar_pedidos(), backend_de(s).cargar_gastos(),
+                                        backend_de(s).cargar_caja(), METODOS_PAGO) for s in nombres}
+
+        tiempos = {}
+        tiempos['crudo en serie'], en_serie = _mejor_y_resultado(crudo, vaciar_cache)
+        tiempos['cierres, 1 hilo'], _ = _mejor_y_resultado(
+            lambda: almacen.resumen_sucursales(METODOS_PAGO, hilos=1), vaciar_cache)
+        tiempos['cierres, paralelo'], consolidado = _mejor_y_resultado(
+            lambda: almacen.resumen_sucursales(METODOS_PAGO), vaciar_cache)
+        tiempos['con caché'], _ = _mejor_y_resultado(lambda: almacen.resumen_sucursales(METODOS_PAGO), lambda: None)
+        ventas = consolidado.groupby(level='Sucursal')['Total_Ventas'].sum().round(2)
+        iguales = all(abs(ventas[s] - en_serie[s]['Total_Ventas'].sum()) < 0.005 for s in nombres)
+        os.chdir(os.path.dirname(directorio))
+    return tiempos, iguales
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sucursales', type=int, nargs='+', default=SUCURSALES)
+    parser.add_argument('--pedidos', type=int, default=40_000, help="pedidos por sucursal")
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], default='csv')
+    parser.add_argument('--latencia-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    contexto = multiprocessing.get_context('spawn')
+    print(f"{args.backend}, {args.pedidos} pedidos por sucursal, {args.latencia_ms:g} ms por lectura; "
+          f"mejor de {REPETICIONES} (ms)\n")
+    encabezado = None
+    for k in args.sucursales:
+        # Un proceso nuevo por caso: almacen toma sus rutas y su sucursal al importarse
+        with contexto.Pool(1) as pool:
+            tiempos, iguales = pool.apply(medir, (k, args.pedidos, args.backend, args.latencia_ms / 1000))
+        if encabezado is None:
+            encabezado = f"{'sucursales':>10} " + " ".join(f"{nombre:>18}" for nombre in tiempos)
+            print(encabezado)
+        print(f"{k:>10} " + " ".join(f"{t * 1000:>18.1f}" for t in tiempos.values())
+              + ("" if iguales else "  ¡las ventas no coinciden!"))
+
+
+if __name__ == '__main__':
+    main()
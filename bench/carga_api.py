@@ -0,0 +1,213 @@
+"""Carga sostenida sobre la API HTTP: pedidos por segundo con clientes concurrentes.
+
+Levanta api.py con uvicorn sobre un local sintético, abre la caja por la API
+y lanza varios clientes (una conexión keep-alive cada uno) que durante un
+tiempo crean pedidos y cobran la mitad, como una app de delivery y una
+terminal de pago: ésta consulta el pedido (GET) y lo cobra (PATCH), así
+las lecturas de unos clientes se cruzan con las escrituras de otros. Mide
+pedidos por segundo y latencias, y al final comprueba por la API que cada
+pedido aceptado quedó guardado una sola vez y que el cierre del día suma
+exactamente lo cobrado.
+
+Uso: python -m bench.carga_api [--clientes 16] [--segundos 10] [--backend csv|sqlite] [--pedidos 10000] [--workers 1]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+# Fracción de pedidos que el cliente cobra enseguida
+COBRADOS = 0.5
+# Una petición sin respuesta en este tiempo cuenta como servidor trabado
+TIMEOUT_S = 30
+
+
+def _preparar_local(directorio, backend, n):
+    from bench.sintetico import generar_datos
+    from bench.suite import _preparar
+    # Historial hasta ayer: hoy empieza sin caja abierta
+    dias = max(1, n // 120)
+    _preparar(directorio, backend, generar_datos(n, dias=dias, inicio=date.today() - timedelta(days=dias)))
+
+
+def _servidor(directorio, backend, puerto, workers):
+    # El mismo arranque que en producción: python api.py, con el local en el directorio actual
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    entorno = {**os.environ, 'PYTHONPATH': raiz, 'ESCONDITE_BACKEND': backend,
+               'ESCONDITE_DB': os.path.join(directorio, 'suite.db')}
+    entorno.pop('ESCONDITE_API_TOKEN', None)
+    return subprocess.Popen([sys.executable, os.path.join(raiz, 'api.py'), '--port', str(puerto),
+                             '--workers', str(workers)], cwd=directorio, env=entorno)
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Cliente:
+    def __init__(self, puerto):
+        self.conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=TIMEOUT_S)
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        self.conexion.request(metodo, ruta, None if cuerpo is None else json.dumps(cuerpo),
+                              {'Content-Type': 'application/json'})
+        respuesta = self.conexion.getresponse()
+        return respuesta.status, json.loads(respuesta.read())
+
+
+def _esperar_servidor(puerto, proceso):
+    for _ in range(600):
+        if proceso.poll() is not None:
+            sys.exit("El servidor terminó con error")
+        try:
+            return Cliente(puerto).pedir('GET', '/menu')[1]
+        except OSError:
+            time.sleep(0.1)
+    sys.exit("El servidor no respondió")
+
+
+def _trabajar(numero, puerto, claves, hasta, resultados):
+    azar = random.Random(numero)
+    cliente = Cliente(puerto)
+    creados, cobrados, lat_crear, lat_cobrar, lat_consultar, errores = [], [], [], [], [], []
+    try:
+        while time.perf_counter() < hasta:
+            carrito = {clave: azar.randint(1, 3) for clave in azar.sample(claves, azar.randint(1, 4))}
+            inicio = time.perf_counter()
+            estado, cuerpo = cliente.pedir('POST', '/pedidos', {
+                'nombre': f"C{numero}-{len(creados)}", 'carrito': carrito, 'metodo_pago': 'Efectivo'})
+            lat_crear.append(time.perf_counter() - inicio)
+            if estado not in (201, 202):
+                errores.append((estado, cuerpo))
+                continue
+            creados.append(cuerpo)
+            if cuerpo['ID'] is not None and azar.random() < COBRADOS:
+                inicio = time.perf_counter()
+                estado, leido = cliente.pedir('GET', f"/pedidos/{cuerpo['ID']}")
+                lat_consultar.append(time.perf_counter() - inicio)
+                if estado != 200:
+                    errores.append((estado, leido))
+                    continue
+                inicio = time.perf_counter()
+                estado, actualizado = cliente.pedir('PATCH', f"/pedidos/{cuerpo['ID']}",
+                                                    {'estado': 'Pagado', 'estado_anterior': leido['Estado']})
+                lat_cobrar.append(time.perf_counter() - inicio)
+                if estado == 200:
+                    cobrados.append(cuerpo)
+                else:
+                    errores.append((estado, actualizado))
+    except OSError as error:
+        # Sin respuesta a tiempo: el servidor quedó trabado o se cayó
+        errores.append(('sin respuesta', f"{type(error).__name__}: {error}"))
+    resultados[numero] = (creados, cobrados, lat_crear, lat_cobrar, lat_consultar, errores)
+
+
+def _percentiles(tiempos):
+    if not tiempos:
+        return "-"
+    tiempos = sorted(tiempos)
+    return "/".join(f"{tiempos[int(len(tiempos) * p)] * 1000:.1f}" for p in (0.5, 0.99)) + f"/{tiempos[-1] * 1000:.1f}"
+
+
+def verificar(cliente, creados, cobrados, n):
+    errores = []
+    # Los pedidos que respondieron 202 se guardan después: se espera a la cola
+    for _ in range(600):
+        if not cliente.pedir('GET', '/estado')[1]['pendientes']:
+            break
+        time.sleep(0.1)
+    ids = []
+    for pedido in creados:
+        if pedido['ID'] is None:
+            pedido['ID'] = cliente.pedir('GET', f"/pedidos/cola/{pedido['token']}")[1]['ID']
+        ids.append(pedido['ID'])
+    if None in ids:
+        errores.append(f"{ids.count(None)} pedidos aceptados sin ID")
+    elif len(set(ids)) != len(ids):
+        errores.append("IDs repetidos")
+    elif sorted(ids) != list(range(n + 1, n + 1 + len(ids))):
+        errores.append("los IDs no son consecutivos: hay pedidos de más o perdidos")
+    hoy = cliente.pedir('GET', f"/cierres/{date.today().isoformat()}")[1]
+    esperado = round(sum(p['Total'] for p in cobrados), 2)
+    if abs(hoy['Total_Ventas'] - esperado) > 0.005:
+        errores.append(f"el cierre suma ${hoy['Total_Ventas']:.2f} y se cobraron ${esperado:.2f}")
+    return errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=16)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], default='csv')
+    parser.add_argument('--pedidos', type=int, default=10_000, help="historial previo")
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    contexto = multiprocessing.get_context('spawn')
+    puerto = _puerto_libre()
+    with tempfile.TemporaryDirectory() as directorio:
+        # Los datos se preparan en otro proceso: _preparar cambia de directorio e importa almacen
+        with contexto.Pool(1) as pool:
+            pool.apply(_preparar_local, (directorio, args.backend, args.pedidos))
+        servidor = _servidor(directorio, args.backend, puerto, args.workers)
+        try:
+            version = _esperar_servidor(puerto, servidor)
+            claves = [f"{categoria} - {producto}" for categoria, items in version['menu'].items() for producto in items]
+            cliente = Cliente(puerto)
+            estado, cuerpo = cliente.pedir('POST', '/caja/apertura', {'inicial': 50.0})
+            if estado != 201:
+                sys.exit(f"No se pudo abrir la caja: {cuerpo}")
+
+            resultados = {}
+            hasta = time.perf_counter() + args.segundos
+            inicio = time.perf_counter()
+            hilos = [threading.Thread(target=_trabajar, args=(k, puerto, claves, hasta, resultados))
+                     for k in range(args.clientes)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            duracion = time.perf_counter() - inicio
+
+            creados = [p for r in resultados.values() for p in r[0]]
+            cobrados = [p for r in resultados.values() for p in r[1]]
+            errores = [e for r in resultados.values() for e in r[5]]
+            con_id = sum(p['ID'] is not None for p in creados)
+            print(f"{args.backend}, {args.workers} proceso(s), {args.clientes} clientes, {args.pedidos} pedidos de historial, "
+                  f"{duracion:.1f} s")
+            print(f"pedidos creados: {len(creados)} ({len(creados) / duracion:.0f}/s), "
+                  f"{con_id} con ID en la respuesta, {len(creados) - con_id} con 202")
+            print(f"cobros: {len(cobrados)} ({len(cobrados) / duracion:.0f}/s)")
+            print(f"POST /pedidos p50/p99/máx (ms): {_percentiles([t for r in resultados.values() for t in r[2]])}")
+            print(f"GET consulta  p50/p99/máx (ms): {_percentiles([t for r in resultados.values() for t in r[4]])}")
+            print(f"PATCH cobro   p50/p99/máx (ms): {_percentiles([t for r in resultados.values() for t in r[3]])}")
+            # Conexión nueva: la de la apertura pasó la carga inactiva y uvicorn ya la cerró
+            trabado = any(e[0] == 'sin respuesta' for e in errores)
+            fallos = [] if trabado else verificar(Cliente(puerto), creados, cobrados, args.pedidos)
+            fallos += [f"{len(errores)} respuestas con error, p. ej. {errores[0]}"] if errores else []
+        finally:
+            servidor.terminate()
+            try:
+                servidor.wait(10)
+            except subprocess.TimeoutExpired:
+                # uvicorn espera a las peticiones en curso; trabadas, no terminan nunca
+                servidor.kill()
+                servidor.wait()
+    if fallos:
+        sys.exit("FALLÓ:\n- " + "\n- ".join(fallos))
+    print("OK: cada pedido aceptado se guardó una vez y el cierre cuadra con lo cobrado")
+
+
+if __name__ == '__main__':
+    main()
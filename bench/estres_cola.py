@@ -0,0 +1,155 @@
+"""Cola de pedidos: matar la app a mitad de un vaciado no pierde ni duplica pedidos.
+
+Cada ronda arranca un proceso que encola pedidos mientras su hilo los
+guarda, con el guardado frenado entre el pedido y sus ítems (disco lento) y
+compactaciones frecuentes, y lo mata con SIGKILL en un momento al azar. La
+ronda siguiente arranca sobre los mismos archivos, así que primero recupera
+lo que dejó la anterior. Al final se vacía la cola y se comprueba que cada
+pedido confirmado por encolar() quedó guardado exactamente una vez, con sus
+ítems, y que los cierres coinciden con los pedidos pagados.
+
+Uso: python -m bench.estres_cola [--rondas 20] [--backend csv|sqlite]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from catalogo import TZ_EC
+
+from bench.estres_concurrencia import _preparar
+
+PEDIDOS_POR_RONDA = 30
+# Pausa entre escribir un pedido y sus ítems: ensancha la ventana del corte
+PAUSA_GUARDADO_S = 0.02
+# La ronda se mata entre 0 y esto después de su primer pedido encolado
+MAX_ESPERA_CORTE_S = 0.6
+
+
+def caja(ronda, directorio, backend):
+    almacen = _preparar(directorio, backend)
+    from catalogo import INDICE_MENU
+    from productos import items_del_carrito
+    agregar_items = almacen.almacen.agregar_items
+
+    def agregar_items_lento(*args):
+        time.sleep(PAUSA_GUARDADO_S)
+        agregar_items(*args)
+    almacen.almacen.agregar_items = agregar_items_lento
+
+    claves = list(INDICE_MENU)
+    with open(f"confirmados_{ronda}.txt", 'a', encoding='utf-8') as confirmados:
+        for n in range(PEDIDOS_POR_RONDA):
+            clave = claves[(ronda * PEDIDOS_POR_RONDA + n) % len(claves)]
+            almacen.encolar_pedido({
+                'Nombre_Orden': f"R{ronda}-{n}",
+                'Fecha': datetime.now(TZ_EC),
+                'Detalle': f"1x {INDICE_MENU[clave].producto}",
+                'Total': INDICE_MENU[clave].precio,
+                'Estado': 'Pagado' if n % 2 else 'En proceso',
+                'Metodo_Pago': 'Efectivo',
+            }, items_del_carrito(None, {clave: 1}))
+            # Sólo cuenta lo que encolar() confirmó; el archivo sobrevive al SIGKILL
+            confirmados.write(f"R{ronda}-{n}\n")
+            confirmados.flush()
+            time.sleep(0.005)
+    time.sleep(60)
+
+
+def _cortados(ruta):
+    # Pedidos con ID reservado y sin marca de guardado: el vaciado quedó a medias
+    reservados, guardados = set(), set()
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                if not linea.endswith('\n'):
+                    break
+                e = json.loads(linea)
+                if e['op'] == 'reservado':
+                    reservados.add(e['token'])
+                elif e['op'] == 'guardado':
+                    guardados.add(e['token'])
+    return len(reservados - guardados)
+
+
+def _confirmados(rondas):
+    nombres = set()
+    for ronda in range(rondas):
+        if os.path.exists(f"confirmados_{ronda}.txt"):
+            with open(f"confirmados_{ronda}.txt", encoding='utf-8') as f:
+                nombres |= {linea.strip() for linea in f if linea.endswith('\n')}
+    return nombres
+
+
+def verificar(almacen, confirmados):
+    from catalogo import METODOS_PAGO
+    from cierre import calcular_cierres
+    errores = []
+    df = almacen.almacen.cargar_pedidos()
+    if df['Nombre_Orden'].duplicated().any():
+        errores.append(f"pedidos duplicados: {sorted(df.loc[df['Nombre_Orden'].duplicated(), 'Nombre_Orden'])[:10]}")
+    if df['ID'].duplicated().any():
+        errores.append("IDs duplicados")
+    perdidos = confirmados - set(df['Nombre_Orden'])
+    if perdidos:
+        errores.append(f"{len(perdidos)} pedidos confirmados perdidos: {sorted(perdidos)[:10]}")
+    items = almacen.almacen.cargar_items()
+    if sorted(items['ID']) != sorted(df['ID']):
+        errores.append("los ítems no corresponden uno a uno con los pedidos")
+    crudo = calcular_cierres(df, almacen.almacen.cargar_gastos(), almacen.almacen.cargar_caja(), METODOS_PAGO)
+    materializado = almacen.resumen_cierres(METODOS_PAGO)
+    if not crudo['Total_Ventas'].round(2).equals(materializado['Total_Ventas'].reindex(crudo.index).round(2)):
+        errores.append("el resumen de cierres no coincide con los pedidos pagados")
+    if almacen.estado_cola().pendientes:
+        errores.append(f"{almacen.estado_cola().pendientes} pedidos siguen en la cola")
+    return errores, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rondas', type=int, default=20)
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], default='csv')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    azar = random.Random(args.semilla)
+
+    contexto = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        cortados = 0
+        for ronda in range(args.rondas):
+            proceso = contexto.Process(target=caja, args=(ronda, directorio, args.backend))
+            proceso.start()
+            while not os.path.exists(f"confirmados_{ronda}.txt") or not os.path.getsize(f"confirmados_{ronda}.txt"):
+                if not proceso.is_alive():
+                    sys.exit(f"La ronda {ronda} terminó con error")
+                time.sleep(0.01)
+            time.sleep(azar.uniform(0, MAX_ESPERA_CORTE_S))
+            proceso.kill()
+            proceso.join()
+            cortados += _cortados('cola_pedidos_mi_escondite.jsonl') > 0
+
+        # Un arranque normal: recupera la cola y la vacía
+        almacen = _preparar(directorio, args.backend)
+        almacen.cola_pedidos.cerrar()
+        while almacen.cola_pedidos.vaciar():
+            pass
+        confirmados = _confirmados(args.rondas)
+        errores, guardados = verificar(almacen, confirmados)
+        print(f"{args.backend}: {args.rondas} rondas matadas con SIGKILL, {cortados} a mitad de un vaciado; "
+              f"{len(confirmados)} pedidos confirmados, {guardados} guardados")
+        os.chdir(os.path.dirname(directorio))
+    if not cortados:
+        errores.append("ninguna ronda se cortó a mitad de un vaciado: la prueba no ejercitó la recuperación")
+    if errores:
+        sys.exit("FALLÓ:\n- " + "\n- ".join(errores))
+    print("OK: ningún pedido confirmado se perdió ni se guardó dos veces")
+
+
+if __name__ == '__main__':
+    main()
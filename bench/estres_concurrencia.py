@@ -0,0 +1,120 @@
+"""Varias terminales guardando pedidos a la vez sobre los mismos archivos.
+
+Lanza procesos que reservan ID, guardan pedidos con sus ítems y marcan como
+pagados algunos de ellos, con un umbral de compactación bajo para que los
+reemplazos del CSV base coincidan con anexos de otros procesos. Al final
+comprueba que no se perdió ni se duplicó ningún pedido y que el resumen
+de cierres coincide con el calculado desde los datos crudos.
+
+Uso: python -m bench.estres_concurrencia [--procesos 6] [--pedidos 40] [--backend csv|sqlite]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from catalogo import TZ_EC
+
+# Fuerza compactaciones frecuentes durante la prueba
+UMBRAL_COMPACTACION = 4 * 1024
+
+
+def _preparar(directorio, backend):
+    os.chdir(directorio)
+    os.environ['ESCONDITE_BACKEND'] = backend
+    os.environ['ESCONDITE_DB'] = os.path.join(directorio, 'estres.db')
+    import almacen
+    almacen.UMBRAL_COMPACTACION = UMBRAL_COMPACTACION
+    return almacen
+
+
+def terminal(numero, pedidos, directorio, backend, barrera):
+    almacen = _preparar(directorio, backend)
+    from catalogo import INDICE_MENU
+    from productos import items_del_carrito
+    claves = list(INDICE_MENU)
+    barrera.wait(timeout=120)
+    guardados = []
+    for n in range(pedidos):
+        clave = claves[(numero * pedidos + n) % len(claves)]
+        nuevo_id = almacen.siguiente_id_pedido()
+        almacen.agregar_pedido({
+            'ID': nuevo_id,
+            'Nombre_Orden': f"T{numero}-{n}",
+            'Fecha': datetime.now(TZ_EC),
+            'Detalle': f"1x {INDICE_MENU[clave].producto}",
+            'Total': INDICE_MENU[clave].precio,
+            'Estado': 'En proceso',
+            'Metodo_Pago': 'Efectivo' if n % 2 else 'Transferencia',
+        }, items_del_carrito(nuevo_id, {clave: 1}))
+        guardados.append(nuevo_id)
+        # Cambiar Estado intercalado con los guardados de otras terminales
+        if n % 3 == 0:
+            almacen.actualizar_pedido(guardados[n // 2], Estado='Pagado')
+
+
+def verificar(almacen, procesos, pedidos):
+    from catalogo import METODOS_PAGO
+    from cierre import calcular_cierres
+    errores = []
+    df = almacen.almacen.cargar_pedidos()
+    esperados = {f"T{t}-{n}" for t in range(procesos) for n in range(pedidos)}
+    if len(df) != len(esperados):
+        errores.append(f"{len(df)} pedidos guardados, se esperaban {len(esperados)}")
+    if df['ID'].duplicated().any():
+        errores.append(f"IDs duplicados: {sorted(df.loc[df['ID'].duplicated(), 'ID'].unique())[:10]}")
+    faltantes = esperados - set(df['Nombre_Orden'])
+    if faltantes:
+        errores.append(f"pedidos perdidos: {sorted(faltantes)[:10]}")
+    items = almacen.almacen.cargar_items()
+    if sorted(items['ID']) != sorted(df['ID']):
+        errores.append("los ítems no corresponden uno a uno con los pedidos")
+    pagados_esperados = procesos * len(range(0, pedidos, 3))
+    if (df['Estado'] == 'Pagado').sum() != pagados_esperados:
+        errores.append(f"{(df['Estado'] == 'Pagado').sum()} pedidos pagados, se esperaban {pagados_esperados}")
+    crudo = calcular_cierres(df, almacen.almacen.cargar_gastos(), almacen.almacen.cargar_caja(), METODOS_PAGO)
+    materializado = almacen.resumen_cierres(METODOS_PAGO)
+    if not crudo['Total_Ventas'].round(2).equals(materializado['Total_Ventas'].reindex(crudo.index).round(2)):
+        errores.append("el resumen de cierres no coincide con los pedidos pagados")
+    return errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--procesos', type=int, default=6)
+    parser.add_argument('--pedidos', type=int, default=40)
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], default='csv')
+    args = parser.parse_args()
+
+    contexto = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directorio:
+        barrera = contexto.Barrier(args.procesos)
+        terminales = [
+            contexto.Process(target=terminal, args=(t, args.pedidos, directorio, args.backend, barrera))
+            for t in range(args.procesos)
+        ]
+        inicio = time.perf_counter()
+        for p in terminales:
+            p.start()
+        for p in terminales:
+            p.join()
+        duracion = time.perf_counter() - inicio
+        if any(p.exitcode for p in terminales):
+            sys.exit("Alguna terminal terminó con error")
+
+        almacen = _preparar(directorio, args.backend)
+        errores = verificar(almacen, args.procesos, args.pedidos)
+        total = args.procesos * args.pedidos
+        print(f"{args.backend}: {args.procesos} terminales x {args.pedidos} pedidos = {total} "
+              f"en {duracion:.2f} s ({total / duracion:.0f} pedidos/s)")
+        os.chdir(os.path.dirname(directorio))
+    if errores:
+        sys.exit("FALLÓ:\n- " + "\n- ".join(errores))
+    print("OK: sin pedidos perdidos ni IDs duplicados")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from catalogo import MENU, ESTADOS, METODOS_PAGO, TZ_EC
+from migracion import MENU_ANTERIOR
+
+PRODUCTOS = [(cat, prod, precio) for cat, items in MENU.items() for prod, precio in items.items()]
+PRODUCTOS_ANTERIORES = [(cat, prod, precio) for cat, items in MENU_ANTERIOR.items() for prod, precio in items.items()]
+
+# Proporciones aproximadas del local: la mayoría de pedidos termina pagada y en efectivo
+PESOS_ESTADOS = [0.05, 0.05, 0.85, 0.05]
+PESOS_METODOS = [0.6, 0.2, 0.1, 0.1]
+
+# Ritmo de un día normal; fija cuántos días abarca generar_datos(n)
+PEDIDOS_POR_DIA = 120
+
+
+class Datos(NamedTuple):
+    pedidos: pd.DataFrame
+    items: pd.DataFrame
+    gastos: pd.DataFrame
+    caja: pd.DataFrame
+
+
+def _fechas(rng, n, dias, inicio):
+    # Pedidos entre las 16:00 y las 23:00, hora de Ecuador
+    dia = rng.integers(0, dias, n)
+    segundos = rng.integers(16 * 3600, 23 * 3600, n)
+    base = pd.Timestamp(inicio, tz=TZ_EC)
+    return (base + pd.to_timedelta(dia, unit='D') + pd.to_timedelta(segundos, unit='s')).sort_values()
+
+
+def _pedidos_e_items(n, dias, inicio, semilla, productos_menu=PRODUCTOS):
+    rng = np.random.default_rng(semilla)
+    lineas = rng.integers(1, 4, n)
+    total_lineas = int(lineas.sum())
+    productos = rng.integers(0, len(productos_menu), total_lineas)
+    cantidades = rng.integers(1, 4, total_lineas)
+    precios = np.array([p[2] for p in productos_menu])
+    pedido = np.repeat(np.arange(n), lineas)
+    totales = np.bincount(pedido, weights=cantidades * precios[productos], minlength=n).round(2)
+    textos = [f"{c}x {productos_menu[p][1]}" for c, p in zip(cantidades, productos)]
+    cortes = np.cumsum(lineas)[:-1]
+    detalles = [" | ".join(partes) for partes in np.split(np.array(textos, dtype=object), cortes)]
+    pedidos = pd.DataFrame({
+        'ID': np.arange(1, n + 1),
+        'Nombre_Orden': [f"Mesa {m}" for m in rng.integers(1, 13, n)],
+        'Fecha': _fechas(rng, n, dias, inicio),
+        'Detalle': detalles,
+        'Total': totales,
+        'Estado': rng.choice(ESTADOS, n, p=PESOS_ESTADOS),
+        'Metodo_Pago': rng.choice(METODOS_PAGO, n, p=PESOS_METODOS),
+    })
+    # Los mismos sorteos dan los ítems: no hace falta parsear Detalle
+    items = pd.DataFrame({
+        'ID': pedido + 1,
+        'Categoria': np.array([p[0] for p in productos_menu], dtype=object)[productos],
+        'Producto': np.array([p[1] for p in productos_menu], dtype=object)[productos],
+        'Cantidad': cantidades,
+        'Precio_Unitario': precios[productos],
+    })
+    return pedidos, items
+
+
+def generar_pedidos(n, dias=365, inicio=date(2025, 1, 1), semilla=0):
+    return _pedidos_e_items(n, dias, inicio, semilla)[0]
+
+
+def generar_legado(n, dias=365, inicio=date(2024, 1, 1), semilla=0, con_id=True):
+    """pedidos_mi_escondite.csv como lo escribía el gestor anterior.
+
+    Precios de MENU_ANTERIOR, Fecha sin zona y sin Metodo_Pago; con
+    ``con_id=False``, además sin ID ni Nombre_Orden (sus primeras versiones).
+    """
+    pedidos = _pedidos_e_items(n, dias, inicio, semilla, PRODUCTOS_ANTERIORES)[0].drop(columns='Metodo_Pago')
+    pedidos['Fecha'] = pedidos['Fecha'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return pedidos if con_id else pedidos.drop(columns=['ID', 'Nombre_Orden'])
+
+
+def generar_gastos(dias=365, por_dia=3, inicio=date(2025, 1, 1), semilla=0):
+    rng = np.random.default_rng(semilla + 1)
+    n = dias * por_dia
+    return pd.DataFrame({
+        'Fecha': _fechas(rng, n, dias, inicio),
+        'Descripción': rng.choice(["Pan", "Carne", "Gas", "Verduras", "Bebidas", "Hielo"], n),
+        'Monto': rng.uniform(1, 40, n).round(2),
+    })
+
+
+def generar_caja(dias=365, inicio=date(2025, 1, 1), semilla=0):
+    rng = np.random.default_rng(semilla + 2)
+    fechas = [pd.Timestamp(inicio + timedelta(days=d), tz=TZ_EC) + pd.Timedelta(hours=15) for d in range(dias)]
+    return pd.DataFrame({'Fecha': fechas, 'Inicial': rng.choice([20.0, 30.0, 50.0], dias)})
+
+
+def generar_datos(n, dias=None, inicio=None, semilla=0):
+    """Un local completo con ``n`` pedidos y sus ítems, gastos y aperturas de caja.
+
+    Sin ``dias`` se reparten a unos PEDIDOS_POR_DIA por día; sin ``inicio``
+    el último día es hoy, así las pantallas que abren en la fecha actual
+    tienen datos.
+    """
+    dias = dias or max(1, -(-n // PEDIDOS_POR_DIA))
+    inicio = inicio or date.today() - timedelta(days=dias - 1)
+    pedidos, items = _pedidos_e_items(n, dias, inicio, semilla)
+    return Datos(pedidos, items, generar_gastos(dias, inicio=inicio, semilla=semilla),
+                 generar_caja(dias, inicio=inicio, semilla=semilla))
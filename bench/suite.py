@@ -0,0 +1,267 @@
+"""Suite de rendimiento: operaciones principales frente al tamaño del historial.
+
+Para cada tamaño genera un local sintético (pedidos del MENU con sus ítems,
+gastos y aperturas de caja), lo guarda en un directorio temporal y mide sin
+navegador las operaciones de todos los días: cargar, guardar un pedido,
+encolarlo, cambiar su estado, sondear la cola de cocina, el cierre del día,
+buscar, exportar y el render de las pantallas con streamlit.testing (AppTest).
+
+Los tiempos se comparan con bench/linea_base.json y se marcan las
+regresiones; --guardar reemplaza la línea base con la corrida actual. La
+línea base depende de la máquina: conviene regenerarla al cambiar de equipo.
+
+Uso: python -m bench.suite [--tamanos 1000 10000 100000] [--backend csv sqlite] [--guardar]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from catalogo import TZ_EC
+
+from bench.tiempos import mejor_de
+
+TAMANOS = [1_000, 10_000, 100_000]
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linea_base.json')
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# Lecturas: mejor de N; escrituras: mediana de N (cada una cambia los datos)
+REPETICIONES_LECTURA = 5
+REPETICIONES_ESCRITURA = 15
+# Más lento que la línea base en esta proporción y en al menos MIN_DIFERENCIA_MS = regresión
+TOLERANCIA = 0.5
+MIN_DIFERENCIA_MS = 10.0
+# Carga fija que mide qué tan rápida está la máquina en esta corrida; se
+# repite antes y después de medir y se usa la mediana
+FILAS_CALIBRACION = 1_000_000
+REPETICIONES_CALIBRACION = 10
+
+PANTALLAS = ["Registrar Pedido", "Ver Pedidos", "Cocina", "Cierre de Caja", "Cambiar Estado", "Estadísticas"]
+
+
+def _mediana(tiempos):
+    return statistics.median(tiempos)
+
+
+def _calibrar():
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'clave': rng.integers(0, 1000, FILAS_CALIBRACION), 'valor': rng.random(FILAS_CALIBRACION)})
+    muestras = []
+    for _ in range(REPETICIONES_CALIBRACION):
+        inicio = time.perf_counter()
+        df.groupby('clave')['valor'].sum().sort_values()
+        muestras.append(time.perf_counter() - inicio)
+    return muestras
+
+
+def _preparar(directorio, backend, datos):
+    # almacen se importa después del chdir: sus rutas y su backend son del directorio temporal
+    os.chdir(directorio)
+    os.environ['ESCONDITE_BACKEND'] = backend
+    os.environ['ESCONDITE_DB'] = os.path.join(directorio, 'suite.db')
+    datos.pedidos.to_csv('pedidos_mi_escondite.csv', index=False)
+    datos.items.to_csv('items_mi_escondite.csv', index=False)
+    datos.gastos.to_csv('gastos_mi_escondite.csv', index=False)
+    datos.caja.to_csv('caja_mi_escondite.csv', index=False)
+    import almacen
+    if backend == 'sqlite':
+        almacen.migrar_csv_a_sqlite()
+    almacen.cache.invalidar('pedidos', 'items', 'gastos', 'caja', 'cierres')
+    return almacen
+
+
+def _medir_pantallas(tiempos, invalidar):
+    # Cada pantalla con la caché vacía, como la primera visita después de un guardado
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP, default_timeout=600)
+    tiempos['app_inicio'] = mejor_de(REPETICIONES_LECTURA, at.run, antes=invalidar)
+    for pantalla in PANTALLAS:
+        at.sidebar.selectbox[0].select(pantalla)
+        tiempos[f"app_{pantalla}"] = mejor_de(REPETICIONES_LECTURA, at.run, antes=invalidar)
+        if at.exception:
+            raise RuntimeError(f"{pantalla}: {at.exception[0].value}")
+
+
+def _pedido_suite(n):
+    # Pedido sin ID y su carrito, distintos para cada n
+    from catalogo import INDICE_MENU
+    claves = list(INDICE_MENU)
+    carrito = {claves[n % len(claves)]: 1 + n % 3, claves[(7 * n) % len(claves)]: 1}
+    return {
+        'Nombre_Orden': f"Suite {n}",
+        'Fecha': datetime.now(TZ_EC),
+        'Detalle': " | ".join(f"{c}x {INDICE_MENU[k].producto}" for k, c in carrito.items()),
+        'Total': sum(INDICE_MENU[k].precio * c for k, c in carrito.items()),
+        'Estado': 'En proceso',
+        'Metodo_Pago': 'Efectivo',
+    }, carrito
+
+
+def _nuevo_pedido(almacen, n):
+    from productos import items_del_carrito
+    pedido, carrito = _pedido_suite(n)
+    pedido_id = almacen.siguiente_id_pedido()
+    almacen.agregar_pedido({'ID': pedido_id, **pedido}, items_del_carrito(pedido_id, carrito))
+
+
+def _encolar_pedido(almacen, n):
+    # Lo que hace la caja: anotar el pedido en la cola; el hilo lo guarda después
+    from productos import items_del_carrito
+    pedido, carrito = _pedido_suite(n)
+    return almacen.encolar_pedido(pedido, items_del_carrito(None, carrito))
+
+
+def medir(n, backend):
+    """Corre la suite para un tamaño en un proceso aparte; devuelve {operación: segundos}."""
+    import numpy as np
+    from bench.sintetico import generar_datos
+    from catalogo import METODOS_PAGO
+    from cierre import cierre_del_dia, reporte_cierre
+
+    datos = generar_datos(n)
+    dia = datos.pedidos['Fecha'].iloc[-1].date()
+    calibracion = _calibrar()
+    tiempos = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = _preparar(directorio, backend, datos)
+        tablas = ('pedidos', 'items', 'gastos', 'caja', 'cierres')
+        invalidar = lambda: almacen.cache.invalidar(*tablas)
+
+        _medir_pantallas(tiempos, invalidar)
+        tiempos['cargar_pedidos'] = mejor_de(REPETICIONES_LECTURA, almacen.almacen.cargar_pedidos)
+
+        def cierre():
+            almacen.historial('pedidos', dia, dia)
+            almacen.historial('gastos', dia, dia)
+            resumen = almacen.resumen_cierres(METODOS_PAGO, dia, dia)
+            reporte_cierre(cierre_del_dia(resumen, dia), METODOS_PAGO).to_csv(index=False)
+        tiempos['cierre_dia'] = mejor_de(REPETICIONES_LECTURA, cierre, antes=invalidar)
+
+        tiempos['indice_busqueda'] = mejor_de(REPETICIONES_LECTURA, almacen.indice_pedidos, antes=invalidar)
+        indice = almacen.indice_pedidos()
+        tiempos['buscar'] = mejor_de(REPETICIONES_LECTURA, lambda: indice.buscar('mesa 1', dia))
+        tiempos['exportar_csv'] = mejor_de(REPETICIONES_LECTURA, lambda: almacen.exportar_bytes('pedidos', 'csv'))
+
+        guardados = []
+        for k in range(REPETICIONES_ESCRITURA):
+            inicio = time.perf_counter()
+            _nuevo_pedido(almacen, k)
+            guardados.append(time.perf_counter() - inicio)
+        tiempos['guardar_pedido'] = _mediana(guardados)
+
+        encolados = []
+        for k in range(REPETICIONES_ESCRITURA):
+            inicio = time.perf_counter()
+            token = _encolar_pedido(almacen, k)
+            encolados.append(time.perf_counter() - inicio)
+            almacen.esperar_pedido(token, 60)
+        tiempos['encolar_pedido'] = _mediana(encolados)
+
+        # Cambiar Estado sobre pedidos del historial, como en la pantalla
+        rng = np.random.default_rng(0)
+        cambios = []
+        for pedido_id in rng.choice(datos.pedidos['ID'].to_numpy(), REPETICIONES_ESCRITURA, replace=False):
+            inicio = time.perf_counter()
+            almacen.actualizar_pedido(int(pedido_id), Estado='Pagado')
+            cambios.append(time.perf_counter() - inicio)
+        tiempos['cambiar_estado'] = _mediana(cambios)
+
+        # Cocina: un sondeo después de cada pedido nuevo
+        almacen.pedidos_cocina()
+        sondeos = []
+        for k in range(REPETICIONES_ESCRITURA):
+            _nuevo_pedido(almacen, REPETICIONES_ESCRITURA + k)
+            inicio = time.perf_counter()
+            almacen.pedidos_cocina()
+            sondeos.append(time.perf_counter() - inicio)
+        tiempos['sondeo_cocina'] = _mediana(sondeos)
+        os.chdir(os.path.dirname(directorio))
+    tiempos['calibracion'] = _mediana(calibracion + _calibrar())
+    return tiempos
+
+
+def _cargar_linea_base():
+    if not os.path.exists(LINEA_BASE):
+        return {}
+    with open(LINEA_BASE, encoding='utf-8') as f:
+        return json.load(f).get('resultados', {})
+
+
+def _guardar_linea_base(resultados):
+    with open(LINEA_BASE, 'w', encoding='utf-8') as f:
+        json.dump({
+            'maquina': f"{platform.machine()} {platform.system()} / Python {platform.python_version()}",
+            'fecha': datetime.now().date().isoformat(),
+            'resultados': resultados,
+        }, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write('\n')
+
+
+def comparar(actual, base, tolerancia=TOLERANCIA):
+    """Imprime la tabla de tiempos; devuelve las operaciones que empeoraron.
+
+    La línea base se escala por la calibración de ambas corridas, así una
+    máquina más cargada o más lenta no aparece como regresión en todo.
+    """
+    factor = actual['calibracion'] / base['calibracion'] if 'calibracion' in base else 1.0
+    regresiones = []
+    print(f"{'operación':<26} {'ms':>10} {'base ms':>10} {'x base':>7}   (máquina x{factor:.2f})")
+    for operacion, segundos in actual.items():
+        if operacion == 'calibracion':
+            continue
+        ms = segundos * 1000
+        anterior = base.get(operacion)
+        if anterior is None:
+            print(f"{operacion:<26} {ms:>10.1f} {'-':>10} {'-':>7}")
+            continue
+        esperado_ms = anterior * factor * 1000
+        razon = ms / esperado_ms if esperado_ms else float('inf')
+        marca = ''
+        if razon > 1 + tolerancia and ms - esperado_ms > MIN_DIFERENCIA_MS:
+            regresiones.append(operacion)
+            marca = '  REGRESIÓN'
+        print(f"{operacion:<26} {ms:>10.1f} {esperado_ms:>10.1f} {razon:>7.2f}{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS)
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], nargs='+', default=['csv'])
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--guardar', action='store_true', help="guardar esta corrida como línea base")
+    args = parser.parse_args()
+
+    base = _cargar_linea_base()
+    resultados = {}
+    regresiones = []
+    # Un proceso nuevo por corrida: almacen, su caché y streamlit empiezan de cero
+    contexto = multiprocessing.get_context('spawn')
+    for backend in args.backend:
+        for n in args.tamanos:
+            clave = f"{backend}/{n}"
+            print(f"\n== {backend}, {n} pedidos ==")
+            with contexto.Pool(1) as pool:
+                actual = pool.apply(medir, (n, backend))
+            resultados[clave] = actual
+            regresiones += [f"{clave} {o}" for o in comparar(actual, base.get(clave, {}), args.tolerancia)]
+
+    if args.guardar:
+        _guardar_linea_base({**base, **resultados})
+        print(f"\nLínea base actualizada en {LINEA_BASE}")
+    elif regresiones:
+        sys.exit("\nREGRESIONES:\n- " + "\n- ".join(regresiones))
+    else:
+        print("\nOK: sin regresiones frente a la línea base")
+
+
+if __name__ == '__main__':
+    main()
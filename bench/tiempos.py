@@ -0,0 +1,17 @@
+import time
+
+
+def mejor_de(repeticiones, funcion, antes=None):
+    """Menor tiempo (s) de ``repeticiones`` llamadas a ``funcion``.
+
+    ``antes``, si se da, corre antes de cada llamada sin contar en el tiempo
+    (vaciar una caché, guardar un pedido nuevo).
+    """
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
@@ -0,0 +1,90 @@
+import unicodedata
+from collections import defaultdict
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from esquema import dias_de
+from perfil import medido
+
+# Pedidos que todavía se pueden mover de estado en el día
+ESTADOS_ABIERTOS = ("En proceso", "Entregado")
+
+RESULTADOS_POR_PAGINA = 20
+
+# Largo máximo de los n-gramas indexados; búsquedas más largas se
+# resuelven intersecando sus trigramas y verificando los candidatos
+TAMANO_NGRAMA = 3
+
+
+def normalizar(texto):
+    # Sin mayúsculas ni tildes: "Mesa Ñandú" y "mesa nandu" coinciden
+    texto = unicodedata.normalize('NFKD', str(texto).casefold())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+class Resultados(NamedTuple):
+    pedidos: pd.DataFrame
+    total: int
+    paginas: int
+
+
+class IndicePedidos:
+    """Índice de búsqueda de pedidos por nombre, ID y día.
+
+    Se construye una vez por versión de la tabla (O(n)); después cada
+    búsqueda cuesta en proporción a los pedidos que coinciden, no al
+    historial completo.
+    """
+
+    @medido('índice de búsqueda')
+    def __init__(self, pedidos):
+        self.pedidos = pedidos.reset_index(drop=True)
+        self._ids = self.pedidos['ID'].to_numpy(dtype='int64')
+        self._por_id = dict(zip(self._ids.tolist(), range(len(self._ids))))
+        # Los nombres se repiten mucho ("Mesa 3"): se indexa cada nombre distinto una vez
+        crudos = self.pedidos['Nombre_Orden'].fillna('').astype(str)
+        normalizados = crudos.map({n: normalizar(n) for n in crudos.unique()})
+        self._por_nombre = normalizados.groupby(normalizados).indices
+        self._ngramas = defaultdict(set)
+        for nombre in self._por_nombre:
+            for n in range(1, TAMANO_NGRAMA + 1):
+                for i in range(len(nombre) - n + 1):
+                    self._ngramas[nombre[i:i + n]].add(nombre)
+        self._por_dia = self.pedidos.groupby(dias_de(self.pedidos)).indices
+        self._estados = self.pedidos['Estado'].to_numpy()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def pedido(self, pedido_id):
+        pos = self._por_id.get(int(pedido_id))
+        return None if pos is None else self.pedidos.iloc[pos].to_dict()
+
+    def _nombres(self, texto):
+        if len(texto) <= TAMANO_NGRAMA:
+            return self._ngramas.get(texto, set())
+        trigramas = sorted((self._ngramas.get(texto[i:i + TAMANO_NGRAMA], set())
+                            for i in range(len(texto) - TAMANO_NGRAMA + 1)), key=len)
+        return {nombre for nombre in set.intersection(*trigramas) if texto in nombre}
+
+    def _coincidencias(self, busqueda, dia, estados):
+        texto = normalizar(busqueda).strip()
+        if not texto:
+            # Sin búsqueda: los pedidos abiertos del día
+            posiciones = self._por_dia.get(pd.Timestamp(dia), np.empty(0, dtype='int64'))
+            return posiciones[np.isin(self._estados[posiciones], estados)]
+        partes = [self._por_nombre[nombre] for nombre in self._nombres(texto)]
+        numero = texto.lstrip('#')
+        if numero.isdigit() and int(numero) in self._por_id:
+            partes.append(np.array([self._por_id[int(numero)]]))
+        return np.unique(np.concatenate(partes)) if partes else np.empty(0, dtype='int64')
+
+    def buscar(self, busqueda, dia, pagina=1, por_pagina=RESULTADOS_POR_PAGINA, estados=ESTADOS_ABIERTOS):
+        # Más recientes primero; sólo se materializa la página pedida
+        posiciones = self._coincidencias(busqueda, dia, list(estados))
+        posiciones = posiciones[np.argsort(-self._ids[posiciones], kind='stable')]
+        paginas = max(1, -(-len(posiciones) // por_pagina))
+        inicio = (min(max(pagina, 1), paginas) - 1) * por_pagina
+        return Resultados(self.pedidos.iloc[posiciones[inicio:inicio + por_pagina]], len(posiciones), paginas)
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+from bisect import bisect_right
+from datetime import datetime
+from types import MappingProxyType
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+TZ_EC = ZoneInfo("America/Guayaquil")
+
+# Versiones del menú con su fecha de vigencia (ver Catalogo); sin este archivo rige MENU
+DATA_FILE_MENU = os.environ.get('ESCONDITE_MENU', 'menu_mi_escondite.json')
+
+# Menú incluido en el código: la única versión mientras no exista DATA_FILE_MENU
+MENU = {
+    "Hamburguesas": {
+        "Italiana": 2.50, "Francesa": 3.25, "Española": 3.25, "Americana": 3.25, "4 Estaciones": 3.25,
+        "Mexicana": 3.25, "Especial": 3.25, "Suprema": 3.75, "Papi Burguer": 2.75, "A su gusto (Jumbo)": 5.50,
+        "Triple Burguer": 6.00, "Doble Burguer": 4.50
+    },
+    "Hot Dogs": {
+        "Especial Mixto": 2.25, "Especial de Pollo": 2.25, "Hot Dog con salame": 2.25,
+        "Mix Dog - Jumbo": 2.25, "Champi Dog": 2.25, "Hot Dog con cebolla": 1.75
+    },
+    "Papas Fritas": {
+        "Salchipapa": 2.00, "Papi carne": 2.50, "Papi Pollo": 2.50,
+        "Salchipapa especial": 3.75, "Papa Mix": 3.75, "Papa Wlady": 5.00
+    },
+    "Sanduches": {
+        "Cubano": 2.25, "Vegetariano": 2.25, "Sanduche de Pollo": 2.25
+    },
+    "Bebidas": {
+        "Colas Coca Pequeña": 0.75, "Cola Sabores Pequeña": 0.50, "Cola Inka Grande": 1.00,
+        "Fuze Tea mediano": 1.00, "Fuze Tea Pequeño": 0.50, "Fuze Tea Grande": 1.50, "Coca Flaca": 1.75, "Coca Litro": 1.50,
+        "Cola Sabores Flaca": 1.50, "Jugos": 1.50, "Batidos": 1.75, "Botella de Agua": 0.75, "Jamaica": 0.75
+    },
+    "Porciones": {
+        "Papas Fritas (0.50)": 0.50, "Papas Fritas (1.00)": 1.00, "Huevo Frito": 0.75,
+        "Presa de Pollo": 1.50, "Pollo desmenuzado": 0.75, "Salame": 0.75, "Queso": 0.75, "Carne": 0.75, "Tocino": 0.75
+    }
+}
+
+ESTADOS = ["En proceso", "Entregado", "Pagado", "Cancelado"]
+METODOS_PAGO = ["Efectivo", "Transferencia De Una", "Transferencia Jardín Azuayo", "Transferencia JEP"]
+
+
+class ItemMenu(NamedTuple):
+    categoria: str
+    producto: str
+    precio: float
+
+
+def clave_carrito(categoria, producto):
+    return f"{categoria} - {producto}"
+
+
+def construir_indice(menu):
+    # Índice inmutable clave del carrito -> (categoría, producto, precio)
+    return MappingProxyType({
+        clave_carrito(categoria, producto): ItemMenu(categoria, producto, precio)
+        for categoria, items in menu.items()
+        for producto, precio in items.items()
+    })
+
+
+INDICE_MENU = construir_indice(MENU)
+
+
+def total_carrito(carrito, indice=INDICE_MENU):
+    return round(sum(indice[key].precio * cantidad for key, cantidad in carrito.items()), 2)
+
+
+class VersionMenu(NamedTuple):
+    # Desde cuándo rige (con zona); la versión sigue vigente hasta la siguiente
+    desde: datetime
+    menu: dict
+    indice: MappingProxyType
+
+
+def version_menu(desde, menu):
+    return VersionMenu(desde, menu, construir_indice(menu))
+
+
+class Catalogo:
+    """Versiones del menú ordenadas por fecha de vigencia.
+
+    Cada versión es el menú completo (categorías, productos y precios) con su
+    índice ya construido. La primera rige también para todo lo anterior a su
+    fecha, así un pedido viejo siempre encuentra precio.
+    """
+
+    def __init__(self, versiones):
+        if not versiones:
+            raise ValueError("el catálogo no tiene versiones")
+        self.versiones = sorted(versiones, key=lambda v: v.desde)
+        self._desde = [v.desde for v in self.versiones]
+
+    def vigente(self, momento=None):
+        momento = momento or datetime.now(TZ_EC)
+        return self.versiones[max(0, bisect_right(self._desde, momento) - 1)]
+
+    def con_precio(self, desde, categoria, producto, precio):
+        """Catálogo con ``producto`` a ``precio`` desde ``desde`` (agregándolo si no existía).
+
+        Si ya hay una versión que empieza en ``desde`` se corrige esa; si no, se
+        crea una copiando la vigente en ese momento. Las versiones posteriores
+        no cambian.
+        """
+        base = self.vigente(desde)
+        menu = {c: dict(items) for c, items in base.menu.items()}
+        menu.setdefault(categoria, {})[producto] = float(precio)
+        otras = [v for v in self.versiones if v.desde != desde]
+        return Catalogo([*otras, version_menu(desde, menu)])
+
+
+# Fecha de la versión incluida en el código; como es la primera, rige para todo
+DESDE_BASE = datetime(2000, 1, 1, tzinfo=TZ_EC)
+
+CATALOGO_BASE = Catalogo([version_menu(DESDE_BASE, MENU)])
+
+
+def _desde(texto):
+    # '2025-03-01' o '2025-03-01T15:00'; sin zona se toma la hora del local
+    valor = datetime.fromisoformat(texto)
+    return valor if valor.tzinfo else valor.replace(tzinfo=TZ_EC)
+
+
+def _menu_valido(menu):
+    if not isinstance(menu, dict) or not menu:
+        raise ValueError("cada versión necesita un menú con categorías")
+    for categoria, items in menu.items():
+        for producto, precio in items.items():
+            if isinstance(precio, bool) or not isinstance(precio, (int, float)) or precio < 0:
+                raise ValueError(f"precio inválido para {categoria} - {producto}: {precio!r}")
+    return {c: {p: float(precio) for p, precio in items.items()} for c, items in menu.items()}
+
+
+def leer_catalogo(ruta):
+    """Catálogo desde un JSON ``{"versiones": [{"desde": "2025-03-01", "menu": {...}}, ...]}``."""
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    return Catalogo([version_menu(_desde(v['desde']), _menu_valido(v['menu'])) for v in datos['versiones']])
+
+
+def guardar_catalogo(ruta, catalogo):
+    # Se escribe aparte y se reemplaza: quien lo relea nunca ve un archivo a medias
+    datos = {'versiones': [{'desde': v.desde.isoformat(), 'menu': v.menu} for v in catalogo.versiones]}
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+class ArchivoCatalogo:
+    """El catálogo de un archivo, releído cuando cambia (mtime/tamaño) sin reiniciar la app.
+
+    Sin archivo rige CATALOGO_BASE. Si el archivo no se puede leer (a medio
+    editar, JSON inválido) se sigue con el último catálogo bueno y el motivo
+    queda en ``error``.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.error = None
+        self._firma = ()
+        self._catalogo = CATALOGO_BASE
+        self._lock = threading.Lock()
+
+    def _firma_actual(self):
+        try:
+            info = os.stat(self.ruta)
+        except FileNotFoundError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    def actual(self):
+        firma = self._firma_actual()
+        if firma == self._firma:
+            return self._catalogo
+        with self._lock:
+            if firma != self._firma:
+                try:
+                    self._catalogo = CATALOGO_BASE if firma is None else leer_catalogo(self.ruta)
+                    self.error = None
+                except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+                    self.error = f"{type(error).__name__}: {error}"
+                self._firma = firma
+            return self._catalogo
+
+
+archivo_menu = ArchivoCatalogo(DATA_FILE_MENU)
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+import pandas as pd
+
+from esquema import dias_de
+
+METODO_EFECTIVO = 'Efectivo'
+
+PERIODOS = ["Día", "Semana", "Mes", "Personalizado"]
+
+
+def calcular_cierres(pedidos, gastos, caja, metodos=None, desde=None, hasta=None):
+    """Cierre de cada día del rango a partir de los datos crudos.
+
+    Las ventas salen de un único groupby sobre (día, Metodo_Pago) de los
+    pedidos pagados, así que agregar un método de pago no suma otra pasada.
+    """
+    pagados = pedidos[pedidos['Estado'] == 'Pagado']
+    ventas = pagados.assign(Dia=dias_de(pagados)).pivot_table(
+        index='Dia', columns='Metodo_Pago', values='Total', aggfunc='sum', fill_value=0.0, observed=True)
+    df = pd.DataFrame({
+        'Inicial': caja.groupby(dias_de(caja))['Inicial'].first(),
+        'Gastos': gastos.groupby(dias_de(gastos))['Monto'].sum(),
+    }).join(ventas, how='outer')
+    if metodos is None:
+        metodos = list(ventas.columns)
+    df = df.reindex(columns=['Inicial', *metodos, 'Gastos'], fill_value=0.0).fillna(0.0)
+    # Se agrupa por Dia (entero); sólo el índice ya reducido pasa a date
+    df = df.sort_index()
+    df.index = pd.Index(pd.to_datetime(df.index).date, name='Dia')
+    if desde is not None:
+        df = df[df.index >= desde]
+    if hasta is not None:
+        df = df[df.index <= hasta]
+    return completar_cierres(df, metodos)
+
+
+def completar_cierres(df, metodos):
+    # Columnas derivadas comunes al cálculo crudo y a la tabla materializada
+    df = df.astype(float).round(2)
+    df['Total_Ventas'] = df[list(metodos)].sum(axis=1)
+    df['Ganancia_Neta'] = df['Total_Ventas'] - df['Gastos']
+    df['Caja_Final'] = df['Inicial'] + df.get(METODO_EFECTIVO, 0.0) - df['Gastos']
+    return df
+
+
+def cierre_del_dia(cierres, fecha):
+    return cierres.reindex([fecha], fill_value=0.0).iloc[0]
+
+
+def totales_rango(cierres, metodos):
+    # Inicial y caja final son posiciones diarias de caja: no se suman entre días
+    return cierres[[*metodos, 'Total_Ventas', 'Gastos', 'Ganancia_Neta']].sum()
+
+
+def totales_sucursales(consolidado, metodos):
+    # Una fila por sucursal con sus totales_rango; consolidado viene indexado por (Sucursal, Dia)
+    return consolidado.groupby(level='Sucursal', sort=False)[[*metodos, 'Total_Ventas', 'Gastos', 'Ganancia_Neta']].sum()
+
+
+def etiqueta_metodo(metodo):
+    return 'Ventas Efectivo' if metodo == METODO_EFECTIVO else metodo
+
+
+def reporte_cierre(cierre, metodos, etiqueta_caja='Caja Final'):
+    conceptos = ['Inicial', *[etiqueta_metodo(m) for m in metodos], 'Gastos', 'Ganancia Neta', etiqueta_caja]
+    montos = [cierre['Inicial'], *[cierre[m] for m in metodos], cierre['Gastos'], cierre['Ganancia_Neta'], cierre['Caja_Final']]
+    return pd.DataFrame({'Concepto': conceptos, 'Monto': montos})
+
+
+def rango_periodo(periodo, fecha):
+    if periodo == "Semana":
+        desde = fecha - timedelta(days=fecha.weekday())
+        return desde, desde + timedelta(days=6)
+    if periodo == "Mes":
+        desde = fecha.replace(day=1)
+        siguiente = (desde + timedelta(days=32)).replace(day=1)
+        return desde, siguiente - timedelta(days=1)
+    return fecha, fecha
@@ -0,0 +1,101 @@
+import threading
+from typing import NamedTuple
+
+from esquema import fecha
+
+# Pedidos que se muestran en la pantalla de cocina
+ESTADO_COCINA = "En proceso"
+
+
+class Novedades(NamedTuple):
+    # (ID, columnas) en orden de escritura: filas completas o sólo lo que cambió
+    cambios: list
+    cursor: object
+
+
+class ColaCocina:
+    """Pedidos "En proceso" en orden de llegada, actualizados por novedades.
+
+    ``fuente`` es el backend de almacen. Cada sondeo compara primero la
+    firma de la tabla de pedidos (un stat): si no cambió no se lee nada; si
+    cambió se leen sólo las novedades desde el último cursor (la cola del
+    diario en CSV, el registro de cambios en SQLite). La cola completa sólo
+    se vuelve a cargar al arrancar o cuando el backend ya no puede dar las
+    novedades (CSV compactado, registro podado). Una instancia por proceso
+    se comparte entre todas las pantallas.
+    """
+
+    def __init__(self, fuente):
+        self.fuente = fuente
+        self.version = 0
+        self._pendientes = {}
+        self._vista = ()
+        self._cursor = None
+        self._firma = None
+        self._lock = threading.Lock()
+        self.recargas = 0
+
+    def _recargar(self):
+        # El cursor se toma antes de leer: lo que llegue mientras tanto se
+        # vuelve a aplicar en el siguiente sondeo, y aplicarlo dos veces no cambia nada
+        self._cursor = self.fuente.cursor_pedidos()
+        df = self.fuente.cargar_pedidos_estado(ESTADO_COCINA).drop(columns='Dia').sort_values('ID')
+        self._pendientes = {int(p['ID']): p for p in df.to_dict('records')}
+        self.recargas += 1
+
+    def _aplicar(self, novedades):
+        # Cuántos pedidos entraron o salieron de la cola; None si hace falta
+        # recargar (un pedido que vuelve a cocina con sólo las columnas cambiadas)
+        cambios = 0
+        desordenado = False
+        for pedido_id, valores in novedades:
+            actual = self._pendientes.get(pedido_id)
+            if actual is not None:
+                actual = {**actual, **valores}
+            elif 'Nombre_Orden' in valores:
+                actual = dict(valores)
+            elif valores.get('Estado') == ESTADO_COCINA:
+                return None
+            else:
+                continue
+            if actual['Estado'] == ESTADO_COCINA:
+                if 'Fecha' in valores:
+                    actual['Fecha'] = fecha(actual['Fecha'])
+                # Los IDs crecen con el tiempo: sólo un pedido que vuelve a cocina cae en medio
+                if pedido_id not in self._pendientes and self._pendientes and pedido_id < next(reversed(self._pendientes)):
+                    desordenado = True
+                self._pendientes[pedido_id] = actual
+                cambios += 1
+            elif self._pendientes.pop(pedido_id, None) is not None:
+                cambios += 1
+        if desordenado:
+            self._pendientes = dict(sorted(self._pendientes.items()))
+        return cambios
+
+    def sincronizar(self):
+        firma = self.fuente.firma('pedidos')
+        if firma == self._firma:
+            return
+        # Primero el bloqueo del almacén y después el propio: el mismo orden que
+        # quien sincroniza dentro de una escritura (entregar_pedido, cambiar_estado)
+        with self.fuente.escritura().compartido(), self._lock:
+            if firma == self._firma:
+                return
+            novedades = None if self._cursor is None else self.fuente.novedades_pedidos(self._cursor)
+            cambios = None if novedades is None else self._aplicar(novedades.cambios)
+            if cambios is None:
+                self._recargar()
+            else:
+                self._cursor = novedades.cursor
+            self._firma = firma
+            if cambios != 0:
+                self._vista = tuple(self._pendientes.values())
+                self.version += 1
+
+    def pendientes(self):
+        """Pedidos en cocina, del más antiguo al más nuevo (no modificar)."""
+        self.sincronizar()
+        return self._vista
+
+    def pedido(self, pedido_id):
+        return self._pendientes.get(int(pedido_id))
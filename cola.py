@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from esquema import fecha
+
+# Espera entre reintentos cuando guardar falla; se duplica hasta MAX_REINTENTO_S
+REINTENTO_S = 1.0
+MAX_REINTENTO_S = 30.0
+# Pedidos por vaciado: todos bajo una sola toma del bloqueo del almacén
+MAX_LOTE = 50
+# IDs asignados que se recuerdan para esperar()
+MAX_RECORDADOS = 1000
+# Cada cuánto esperar() mira en el archivo si otro proceso guardó el pedido
+REVISAR_S = 0.25
+# Al cerrar el proceso se espera a lo sumo esto a que la cola se vacíe
+ESPERA_CIERRE_S = 5.0
+
+
+class EstadoCola(NamedTuple):
+    pendientes: int
+    # Texto del último fallo al guardar; None si el último vaciado funcionó
+    error: object
+    # Guardados por este proceso desde que arrancó
+    guardados: int
+
+
+class ColaPedidos:
+    """Cola durable de pedidos por guardar, vaciada por un hilo en segundo plano.
+
+    ``encolar`` sólo anexa una línea JSON (con fsync) a ``ruta`` y vuelve;
+    el hilo toma los pedidos en orden, les reserva ID en ``destino`` (el
+    backend de almacen) y los guarda con ``guardar``. Antes de escribir en
+    el almacén se anota en la cola el ID reservado y después que quedó
+    guardado: si el proceso muere entre medias, al arrancar se completa
+    sólo lo que falte de ese pedido (pedido, ítems) y ``reparar`` recalcula
+    lo derivado, así cada pedido queda guardado exactamente una vez.
+    Cuando todo quedó guardado el archivo se reinicia conservando sólo los
+    últimos MAX_RECORDADOS IDs asignados, para que ``esperar`` encuentre los
+    pedidos que guardó el hilo de otro proceso que comparte la cola.
+
+    ``crear_bloqueo(ruta)`` da un bloqueo entre procesos: uno protege el
+    archivo de la cola y otro hace que sólo un proceso la vacíe a la vez.
+    """
+
+    def __init__(self, ruta, destino, guardar, reparar, crear_bloqueo):
+        self.ruta = ruta
+        self.destino = destino
+        self.guardar = guardar
+        self.reparar = reparar
+        self.bloqueo = crear_bloqueo(ruta + '.lock')
+        self._vaciado = crear_bloqueo(ruta + '.vaciado.lock')
+        self._hay_trabajo = threading.Event()
+        self._asignados = threading.Condition()
+        self._ids = {}
+        self._hilo = None
+        self._detener = False
+        self._error = None
+        self.guardados = 0
+        if self.estado().pendientes:
+            self._despertar()
+
+    def _leer(self):
+        # Entradas por token, en orden de llegada; una línea cortada por un fallo se descarta
+        pedidos, reservados, guardados = {}, {}, set()
+        if not os.path.exists(self.ruta):
+            return pedidos, reservados, guardados
+        with open(self.ruta, encoding='utf-8') as f:
+            for linea in f:
+                if not linea.endswith('\n'):
+                    break
+                try:
+                    e = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                if e['op'] == 'pedido':
+                    pedidos[e['token']] = e
+                elif e['op'] == 'reservado':
+                    reservados[e['token']] = e['ID']
+                elif e['op'] == 'asignado':
+                    reservados[e['token']] = e['ID']
+                    guardados.add(e['token'])
+                else:
+                    guardados.add(e['token'])
+        return pedidos, reservados, guardados
+
+    def _anexar(self, eventos):
+        texto = ''.join(json.dumps(e, ensure_ascii=False, default=str) + '\n' for e in eventos)
+        with self.bloqueo:
+            with open(self.ruta, 'a+b') as f:
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        texto = '\n' + texto
+                f.write(texto.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def encolar(self, pedido, items=()):
+        """Anota el pedido (sin ID) y sus ítems; devuelve el token para esperar()."""
+        token = uuid.uuid4().hex
+        self._anexar([{'op': 'pedido', 'token': token, 'pedido': pedido, 'items': list(items)}])
+        self._despertar()
+        return token
+
+    def esperar(self, token, segundos):
+        """ID del pedido si se guardó antes de ``segundos``; None si sigue en cola.
+
+        Se puede volver a preguntar por el mismo token mientras esté entre los
+        últimos MAX_RECORDADOS guardados, por este proceso o por otro.
+        """
+        limite = time.monotonic() + segundos
+        while True:
+            with self._asignados:
+                self._asignados.wait_for(lambda: token in self._ids,
+                                         max(0.0, min(REVISAR_S, limite - time.monotonic())))
+                if token in self._ids:
+                    return self._ids[token]
+            # Lo pudo guardar el hilo de otro proceso (otra terminal, otro worker de la API)
+            pedido_id = self._asignado(token)
+            if pedido_id is not None or time.monotonic() >= limite:
+                return pedido_id
+
+    def _asignado(self, token):
+        with self.bloqueo:
+            _, reservados, guardados = self._leer()
+        return reservados[token] if token in guardados else None
+
+    def estado(self):
+        with self.bloqueo:
+            pedidos, _, guardados = self._leer()
+        return EstadoCola(len(pedidos.keys() - guardados), self._error, self.guardados)
+
+    @staticmethod
+    def _con_id(entrada, pedido_id):
+        pedido = dict(entrada['pedido'], ID=pedido_id, Fecha=fecha(entrada['pedido']['Fecha']))
+        return pedido, [dict(item, ID=pedido_id) for item in entrada['items']]
+
+    def _completar(self, cortados, pedidos, reservados):
+        # Vaciado anterior interrumpido: ya tenían ID, quizá ya están (en parte) en el almacén
+        con_pedido = set(self.destino.cargar_pedidos()['ID'])
+        con_items = set(self.destino.cargar_items()['ID'])
+        for token in cortados:
+            pedido, items = self._con_id(pedidos[token], reservados[token])
+            if pedido['ID'] not in con_pedido:
+                self.destino.agregar_pedido(pedido, () if pedido['ID'] in con_items else items)
+            elif pedido['ID'] not in con_items:
+                self.destino.agregar_items(items)
+        self.reparar()
+
+    def vaciar(self):
+        """Guarda un lote de la cola en el almacén; devuelve cuántos pedidos guardó."""
+        with self._vaciado, self.destino.escritura():
+            with self.bloqueo:
+                pedidos, reservados, guardados = self._leer()
+                pendientes = [t for t in pedidos if t not in guardados]
+                if not pendientes:
+                    # Todo guardado: la cola vuelve a empezar sólo con los últimos IDs asignados
+                    if pedidos:
+                        self._reiniciar(reservados)
+                    return 0
+            cortados = [t for t in pendientes if t in reservados]
+            nuevos = [t for t in pendientes if t not in reservados][:MAX_LOTE]
+            if cortados:
+                self._completar(cortados, pedidos, reservados)
+            ids = {t: self.destino.siguiente_id_pedido() for t in nuevos}
+            if ids:
+                self._anexar([{'op': 'reservado', 'token': t, 'ID': i} for t, i in ids.items()])
+            for token, pedido_id in ids.items():
+                self.guardar(*self._con_id(pedidos[token], pedido_id))
+            self._anexar([{'op': 'guardado', 'token': t} for t in cortados + nuevos])
+        ids.update((t, reservados[t]) for t in cortados)
+        with self._asignados:
+            self._ids.update(ids)
+            while len(self._ids) > MAX_RECORDADOS:
+                del self._ids[next(iter(self._ids))]
+            self._asignados.notify_all()
+        self.guardados += len(ids)
+        return len(ids)
+
+    @contextmanager
+    def vaciada(self):
+        """Bloqueo de escritura del almacén con todo lo encolado ya guardado.
+
+        Para quien necesita cada pedido aceptado en el almacén (cerrar y
+        archivar un día). Toma los bloqueos en el mismo orden que ``vaciar``:
+        vaciar dentro de un ``destino.escritura()`` ya tomado se trabaría
+        con el hilo de fondo.
+        """
+        with self._vaciado, self.destino.escritura():
+            while self.vaciar():
+                pass
+            yield
+
+    def _reiniciar(self, reservados):
+        asignados = list(reservados.items())[-MAX_RECORDADOS:]
+        tmp = self.ruta + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps({'op': 'asignado', 'token': t, 'ID': i}) + '\n' for t, i in asignados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.ruta)
+
+    def _despertar(self):
+        self._hay_trabajo.set()
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._trabajar, name='cola-pedidos', daemon=True)
+            self._hilo.start()
+
+    def _trabajar(self):
+        espera = REINTENTO_S
+        while not self._detener:
+            self._hay_trabajo.wait()
+            self._hay_trabajo.clear()
+            try:
+                while self.vaciar():
+                    pass
+                self._error = None
+                espera = REINTENTO_S
+            except Exception as error:
+                # Los pedidos siguen en la cola; se reintenta con espera creciente
+                self._error = f"{type(error).__name__}: {error}"
+                self._hay_trabajo.wait(espera)
+                self._hay_trabajo.set()
+                espera = min(espera * 2, MAX_REINTENTO_S)
+
+    def cerrar(self, segundos=ESPERA_CIERRE_S):
+        # Al salir: lo que no alcance a guardarse queda en la cola para el próximo arranque
+        if self._hilo is not None and self._hilo.is_alive():
+            self._detener = True
+            self._hay_trabajo.set()
+            self._hilo.join(segundos)
@@ -0,0 +1,148 @@
+"""Tipos de las tablas con Fecha: pedidos, gastos y caja.
+
+Fecha se guarda siempre en un único formato, ISO 8601 con la zona del local
+('2025-01-31 19:05:00.123456-05:00'), y se carga una sola vez como
+timestamp con zona. Al cargar se agrega Dia, el día local del negocio a
+medianoche y sin zona, para que filtrar por día o por rango compare enteros
+en lugar de crear un objeto date por fila. Estado y Metodo_Pago pasan a
+categorías, que ocupan un byte por fila.
+"""
+import numpy as np
+import pandas as pd
+
+from catalogo import ESTADOS, METODOS_PAGO, TZ_EC
+
+# Categorías conocidas; los valores fuera de la lista (datos viejos) se agregan al final
+CATEGORIAS = {'Estado': ESTADOS, 'Metodo_Pago': METODOS_PAGO}
+
+# Texto que termina en una zona horaria: '-05:00', '+0000' o 'Z'
+_CON_ZONA = r'(?:[+-]\d{2}:?\d{2}|Z)$'
+
+
+def _a_utc(zona):
+    # '-05:00' -> +5 h: lo que se suma a la hora local para llegar a UTC
+    desplazamiento = pd.Timedelta(hours=int(zona[1:3]), minutes=int(zona[4:6]))
+    return desplazamiento if zona[0] == '-' else -desplazamiento
+
+
+def _fechas_texto(columna):
+    # pandas lee la hora sin zona mucho más rápido que con '-05:00' al final:
+    # se separa el sufijo y se aplica como desplazamiento (hay muy pocos distintos)
+    sufijo = columna.str[-6:]
+    con_zona = sufijo.str[0].isin(['+', '-']) & (sufijo.str[3] == ':')
+    locales = pd.to_datetime(columna.where(~con_zona, columna.str[:-6]), format='ISO8601')
+    resultado = locales.dt.tz_localize(TZ_EC)
+    if con_zona.any():
+        a_utc = sufijo[con_zona].map({z: _a_utc(z) for z in sufijo[con_zona].unique()})
+        resultado[con_zona] = (locales[con_zona] + a_utc).dt.tz_localize('UTC').dt.tz_convert(TZ_EC)
+    return resultado
+
+
+def _fechas_mezcladas(columna):
+    # Cualquier otra forma de zona ('Z', '+0000'): cada grupo por separado
+    con_zona = columna.str.contains(_CON_ZONA, na=False)
+    return pd.concat([
+        pd.to_datetime(columna[con_zona], format='ISO8601', utc=True).dt.tz_convert(TZ_EC),
+        pd.to_datetime(columna[~con_zona], format='ISO8601').dt.tz_localize(TZ_EC),
+    ]).reindex(columna.index)
+
+
+def fechas(columna):
+    """Fecha como timestamps en la zona del local.
+
+    Los textos sin zona (filas del gestor anterior, que guardaba la hora
+    local de la caja) se interpretan como hora de Ecuador.
+    """
+    if isinstance(columna.dtype, pd.DatetimeTZDtype):
+        return columna.dt.tz_convert(TZ_EC)
+    if pd.api.types.is_datetime64_dtype(columna.dtype):
+        return columna.dt.tz_localize(TZ_EC)
+    if columna.isna().all():
+        return pd.to_datetime(columna).dt.tz_localize(TZ_EC)
+    try:
+        return _fechas_texto(columna)
+    except (ValueError, TypeError):
+        return _fechas_mezcladas(columna)
+
+
+def dias(fechas):
+    # Hora local sin la zona, truncada al día
+    return fechas.dt.tz_localize(None).dt.normalize()
+
+
+def dias_de(df):
+    return df['Dia'] if 'Dia' in df.columns else dias(fechas(df['Fecha']))
+
+
+def dia(fecha):
+    """Valor de Dia que corresponde a una fecha (date)."""
+    return pd.Timestamp(fecha)
+
+
+def fecha(valor):
+    """Una fecha suelta (texto, datetime o Timestamp) en la zona del local."""
+    valor = pd.Timestamp(valor)
+    return valor.tz_localize(TZ_EC) if valor.tz is None else valor.tz_convert(TZ_EC)
+
+
+def texto_fecha(valor):
+    # Formato canónico en disco para una sola fecha (nuevas filas)
+    return str(fecha(valor))
+
+
+def _sufijo(desfase):
+    # Hora local menos UTC -> '-05:00'
+    minutos = int(desfase.total_seconds()) // 60
+    return f"{'-' if minutos < 0 else '+'}{abs(minutos) // 60:02d}:{abs(minutos) % 60:02d}"
+
+
+def textos_fecha(columna):
+    """Formato canónico de una columna entera (lo mismo que texto_fecha por fila).
+
+    Se formatea la hora local sin zona y se le pega el desfase, que tiene
+    muy pocos valores distintos: formatear timestamps con zona es unas 25
+    veces más lento y dominaba el tiempo de compactar.
+    """
+    locales = fechas(columna)
+    sin_zona = locales.dt.tz_localize(None)
+    desfase = sin_zona - locales.dt.tz_convert('UTC').dt.tz_localize(None)
+    sufijos = desfase.map({d: _sufijo(d) for d in desfase.dropna().unique()}).astype('str')
+    texto = sin_zona.astype('str')
+    if (texto.str.len() == 10).any():
+        # Si todas son medianoche pandas escribe sólo la fecha
+        texto = texto + ' 00:00:00'
+    return (texto + sufijos).where(locales.notna())
+
+
+def _categoria(columna, conocidas):
+    # factorize recorre la columna una vez; los valores distintos son pocos
+    codigos, valores = pd.factorize(columna)
+    todas = [*conocidas, *sorted(set(valores) - set(conocidas))]
+    posicion = {valor: i for i, valor in enumerate(todas)}
+    # El último -1 deja los vacíos (código -1) como vacíos
+    mapa = np.array([posicion[v] for v in valores] + [-1], dtype='int64')
+    return pd.Categorical.from_codes(mapa[codigos], categories=todas)
+
+
+def categorias(df):
+    for columna, conocidas in CATEGORIAS.items():
+        if columna in df.columns and not isinstance(df[columna].dtype, pd.CategoricalDtype):
+            df[columna] = _categoria(df[columna], conocidas)
+    return df
+
+
+def tipar(df):
+    """Fecha con zona, Dia y categorías; modifica y devuelve ``df``."""
+    df['Fecha'] = fechas(df['Fecha'])
+    df['Dia'] = dias(df['Fecha'])
+    return categorias(df)
+
+
+def para_guardar(df):
+    # Lo que se escribe a disco: Fecha canónica y sin Dia, que se recalcula al cargar
+    return df.drop(columns='Dia', errors='ignore').assign(Fecha=fechas(df['Fecha']))
+
+
+def para_csv(df):
+    # para_guardar con Fecha ya en texto: to_csv formatea muy lento la hora con zona
+    return para_guardar(df).assign(Fecha=lambda d: textos_fecha(d['Fecha']))
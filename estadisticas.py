@@ -0,0 +1,68 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from perfil import medido
+from productos import ventas_por_producto
+
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+TOP_PRODUCTOS = 10
+
+
+class Estadisticas(NamedTuple):
+    pedidos: int
+    ventas: float
+    ticket_promedio: float
+    por_hora: pd.DataFrame
+    por_dia_semana: pd.DataFrame
+    metodos: pd.DataFrame
+    top_productos: pd.DataFrame
+    ticket_por_mes: pd.DataFrame
+    gastos_por_mes: pd.DataFrame
+
+
+def _ventas_por(pagados, claves, indice):
+    # bincount sobre códigos enteros: una sola pasada por los pedidos
+    ventas = np.bincount(claves, weights=pagados['Total'].to_numpy(dtype=float), minlength=len(indice))
+    pedidos = np.bincount(claves, minlength=len(indice))
+    return pd.DataFrame({'Ventas': ventas.round(2), 'Pedidos': pedidos}, index=indice)
+
+
+def _por_mes(fechas, valores, nombre):
+    # Año*100 + mes como clave entera: dt.strftime es mucho más lento
+    meses = (fechas.dt.year * 100 + fechas.dt.month).to_numpy()
+    df = valores.groupby(meses).agg(['sum', 'mean', 'size']).rename(
+        columns={'sum': nombre, 'mean': 'Promedio', 'size': 'Cantidad'}).round(2)
+    df.index = pd.Index([f"{m // 100}-{m % 100:02d}" for m in df.index], name='Mes')
+    return df
+
+
+@medido('estadísticas')
+def calcular_estadisticas(pedidos, items, gastos):
+    """Indicadores de ventas y gastos sobre el historial recibido.
+
+    Sólo cuentan como venta los pedidos 'Pagado', igual que en el cierre.
+    Todo sale de agregaciones vectorizadas (bincount/groupby), sin recorrer
+    filas en Python.
+    """
+    pagados = pedidos[pedidos['Estado'] == 'Pagado']
+    fechas = pagados['Fecha']
+    ventas = float(pagados['Total'].sum())
+    por_hora = _ventas_por(pagados, fechas.dt.hour.to_numpy(), pd.RangeIndex(24, name='Hora'))
+    por_dia_semana = _ventas_por(pagados, fechas.dt.weekday.to_numpy(), pd.Index(DIAS_SEMANA, name='Día'))
+    metodos = pagados.groupby('Metodo_Pago')['Total'].agg(['sum', 'size']).rename(columns={'sum': 'Ventas', 'size': 'Pedidos'})
+    metodos['Porcentaje'] = (100 * metodos['Ventas'] / ventas).round(1) if ventas else 0.0
+    metodos = metodos.round(2).sort_values('Ventas', ascending=False).rename_axis('Método')
+    return Estadisticas(
+        pedidos=len(pagados),
+        ventas=round(ventas, 2),
+        ticket_promedio=round(ventas / len(pagados), 2) if len(pagados) else 0.0,
+        por_hora=por_hora[por_hora['Pedidos'] > 0],
+        por_dia_semana=por_dia_semana,
+        metodos=metodos,
+        top_productos=ventas_por_producto(pedidos, items).head(TOP_PRODUCTOS),
+        ticket_por_mes=_por_mes(fechas, pagados['Total'], 'Ventas'),
+        gastos_por_mes=_por_mes(gastos['Fecha'], gastos['Monto'], 'Gastos'),
+    )
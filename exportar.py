@@ -0,0 +1,84 @@
+import gzip
+import io
+import tempfile
+from contextlib import closing
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional
+    pa = pq = None
+
+# formato -> (extensión, tipo MIME, etiqueta)
+FORMATOS = {
+    'csv': ('.csv', 'text/csv', "CSV"),
+    'csv.gz': ('.csv.gz', 'application/gzip', "CSV comprimido (gzip)"),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet', "Parquet"),
+}
+
+# Hasta este tamaño el archivo armado se queda en memoria; después va a disco
+MAX_EN_MEMORIA = 8 * 1024 * 1024
+
+
+def formatos_disponibles():
+    return [f for f in FORMATOS if f != 'parquet' or pq is not None]
+
+
+def formato_de_ruta(ruta):
+    for formato, (extension, _, _) in sorted(FORMATOS.items(), key=lambda f: -len(f[1][0])):
+        if ruta.endswith(extension):
+            return formato
+    raise ValueError(f"Extensión no soportada: {ruta!r} (usa {', '.join(e for e, _, _ in FORMATOS.values())})")
+
+
+def _escribir_csv(fragmentos, destino, columnas):
+    texto = io.TextIOWrapper(destino, encoding='utf-8', newline='')
+    encabezado = True
+    for df in fragmentos:
+        df.reindex(columns=columnas).to_csv(texto, index=False, header=encabezado)
+        encabezado = False
+    if encabezado:
+        texto.write(','.join(columnas) + '\n')
+    texto.flush()
+    texto.detach()
+
+
+def _escribir_parquet(fragmentos, destino, columnas):
+    if pq is None:
+        raise RuntimeError("Exportar a Parquet requiere pyarrow (pip install pyarrow)")
+    escritor = None
+    for df in fragmentos:
+        tabla = pa.Table.from_pandas(df.reindex(columns=columnas), preserve_index=False)
+        if escritor is None:
+            escritor = pq.ParquetWriter(destino, tabla.schema)
+        escritor.write_table(tabla.cast(escritor.schema))
+    if escritor is None:
+        escritor = pq.ParquetWriter(destino, pa.schema([(c, pa.string()) for c in columnas]))
+    escritor.close()
+
+
+def escribir(fragmentos, destino, formato, columnas):
+    """Escribe los DataFrames de ``fragmentos`` en el archivo binario ``destino``.
+
+    Cada bloque se serializa y se descarta antes de leer el siguiente, así
+    que la memoria depende del tamaño del bloque y no de la tabla.
+    """
+    with closing(fragmentos):
+        if formato == 'parquet':
+            _escribir_parquet(fragmentos, destino, columnas)
+        elif formato == 'csv.gz':
+            with gzip.GzipFile(fileobj=destino, mode='wb') as comprimido:
+                _escribir_csv(fragmentos, comprimido, columnas)
+        elif formato == 'csv':
+            _escribir_csv(fragmentos, destino, columnas)
+        else:
+            raise ValueError(f"Formato de exportación desconocido: {formato!r}")
+
+
+def a_bytes(fragmentos, formato, columnas):
+    # Para st.download_button: el archivo se arma en un temporal que pasa a
+    # disco si crece, y sólo el resultado (comprimido si se pidió) queda en RAM
+    with tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA) as archivo:
+        escribir(fragmentos, archivo, formato, columnas)
+        archivo.seek(0)
+        return archivo.read()
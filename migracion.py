@@ -0,0 +1,148 @@
+"""Migración de los CSV del gestor anterior al esquema actual.
+
+El gestor anterior (GestorComidaRapida/app.py) escribía el mismo
+pedidos_mi_escondite.csv sin Metodo_Pago (y en sus primeras versiones sin
+ID ni Nombre_Orden), con fechas sin zona y con los precios de su propio
+menú. almacen aplica una sola vez los pasos pendientes, en orden, y anota
+la versión alcanzada; aquí están las transformaciones y la verificación
+de que los totales no cambian, sobre DataFrames.
+"""
+from typing import NamedTuple
+
+import pandas as pd
+
+from esquema import dias, fechas
+from productos import CATEGORIA_DESCONOCIDA, items_de_lineas, lineas_detalle, parsear_detalle
+
+# Versión de los archivos que escribe este gestor
+VERSION_ESQUEMA = 3
+
+# Precios del gestor anterior, para armar los ítems de sus pedidos
+MENU_ANTERIOR = {
+    "Hamburguesas": {
+        "Italiana": 2.25, "Francesa": 3.00, "Española": 3.00, "Americana": 3.00, "4 Estaciones": 3.00,
+        "Mexicana": 3.00, "Especial": 3.00, "Suprema": 3.50, "Papi Burguer": 2.50, "A su gusto (Jumbo)": 5.00,
+        "Triple Burguer": 6.00, "Doble Burguer": 4.50
+    },
+    "Hot Dogs": {
+        "Especial Mixto": 2.25, "Especial de Pollo": 2.25, "Hot Dog con salame": 2.25,
+        "Mix Dog - Jumbo": 2.25, "Champi Dog": 2.25, "Hot Dog con cebolla": 1.75
+    },
+    "Papas Fritas": {
+        "Salchipapa (1.50)": 1.50, "Salchipapa (1.75)": 1.75, "Papi carne": 2.25, "Papi Pollo": 2.25,
+        "Salchipapa especial": 3.25, "Papa Mix": 3.25, "Papa Wlady": 5.00
+    },
+    "Sanduches": {"Cubano": 2.00, "Vegetariano": 2.00, "Sanduche de Pollo": 2.00},
+    "Bebidas": {"Colas Pequeñas": 0.75, "Jugos": 1.50, "Batidos": 1.75, "Jamaica": 0.50},
+    # "Porciónes" en el gestor anterior
+    "Porciones": {"Papas Fritas (0.50)": 0.50, "Papas Fritas (1.00)": 1.00, "Huevo Frito": 0.50, "Presa de Pollo": 1.50},
+}
+
+# Importe de cada tabla que la migración no puede cambiar
+IMPORTES = {'pedidos': 'Total', 'gastos': 'Monto', 'caja': 'Inicial'}
+
+# Diferencia máxima (dólares) para considerar iguales dos sumas
+CENTAVO = 0.005
+
+
+def completar_pedidos(df):
+    """Agrega las columnas que el gestor anterior no tenía y llena sus vacíos.
+
+    Sin ID se numera en orden de archivo (como hacía el gestor anterior al
+    leer); Metodo_Pago vacío es 'Efectivo', el único que existía entonces.
+    """
+    if 'ID' not in df.columns:
+        df['ID'] = range(1, len(df) + 1)
+    df['ID'] = df['ID'].astype('int64')
+    df['Nombre_Orden'] = df['Nombre_Orden'].fillna("Sin nombre") if 'Nombre_Orden' in df.columns else "Sin nombre"
+    df['Metodo_Pago'] = df['Metodo_Pago'].fillna("Efectivo") if 'Metodo_Pago' in df.columns else "Efectivo"
+    return df
+
+
+def _cuadra(items, total):
+    # Por pedido: ¿la suma de sus ítems es lo cobrado? Un precio desconocido nunca cuadra
+    importe = items['Cantidad'] * items['Precio_Unitario'].fillna(float('inf'))
+    return (importe.groupby(items['ID']).sum().round(2).reindex(total.index) - total).abs().lt(CENTAVO)
+
+
+def items_de_detalle(pedidos):
+    """Ítems desde Detalle con los precios del menú que cuadra con lo cobrado.
+
+    Se usa el catálogo (la versión vigente en la fecha del pedido) salvo que
+    sólo MENU_ANTERIOR dé el Total del pedido (o tenga productos que el
+    catálogo ya no vende).
+    """
+    if pedidos.empty:
+        return parsear_detalle(pedidos)
+    lineas = lineas_detalle(pedidos)
+    actuales, anteriores = items_de_lineas(lineas), items_de_lineas(lineas, MENU_ANTERIOR)
+    total = pedidos.drop_duplicates('ID').set_index('ID')['Total'].round(2)
+    desconocidos = total.index.isin(actuales.loc[actuales['Categoria'] == CATEGORIA_DESCONOCIDA, 'ID'])
+    anterior = total.index[_cuadra(anteriores, total) & (~_cuadra(actuales, total) | desconocidos)]
+    return pd.concat([actuales[~actuales['ID'].isin(anterior)], anteriores[anteriores['ID'].isin(anterior)]],
+                     ignore_index=True)
+
+
+def descuadres(pedidos, items):
+    # Pedidos con ítems cuya suma no es el Total (precios que ningún menú explica)
+    total = pedidos.drop_duplicates('ID').set_index('ID')['Total'].round(2)
+    total = total[total.index.isin(items['ID'])]
+    return int((~_cuadra(items, total)).sum())
+
+
+class Verificacion(NamedTuple):
+    tabla: str
+    filas_antes: int
+    filas_despues: int
+    total_antes: float
+    total_despues: float
+    # Días (y estados, en pedidos) cuya cantidad o suma cambió
+    grupos_distintos: int
+
+    @property
+    def ok(self):
+        return (self.filas_antes == self.filas_despues and not self.grupos_distintos
+                and abs(self.total_antes - self.total_despues) < CENTAVO)
+
+
+def _totales(df, tabla):
+    # Filas e importe por día, y por Estado en pedidos
+    if df.empty:
+        return pd.DataFrame(columns=['filas', 'suma'], dtype=float)
+    claves = [dias(fechas(df['Fecha'])).rename('Dia')]
+    if tabla == 'pedidos':
+        claves.append(df['Estado'].astype(str))
+    return df.groupby(claves)[IMPORTES[tabla]].agg(filas='size', suma='sum')
+
+
+def verificar(tabla, antes, despues):
+    """Compara una tabla antes y después de migrar: filas e importe por grupo."""
+    a, d = _totales(antes, tabla).align(_totales(despues, tabla), fill_value=0)
+    distintos = (a['filas'] != d['filas']) | ((a['suma'] - d['suma']).abs() >= CENTAVO)
+    return Verificacion(tabla, len(antes), len(despues), round(float(antes[IMPORTES[tabla]].sum()), 2),
+                        round(float(despues[IMPORTES[tabla]].sum()), 2), int(distintos.sum()))
+
+
+class ReporteMigracion(NamedTuple):
+    version_anterior: int
+    version: int
+    pasos: list
+    verificaciones: list
+    descuadres: int
+    respaldos: list
+
+    @property
+    def ok(self):
+        return all(v.ok for v in self.verificaciones)
+
+    def texto(self):
+        lineas = [f"Esquema v{self.version_anterior} -> v{self.version}"]
+        lineas += [f"  {paso}" for paso in self.pasos]
+        lineas.append("Verificación (antes -> después):")
+        for v in self.verificaciones:
+            lineas.append(f"  {'OK ' if v.ok else 'ERROR'} {v.tabla}: {v.filas_antes} -> {v.filas_despues} filas, "
+                          f"${v.total_antes:,.2f} -> ${v.total_despues:,.2f}, {v.grupos_distintos} grupos distintos")
+        lineas.append(f"Pedidos cuyos ítems no suman el Total: {self.descuadres}")
+        if self.respaldos:
+            lineas.append(f"Respaldos: {', '.join(self.respaldos)}")
+        return "\n".join(lineas)
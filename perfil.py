@@ -0,0 +1,145 @@
+"""Tiempos por rerun de las etapas costosas (lectura, fechas, filtros, cierres).
+
+Las funciones marcadas con ``@medido`` o ``with medir(...)`` suman su tiempo
+a la medición del rerun en curso. Sin medición activa sólo cuesta leer una
+ContextVar, así que el instrumento puede quedarse en el código.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+# Reruns más lentos que esto se anotan en ARCHIVO_LENTOS
+UMBRAL_LENTO_S = float(os.environ.get('ESCONDITE_UMBRAL_LENTO', '1.0'))
+ARCHIVO_LENTOS = 'reruns_lentos.log'
+# El registro rota al llegar a este tamaño y guarda RESPALDOS_LENTOS anteriores
+MAX_BYTES_LENTOS = 1024 * 1024
+RESPALDOS_LENTOS = 3
+
+ARCHIVO_PERFIL = 'perfil_mi_escondite.prof'
+LINEAS_PERFIL = 30
+
+_medicion = contextvars.ContextVar('medicion', default=None)
+_registro = logging.getLogger('mi_escondite.reruns_lentos')
+_lock_registro = threading.Lock()
+
+
+class Medicion:
+    """Tiempos de un rerun: total del script y acumulado por etapa."""
+
+    def __init__(self, pagina, detalle=True, perfilar=False):
+        self.pagina = pagina
+        self.detalle = detalle
+        self.etapas = {}
+        self.total = None
+        self.reporte_perfil = None
+        # Sólo el tiempo de las etapas de primer nivel, para no contar dos veces las anidadas
+        self.medido = 0.0
+        self._profundidad = 0
+        self._perfil = cProfile.Profile() if perfilar else None
+        self._inicio = time.perf_counter()
+
+    def sumar(self, nombre, segundos, primer_nivel):
+        etapa = self.etapas.setdefault(nombre, [0.0, 0])
+        etapa[0] += segundos
+        etapa[1] += 1
+        if primer_nivel:
+            self.medido += segundos
+
+    def filas(self):
+        filas = [{'Etapa': nombre, 'ms': round(s * 1000, 1), 'Llamadas': n}
+                 for nombre, (s, n) in sorted(self.etapas.items(), key=lambda e: -e[1][0])]
+        if self.total is not None and self.detalle:
+            filas.append({'Etapa': "resto (widgets y lógica)", 'ms': round((self.total - self.medido) * 1000, 1), 'Llamadas': 1})
+        return filas
+
+
+def _abrir():
+    # Abre una etapa; None si no hay medición con detalle en este rerun
+    medicion = _medicion.get()
+    if medicion is None or not medicion.detalle:
+        return None
+    medicion._profundidad += 1
+    return time.perf_counter()
+
+
+def _acumular(nombre, inicio):
+    # Cierra una etapa abierta con _abrir
+    medicion = _medicion.get()
+    medicion._profundidad -= 1
+    medicion.sumar(nombre, time.perf_counter() - inicio, medicion._profundidad == 0)
+
+
+@contextmanager
+def medir(nombre):
+    inicio = _abrir()
+    try:
+        yield
+    finally:
+        if inicio is not None:
+            _acumular(nombre, inicio)
+
+
+def medido(nombre):
+    """Decorador: suma el tiempo de cada llamada a la etapa ``nombre``."""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = _abrir()
+            if inicio is None:
+                return funcion(*args, **kwargs)
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                _acumular(nombre, inicio)
+        return envoltura
+    return decorador
+
+
+def iniciar(pagina, detalle=False, perfilar=False):
+    """Empieza la medición del rerun. Sin ``detalle`` sólo se toma el total."""
+    medicion = Medicion(pagina, detalle, perfilar)
+    _medicion.set(medicion)
+    if medicion._perfil:
+        medicion._perfil.enable()
+    return medicion
+
+
+def _anotar_lento(medicion):
+    with _lock_registro:
+        if not _registro.handlers:
+            manejador = RotatingFileHandler(ARCHIVO_LENTOS, maxBytes=MAX_BYTES_LENTOS,
+                                            backupCount=RESPALDOS_LENTOS, encoding='utf-8')
+            _registro.addHandler(manejador)
+            _registro.setLevel(logging.INFO)
+            _registro.propagate = False
+    _registro.info(json.dumps({
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'pagina': medicion.pagina,
+        'total_ms': round(medicion.total * 1000, 1),
+        'etapas': {f['Etapa']: f['ms'] for f in medicion.filas()},
+    }, ensure_ascii=False))
+
+
+def terminar(medicion):
+    """Cierra la medición; anota el rerun si pasó UMBRAL_LENTO_S y guarda el perfil pedido."""
+    medicion.total = time.perf_counter() - medicion._inicio
+    _medicion.set(None)
+    if medicion._perfil:
+        medicion._perfil.disable()
+        medicion._perfil.dump_stats(ARCHIVO_PERFIL)
+        texto = io.StringIO()
+        pstats.Stats(medicion._perfil, stream=texto).sort_stats('cumulative').print_stats(LINEAS_PERFIL)
+        medicion.reporte_perfil = texto.getvalue()
+    if medicion.total > UMBRAL_LENTO_S:
+        _anotar_lento(medicion)
+    return medicion
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from catalogo import DESDE_BASE, TZ_EC, Catalogo, archivo_menu, version_menu
+
+COLUMNAS_ITEMS = ['ID', 'Categoria', 'Producto', 'Cantidad', 'Precio_Unitario']
+
+CATEGORIA_DESCONOCIDA = "Sin categoría"
+
+
+def items_del_carrito(pedido_id, carrito, indice=None):
+    # carrito: {"Categoría - Producto": cantidad}, con el precio de ``indice`` (por
+    # defecto la versión del menú vigente al vender).
+    # pedido_id None: pedido encolado, el ID se asigna al guardarlo
+    indice = indice or archivo_menu.actual().vigente().indice
+    items = []
+    for key, cantidad in carrito.items():
+        item = indice[key]
+        items.append({
+            'ID': None if pedido_id is None else int(pedido_id),
+            'Categoria': item.categoria,
+            'Producto': item.producto,
+            'Cantidad': int(cantidad),
+            'Precio_Unitario': item.precio,
+        })
+    return items
+
+
+def lineas_detalle(pedidos):
+    # Una fila por "2x Italiana" de cada Detalle, con el ID, la Fecha y el Total de su pedido
+    lineas = pedidos[['ID', 'Fecha', 'Detalle', 'Total']].assign(Linea=pedidos['Detalle'].str.split(' | ', regex=False))
+    lineas = lineas.explode('Linea')
+    partes = lineas['Linea'].str.extract(r'^\s*(\d+)x\s+(.+?)\s*$')
+    lineas = lineas.assign(Cantidad=pd.to_numeric(partes[0]), Producto=partes[1]).dropna(subset=['Cantidad', 'Producto'])
+    return lineas[['ID', 'Fecha', 'Total', 'Cantidad', 'Producto']]
+
+
+def _version_de(fechas, catalogo):
+    # Posición de la versión vigente en cada fecha; antes de la primera rige la primera
+    if len(catalogo.versiones) == 1:
+        return np.zeros(len(fechas), dtype=int)
+    fechas = pd.DatetimeIndex(fechas)
+    if fechas.tz is None:
+        fechas = fechas.tz_localize(TZ_EC)
+    limites = pd.DatetimeIndex([v.desde for v in catalogo.versiones]).tz_convert('UTC').as_unit('ns')
+    posicion = np.searchsorted(limites.asi8, fechas.tz_convert('UTC').as_unit('ns').asi8, side='right') - 1
+    return posicion.clip(0)
+
+
+def items_de_lineas(lineas, menu=None):
+    """Ítems de las líneas de Detalle con la categoría y el precio vigentes en su Fecha.
+
+    ``menu`` es un Catalogo, un dict con un único menú para todas las fechas,
+    o None para el catálogo actual. Si el pedido tiene una sola línea se usa
+    Total / Cantidad, que es el precio realmente cobrado.
+    """
+    if menu is None:
+        menu = archivo_menu.actual()
+    elif not isinstance(menu, Catalogo):
+        menu = Catalogo([version_menu(DESDE_BASE, menu)])
+    precios = pd.DataFrame(
+        [(n, producto, categoria, precio) for n, version in enumerate(menu.versiones)
+         for categoria, items in version.menu.items() for producto, precio in items.items()],
+        columns=['Version', 'Producto', 'Categoria', 'Precio_Unitario'],
+    )
+    lineas = lineas.assign(Version=_version_de(lineas['Fecha'], menu)).merge(precios, on=['Version', 'Producto'], how='left')
+    lineas['Categoria'] = lineas['Categoria'].fillna(CATEGORIA_DESCONOCIDA)
+    una_linea = lineas.groupby('ID')['ID'].transform('size') == 1
+    lineas.loc[una_linea, 'Precio_Unitario'] = (lineas.loc[una_linea, 'Total'] / lineas.loc[una_linea, 'Cantidad']).round(2)
+    lineas['Cantidad'] = lineas['Cantidad'].astype(int)
+    return lineas[COLUMNAS_ITEMS].reset_index(drop=True)
+
+
+def parsear_detalle(pedidos, menu=None):
+    """Convierte los Detalle "2x Italiana | 1x Jugos" de pedidos antiguos en ítems.
+
+    La categoría y el precio salen de ``menu`` (ver items_de_lineas): por
+    defecto, la versión del catálogo vigente cuando se hizo cada pedido.
+    """
+    if pedidos.empty:
+        return pd.DataFrame(columns=COLUMNAS_ITEMS)
+    return items_de_lineas(lineas_detalle(pedidos), menu)
+
+
+def ventas_por_producto(pedidos, items, estados=('Pagado',)):
+    # pedidos ya filtrados por fecha; sólo cuentan los pedidos en `estados`
+    validos = pedidos.loc[pedidos['Estado'].isin(estados), 'ID']
+    vendidos = items[items['ID'].isin(validos)]
+    reporte = (
+        vendidos.assign(Ingresos=vendidos['Cantidad'] * vendidos['Precio_Unitario'])
+        .groupby(['Categoria', 'Producto'], as_index=False)[['Cantidad', 'Ingresos']].sum()
+        .sort_values(['Cantidad', 'Ingresos'], ascending=False, ignore_index=True)
+    )
+    reporte['Ingresos'] = reporte['Ingresos'].round(2)
+    return reporte
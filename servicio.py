@@ -0,0 +1,145 @@
+"""Operaciones del local sin interfaz, para app.py y para la API HTTP (api.py).
+
+Cada operación valida sus datos, toma el bloqueo de escritura de almacen
+cuando tiene que comprobar algo antes de escribir (la caja ya abierta, el
+estado que tenía el pedido) y devuelve valores simples. Un dato inválido
+levanta ValueError, algo que no existe LookupError y una operación que
+choca con lo que ya está guardado, Conflicto.
+"""
+import math
+from datetime import datetime
+from typing import NamedTuple
+
+from almacen import (
+    actualizar_pedido, agregar_caja, archivar_dia, buscar_pedido, encolar_pedido, escritura, escritura_vaciada,
+    esperar_pedido, historial, inicial_caja, resumen_cierres,
+)
+from catalogo import ESTADOS, METODOS_PAGO, TZ_EC, archivo_menu, total_carrito
+from cierre import cierre_del_dia
+from productos import items_del_carrito
+
+
+class Conflicto(RuntimeError):
+    """La operación no cabe en el estado actual: caja ya abierta, pedido cambiado por otro."""
+
+
+class PedidoCreado(NamedTuple):
+    token: str
+    # None si el pedido sigue en la cola de guardado (ver esperar_pedido)
+    id: object
+    detalle: str
+    total: float
+
+
+def _ahora(ahora=None):
+    return ahora or datetime.now(TZ_EC)
+
+
+def apertura(fecha):
+    """Inicial de la caja abierta ese día, o None si no se abrió."""
+    return inicial_caja(fecha)
+
+
+def abrir_caja(inicial, ahora=None):
+    ahora = _ahora(ahora)
+    # bool es un int para Python, pero true no es un monto
+    if isinstance(inicial, bool) or not isinstance(inicial, (int, float)) or not math.isfinite(inicial):
+        raise ValueError("El valor inicial de la caja debe ser un número.")
+    if inicial < 0:
+        raise ValueError("El valor inicial de la caja no puede ser negativo.")
+    # Comprobar y abrir bajo el mismo bloqueo: dos terminales no abren dos veces
+    with escritura():
+        abierta = apertura(ahora.date())
+        if abierta is not None:
+            raise Conflicto(f"La caja ya está abierta hoy con inicial ${abierta:.2f}.")
+        agregar_caja({'Fecha': ahora, 'Inicial': round(float(inicial), 2)})
+    return round(float(inicial), 2)
+
+
+def armar_pedido(nombre, carrito, metodo_pago, indice):
+    """Detalle, Total e ítems (sin ID) de un carrito {"Categoría - Producto": cantidad}."""
+    if not nombre or not str(nombre).strip():
+        raise ValueError("Ingresa un nombre o mesa.")
+    if metodo_pago not in METODOS_PAGO:
+        raise ValueError(f"Método de pago desconocido: {metodo_pago!r}.")
+    if not carrito:
+        raise ValueError("Agrega al menos un producto.")
+    desconocidos = [key for key in carrito if key not in indice]
+    if desconocidos:
+        raise ValueError(f"Productos que no están en el menú: {', '.join(desconocidos)}.")
+    if any(isinstance(c, bool) or not isinstance(c, int) or c <= 0 for c in carrito.values()):
+        raise ValueError("Las cantidades deben ser enteros positivos.")
+    detalle = " | ".join(f"{cantidad}x {indice[key].producto}" for key, cantidad in carrito.items())
+    return detalle, total_carrito(carrito, indice), items_del_carrito(None, carrito, indice)
+
+
+def crear_pedido(nombre, carrito, metodo_pago, espera=0.0, indice=None, ahora=None):
+    """Encola un pedido "En proceso" y espera su ID hasta ``espera`` segundos.
+
+    ``indice`` es la versión del menú con la que se armó el carrito; por
+    defecto, la vigente.
+    """
+    ahora = _ahora(ahora)
+    if apertura(ahora.date()) is None:
+        raise Conflicto("La caja no está abierta hoy.")
+    indice = indice or archivo_menu.actual().vigente(ahora).indice
+    detalle, total, items = armar_pedido(nombre, carrito, metodo_pago, indice)
+    token = encolar_pedido({
+        'Nombre_Orden': str(nombre).strip(),
+        'Fecha': ahora,
+        'Detalle': detalle,
+        'Total': total,
+        'Estado': "En proceso",
+        'Metodo_Pago': metodo_pago,
+    }, items)
+    return PedidoCreado(token, esperar_pedido(token, espera) if espera else None, detalle, total)
+
+
+def pedido(pedido_id):
+    encontrado = buscar_pedido(pedido_id)
+    if encontrado is None:
+        raise LookupError(f"No existe el pedido #{pedido_id}.")
+    # Dia es interno del historial (para filtrar), no un dato del pedido
+    return {clave: valor for clave, valor in encontrado.items() if clave != 'Dia'}
+
+
+def cambiar_estado(pedido_id, estado, estado_anterior=None):
+    """Cambia el estado de un pedido y lo devuelve actualizado.
+
+    Con ``estado_anterior`` sólo se cambia si el pedido sigue en ese estado
+    (una terminal de pago que cobra un pedido que otra ya canceló).
+    """
+    if estado not in ESTADOS:
+        raise ValueError(f"Estado desconocido: {estado!r}.")
+    with escritura():
+        anterior = pedido(pedido_id)
+        if estado_anterior is not None and anterior['Estado'] != estado_anterior:
+            raise Conflicto(f"El pedido #{pedido_id} ya está en {anterior['Estado']}.")
+        actualizar_pedido(pedido_id, anterior=anterior, Estado=estado)
+    return {**anterior, 'Estado': estado}
+
+
+def cierres(desde, hasta):
+    """Cierres diarios calculados del rango, uno por fila con Dia como índice."""
+    return resumen_cierres(METODOS_PAGO, desde, hasta)
+
+
+def cierre(fecha):
+    return cierre_del_dia(cierres(fecha, fecha), fecha)
+
+
+def cerrar_caja(fecha):
+    """Pasa el día al archivo histórico; devuelve su cierre y cuántos pedidos se archivaron.
+
+    Antes se guardan los pedidos que sigan en la cola: el cierre los cuenta
+    y no quedan en la tabla viva de un día ya archivado. Un día sin caja
+    abierta no se cierra: LookupError si nunca se abrió, Conflicto si ya
+    se cerró.
+    """
+    with escritura_vaciada():
+        if apertura(fecha) is None:
+            if historial('caja', fecha, fecha).empty:
+                raise LookupError(f"La caja no se abrió el {fecha.isoformat()}.")
+            raise Conflicto(f"La caja del {fecha.isoformat()} ya está cerrada.")
+        resultado = cierre(fecha)
+        return resultado, archivar_dia(fecha)